@@ -0,0 +1,86 @@
+"""
+Startup time benchmark.
+
+Imports each entry point module in a fresh interpreter with `python -X importtime` and checks the
+cumulative import time against a budget, and that none of the slow optional modules (cv2, pandas,
+numpy) were imported at startup. The best of several runs is used to reduce noise. Exits non-zero if
+any module is over its budget, so it can be run as a regression check.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--scale 1.0] [--json]
+"""
+
+#-----------------------------imports
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+#-----------------------------supporting methods, classes, constants
+sys_repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))    #modules are imported from here
+
+#--constant dict of the startup budgets, {module: max cumulative import time in ms}
+CONST_startup_budgets = {'media_tasks':250,                 #everything the tasks need
+                         'video_file_manage_cli':300,       #headless entry point
+                         'video_file_manage_assist':400}    #GUI entry point (includes tkinter)
+
+#--modules that must only be imported when first needed
+CONST_lazy_modules = ('cv2', 'pandas', 'numpy')
+
+def measure_import(module):
+    """function imports the passed module in a fresh interpreter and measures it
+
+    :param module: module to import
+    :type module: `string`
+    :returns: cumulative import time in ms, lazy modules that were imported
+    :rtype: `float`, `list`
+    """
+    code = f"import sys, {module}; print(','.join(m for m in {CONST_lazy_modules!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=sys_repo_dir,
+                          capture_output=True, text=True, check=True)
+    cumulative_us = None
+    for line in proc.stderr.splitlines():       #"import time: self [us] | cumulative | imported package"
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module: cumulative_us = int(parts[1])
+    if cumulative_us is None: raise RuntimeError(f"no import time found for {module}")
+    loaded = [m for m in proc.stdout.strip().split(',') if m != '']
+    return cumulative_us/1000.0, loaded
+
+def main(argv=None):
+    """function runs the benchmark
+
+    :returns: exit code, 0 if every module is within budget
+    :rtype: `int`
+    """
+    parser = argparse.ArgumentParser(description='Check the cold import time of the entry points against a budget.')
+    parser.add_argument('--runs', type=int, default=5, help='runs per module, the best is used (default: 5)')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply the budgets, e.g. for slow machines (default: 1.0)')
+    parser.add_argument('--json', action='store_true', help='write the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = []; failed = False
+    for module, budget_ms in CONST_startup_budgets.items():
+        budget_ms *= args.scale
+        try: runs = [measure_import(module) for _ in range(max(1, args.runs))]
+        except subprocess.CalledProcessError as e:
+            results.append({'module':module, 'error':e.stderr.strip().splitlines()[-1:]})
+            failed = True; continue
+        best_ms = min(ms for ms, _ in runs)
+        loaded = sorted({m for _, mods in runs for m in mods})
+        ok = best_ms <= budget_ms and len(loaded) == 0
+        failed = failed or not ok
+        results.append({'module':module, 'import_ms':round(best_ms, 1), 'budget_ms':budget_ms, 'lazy_loaded':loaded, 'ok':ok})
+
+    if args.json: print(json.dumps(results, indent=1))
+    else:
+        for res in results:
+            if 'error' in res: print(f"{res['module']:<28} FAILED TO IMPORT {res['error']}"); continue
+            status = 'ok' if res['ok'] else 'OVER BUDGET'
+            if len(res['lazy_loaded']) > 0: status = 'IMPORTED '+','.join(res['lazy_loaded'])
+            print(f"{res['module']:<28} {res['import_ms']:>8.1f} ms  (budget {res['budget_ms']:.0f} ms)  {status}")
+    return 1 if failed else 0
+
+#-----------------------------main
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Benchmark suite for the media tasks.
+
+Generates a synthetic corpus (see `corpus.py`) at each selected scale and times the main tasks:
+probing single files, parsing a directory (one worker, parallel, warm probe cache), loading
+templates, checking a template for errors and updating (copying) files. Each benchmark is run
+several times and the best/median times are recorded, along with the commit and machine details,
+in a JSON results file so runs can be compared across commits.
+
+Usage:
+    python benchmarks/bench_tasks.py [--scales small,medium] [--repeats 3] [--out results.json]
+    python benchmarks/bench_tasks.py --compare old.json new.json
+"""
+
+#-----------------------------imports
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys_repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if sys_repo_dir not in sys.path: sys.path.insert(0, sys_repo_dir)
+import corpus
+import media_probe
+import media_tasks
+from job_engine import job_progress
+from probe_cache import probe_cache
+from update_journal import update_journal
+from media_core import CONST_openType
+
+#-----------------------------supporting methods, classes, constants
+#--constant dict of the benchmark scales
+CONST_bench_scales = {'small':{'media':200, 'other':2000, 'rows':2000, 'updates':100, 'media_size':64*1024},
+                      'medium':{'media':2000, 'other':20000, 'rows':20000, 'updates':500, 'media_size':256*1024},
+                      'large':{'media':10000, 'other':100000, 'rows':200000, 'updates':2000, 'media_size':1024*1024}}
+
+#--misc constants
+sys_probe_sample = 200                  #files probed one at a time for the single file benchmark
+sys_results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')  #default results location
+
+def get_commit():
+    """function returns the current commit and if the tree has changes, None if not a git checkout"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=sys_repo_dir, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=sys_repo_dir,
+                               capture_output=True, text=True, check=True).stdout.strip() != ''
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+def time_func(func, repeats, setup=None):
+    """function times the passed function, running it several times
+
+    :param func: function to time, called with no arguments
+    :type func: callable
+    :param repeats: number of runs
+    :type repeats: `int`
+    :param setup: called (untimed) before each run
+    :type setup: callable
+    :returns: best and median run time in seconds, result of the last run
+    :rtype: `float`, `float`, any
+    """
+    times = []; result = None
+    for _ in range(max(1, repeats)):
+        if setup is not None: setup()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter()-start)
+    return min(times), statistics.median(times), result
+
+def record(results, name, best, median, items, **kwargs):
+    """function adds a benchmark result, with the throughput of the best run"""
+    results[name] = {'best_sec':round(best, 6), 'median_sec':round(median, 6), 'items':items,
+                     'items_per_sec':round(items/best, 1) if best > 0 else None, **kwargs}
+    print(f"  {name:<32} {best:>9.3f} s  {results[name]['items_per_sec'] or 0:>12.1f} items/s")
+
+def run_scale(scale, config, work_dir, repeats, workers):
+    """function generates the corpus for a scale and runs every benchmark on it
+
+    :param scale: scale name
+    :type scale: `string`
+    :param config: scale settings, see `CONST_bench_scales`
+    :type config: `dict`
+    :param work_dir: directory to create the corpus in
+    :type work_dir: `os` path
+    :param repeats: runs per benchmark
+    :type repeats: `int`
+    :param workers: worker processes for the parallel parse and copy threads for the update
+    :type workers: `int`
+    :returns: results {benchmark name: result}
+    :rtype: `dict`
+    """
+    results = {}; progress = job_progress()
+    tree = os.path.join(work_dir, 'tree'); updated = os.path.join(work_dir, 'updated')
+
+    start = time.perf_counter()
+    media = corpus.make_media_tree(tree, config['media'], config['other'], media_size=config['media_size'])
+    src_files = sorted(media)
+    rows = corpus.make_template_rows(src_files, updated, config['rows'])
+    tmplt_csv = os.path.join(work_dir, 'template.csv'); corpus.write_template(tmplt_csv, rows)
+    print(f"  corpus generated in {time.perf_counter()-start:.1f} s")
+
+    #--single file probes
+    sample = src_files[:sys_probe_sample]
+    def probe_sample(): return [media_probe.get_mediafile_rawdir(path) for path in sample]
+    best, median, durs = time_func(probe_sample, repeats)
+    wrong = sum(1 for path, (dur, ok, _, _) in zip(sample, durs) if ok != (media[path] is not None) or (ok and dur != round(media[path], 0)))
+    record(results, 'get_mediafile_rawdir', best, median, len(sample), wrong=wrong)
+
+    #--directory parse, one worker, in parallel and with a warm cache
+    def parse(workers, cache=None): return lambda: media_tasks.parse_dir_mediafiles(progress, tree, CONST_openType['dir'], cache, workers)
+    best, median, files = time_func(parse(1), repeats)
+    record(results, 'parse_dir_mediafiles[1]', best, median, len(files), found=len(files))
+    best, median, files = time_func(parse(workers), repeats)
+    record(results, 'parse_dir_mediafiles[parallel]', best, median, len(files), found=len(files), workers=workers)
+    cache = probe_cache(os.path.join(work_dir, 'probe_cache.sqlite'))
+    try:
+        parse(workers, cache)()                                         #fill the cache
+        best, median, files = time_func(parse(workers, cache), repeats)
+        record(results, 'parse_dir_mediafiles[cached]', best, median, len(files), workers=workers)
+    finally:
+        cache.close()
+
+    #--template loading and error check
+    best, median, loaded = time_func(lambda: media_tasks.get_files_to_update(tmplt_csv), repeats)
+    record(results, 'get_files_to_update[csv]', best, median, len(loaded))
+    try:
+        tmplt_xlsx = os.path.join(work_dir, 'template.xlsx'); corpus.write_template(tmplt_xlsx, rows)
+        best, median, loaded = time_func(lambda: media_tasks.get_files_to_update(tmplt_xlsx), repeats)
+        record(results, 'get_files_to_update[xlsx]', best, median, len(loaded))
+    except ImportError:
+        print("  get_files_to_update[xlsx]        skipped, openpyxl not installed")
+    best, median, errors = time_func(lambda: media_tasks.update_files_error_check(progress, rows), repeats)
+    record(results, 'update_files_error_check', best, median, len(rows), errors=len(errors))
+    best, median, (_, errors) = time_func(lambda: media_tasks.load_and_check_template(progress, tmplt_csv), repeats)
+    record(results, 'load_and_check_template', best, median, len(rows), errors=len(errors))
+
+    #--file updates (copies, journaled), the output directory is removed before each run
+    upd_rows = [(src, os.path.join(updated, 'copies', os.path.relpath(src, tree))) for src in src_files[:config['updates']]]
+    upd_tmplt = os.path.join(work_dir, 'update.csv'); corpus.write_template(upd_tmplt, upd_rows)
+    def clear_updated(): shutil.rmtree(os.path.join(updated, 'copies'), ignore_errors=True)
+    def update(): return media_tasks.update_media_files(progress, upd_rows, False, workers, update_journal(upd_tmplt))
+    best, median, transfers = time_func(update, repeats, clear_updated)
+    num_bytes = sum(t.nbytes for t in transfers)
+    record(results, 'update_media_files', best, median, len(transfers), bytes=num_bytes,
+           bytes_per_sec=round(num_bytes/best, 1) if best > 0 else None)
+    return results
+
+def compare_results(old_path, new_path):
+    """function prints the change in the best times between two results files
+
+    :returns: exit code
+    :rtype: `int`
+    """
+    with open(old_path, 'r') as f: old = json.load(f)
+    with open(new_path, 'r') as f: new = json.load(f)
+    print(f"{'':<8} {'benchmark':<32} {old.get('commit') or 'old':>10} {new.get('commit') or 'new':>10}   change")
+    for scale, new_scale in new['scales'].items():
+        old_results = old['scales'].get(scale, {}).get('results', {})
+        for name, res in new_scale['results'].items():
+            old_res = old_results.get(name)
+            if old_res is None: print(f"{scale:<8} {name:<32} {'-':>10} {res['best_sec']:>10.3f}"); continue
+            change = (res['best_sec']-old_res['best_sec'])/old_res['best_sec']*100 if old_res['best_sec'] > 0 else 0.0
+            print(f"{scale:<8} {name:<32} {old_res['best_sec']:>10.3f} {res['best_sec']:>10.3f}   {change:+.1f}%")
+    return 0
+
+def main(argv=None):
+    """function runs the benchmarks
+
+    :returns: exit code
+    :rtype: `int`
+    """
+    parser = argparse.ArgumentParser(description='Time the media tasks on a generated corpus and record the results as JSON.')
+    parser.add_argument('--scales', default='small', help=f"comma separated scales to run, of {', '.join(CONST_bench_scales)} (default: small)")
+    parser.add_argument('--repeats', type=int, default=3, help='runs per benchmark, the best is compared (default: 3)')
+    parser.add_argument('--workers', type=int, default=media_tasks.sys_probe_workers,
+                        help=f'parallel parse processes/copy threads (default: {media_tasks.sys_probe_workers})')
+    parser.add_argument('--work-dir', help='directory to create the corpus in (default: a temp directory, removed after)')
+    parser.add_argument('--out', help='results file (default: benchmarks/results/<date>_<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two results files instead of running')
+    args = parser.parse_args(argv)
+    if args.compare is not None: return compare_results(*args.compare)
+
+    scales = [s.strip() for s in args.scales.split(',') if s.strip() != '']
+    for scale in scales:
+        if scale not in CONST_bench_scales: parser.error(f"unknown scale: {scale}")
+
+    commit, dirty = get_commit()
+    report = {'commit':commit, 'dirty':dirty, 'created':datetime.datetime.now().isoformat(timespec='seconds'),
+              'python':platform.python_version(), 'platform':platform.platform(), 'cpus':os.cpu_count(),
+              'repeats':args.repeats, 'workers':args.workers, 'scales':{}}
+    base_dir = args.work_dir if args.work_dir is not None else tempfile.mkdtemp(prefix='media_bench_')
+    try:
+        for scale in scales:
+            print(f"{scale}:")
+            work_dir = os.path.join(base_dir, scale)
+            shutil.rmtree(work_dir, ignore_errors=True)
+            os.makedirs(work_dir)
+            report['scales'][scale] = {'config':CONST_bench_scales[scale],
+                                       'results':run_scale(scale, CONST_bench_scales[scale], work_dir, args.repeats, args.workers)}
+    finally:
+        if args.work_dir is None: shutil.rmtree(base_dir, ignore_errors=True)
+
+    out_path = args.out
+    if out_path is None:
+        os.makedirs(sys_results_dir, exist_ok=True)
+        out_path = os.path.join(sys_results_dir, datetime.datetime.now().strftime('%Y%m%d_%H%M%S')+'_'+(commit or 'nogit')+'.json')
+    with open(out_path, 'w') as f: json.dump(report, f, indent=1)
+    print(f"results written to {out_path}")
+    return 0
+
+#-----------------------------main
+if __name__ == "__main__":
+    sys.exit(main())
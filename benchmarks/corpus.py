@@ -0,0 +1,267 @@
+"""
+Synthetic corpus generator for the benchmarks.
+
+Everything is generated locally from a seed, so the same scale gives the same corpus on every run:
+- minimal valid Matroska files with a known duration (Info at the start, or after the media data
+  through a SeekHead), padded to a set size
+- minimal MP4 (movie box at the start or the end), AVI and MPEG-TS files with a known duration, for
+  corpora that mix formats
+- directory trees of media files mixed with many non-media files
+- update templates (CSV, or XLSX if openpyxl is installed) with injected duplicate outputs and
+  missing input files
+
+Usage (to keep a corpus around for manual testing):
+    python benchmarks/corpus.py <output dir> [--media 200] [--other 2000] [--rows 1000] [--formats mkv,mp4,avi,ts]
+"""
+
+#-----------------------------imports
+import argparse
+import csv
+import os
+import random
+import struct
+import sys
+
+sys_repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if sys_repo_dir not in sys.path: sys.path.insert(0, sys_repo_dir)
+from media_probe import CONST_mkv_ids
+from media_core import sys_tmplt_oldFile_hdrName, sys_tmplt_newFile_hdrName
+
+#-----------------------------supporting methods, classes, constants
+#--misc constants
+sys_mkv_void_id = 0xEC                      #EBML void element, used for padding
+sys_other_exts = ['.nfo', '.jpg', '.srt', '.txt', '.sub', '.png']   #non-media files mixed in to the tree
+sys_mp4_timescale = 1000                    #movie header time units per second
+sys_avi_usec_per_frame = 40000              #25 fps
+sys_ts_packet = 188                         #TS packet size
+
+def ebml_size(n):
+    """function encodes an EBML element data size"""
+    for size_len in range(1, 9):
+        if n < (1 << (7*size_len))-1: return (n | (1 << (7*size_len))).to_bytes(size_len, 'big')
+    raise ValueError("EBML size too large")
+
+def ebml_element(eid, data):
+    """function encodes an EBML element with the passed ID (marker bits included) and data"""
+    return eid.to_bytes((eid.bit_length()+7)//8, 'big') + ebml_size(len(data)) + data
+
+def ebml_uint(n, size=None):
+    """function encodes an unsigned int, with a fixed size if passed"""
+    return n.to_bytes(size if size is not None else max(1, (n.bit_length()+7)//8), 'big')
+
+def make_mkv_bytes(duration_sec, size=4096, info_last=False):
+    """function builds a minimal Matroska file with the passed duration
+
+    :param duration_sec: duration in seconds, None to leave the duration out
+    :type duration_sec: `float`
+    :param size: approx file size in bytes, padded with a void element
+    :type size: `int`
+    :param info_last: put the Info element after the padding, found through a SeekHead
+    :type info_last: `bool`
+    :returns: file contents
+    :rtype: `bytes`
+    """
+    ids = CONST_mkv_ids
+    header = ebml_element(ids['ebml'], ebml_element(ids['doctype'], b'matroska'))
+    info_data = ebml_element(ids['timescale'], ebml_uint(1000000))
+    if duration_sec is not None: info_data += ebml_element(ids['duration'], struct.pack('>d', duration_sec*1000.0))
+    info = ebml_element(ids['info'], info_data)
+    pad = ebml_element(sys_mkv_void_id, b'\x00'*max(0, size-len(header)-len(info)-64))
+    if info_last:
+        seek = lambda pos: ebml_element(ids['seekhead'], ebml_element(ids['seek'], ebml_element(ids['seek_id'], ebml_uint(ids['info'])) +
+                                                                                   ebml_element(ids['seek_pos'], ebml_uint(pos, 8))))
+        seekhead_len = len(seek(0))
+        segment_data = seek(seekhead_len+len(pad)) + pad + info
+    else:
+        segment_data = info + pad
+    return header + ebml_element(ids['segment'], segment_data)
+
+def mp4_box(box_type, data):
+    """function encodes a MP4 box"""
+    return struct.pack('>I4s', 8+len(data), box_type) + data
+
+def make_mp4_bytes(duration_sec, size=4096, moov_last=False):
+    """function builds a minimal MP4 file with the passed duration
+
+    :param duration_sec: duration in seconds, None to leave the duration out (zero)
+    :type duration_sec: `float`
+    :param size: approx file size in bytes, padded with the media data box
+    :type size: `int`
+    :param moov_last: put the movie box after the media data
+    :type moov_last: `bool`
+    :returns: file contents
+    :rtype: `bytes`
+    """
+    duration = int(duration_sec*sys_mp4_timescale) if duration_sec is not None else 0
+    ftyp = mp4_box(b'ftyp', b'isom' + struct.pack('>I', 512) + b'isomiso2mp41')
+    mvhd = mp4_box(b'mvhd', b'\x00\x00\x00\x00' + struct.pack('>IIII', 0, 0, sys_mp4_timescale, duration) + b'\x00'*80)
+    moov = mp4_box(b'moov', mvhd)
+    mdat = mp4_box(b'mdat', b'\x00'*max(0, size-len(ftyp)-len(moov)-8))
+    return ftyp + (mdat + moov if moov_last else moov + mdat)
+
+def riff_chunk(chunk_id, data, list_type=None):
+    """function encodes a RIFF chunk, a LIST chunk if a list type is passed"""
+    if list_type is not None: data = list_type + data
+    return struct.pack('<4sI', b'LIST' if list_type is not None else chunk_id, len(data)) + data + b'\x00'*(len(data) & 1)
+
+def make_avi_bytes(duration_sec, size=4096):
+    """function builds a minimal AVI file with the passed duration (in whole frames)
+
+    :param duration_sec: duration in seconds, None to leave the duration out (no frames)
+    :type duration_sec: `float`
+    :param size: approx file size in bytes, padded with the movie list
+    :type size: `int`
+    :returns: file contents
+    :rtype: `bytes`
+    """
+    frames = int(round(duration_sec*1e6/sys_avi_usec_per_frame)) if duration_sec is not None else 0
+    avih = riff_chunk(b'avih', struct.pack('<14I', sys_avi_usec_per_frame, 0, 0, 0, frames, 0, 1, 0, 0, 0, 0, 0, 0, 0))
+    hdrl = riff_chunk(None, avih, b'hdrl')
+    movi = riff_chunk(None, b'\x00'*max(0, size-len(hdrl)-24), b'movi')
+    body = b'AVI ' + hdrl + movi
+    return struct.pack('<4sI', b'RIFF', len(body)) + body
+
+def make_ts_packet(pid, pcr=None):
+    """function builds a MPEG-TS packet for the passed PID, with a PCR in its adaptation field if passed"""
+    if pcr is None: return bytes([0x47, pid >> 8, pid & 0xFF, 0x10]) + b'\xFF'*184
+    adapt = bytes([183, 0x10]) + struct.pack('>IH', pcr >> 1, ((pcr & 1) << 15) | 0x7E00)
+    return bytes([0x47, pid >> 8, pid & 0xFF, 0x30]) + adapt + b'\xFF'*(184-len(adapt))
+
+def make_ts_bytes(duration_sec, size=4096, pid=0x100, start_pcr=900000):
+    """function builds a minimal MPEG-TS file with the passed duration, between the first and last PCR
+
+    :param duration_sec: duration in seconds, None to leave the PCRs out
+    :type duration_sec: `float`
+    :param size: approx file size in bytes, padded with payload packets
+    :type size: `int`
+    :param pid: PID of the packets
+    :type pid: `int`
+    :param start_pcr: first PCR base (90kHz)
+    :type start_pcr: `int`
+    :returns: file contents
+    :rtype: `bytes`
+    """
+    num_packets = max(2, size//sys_ts_packet)
+    if duration_sec is None: return make_ts_packet(pid)*num_packets
+    end_pcr = (start_pcr + int(duration_sec*90000)) % (1 << 33)
+    return make_ts_packet(pid, start_pcr) + make_ts_packet(pid)*(num_packets-2) + make_ts_packet(pid, end_pcr)
+
+#--constant dict of the media file generators, {format: (extension, function(duration, size, random) returning the file contents)}
+CONST_media_makers = {'mkv':('.mkv', lambda dur, size, rand: make_mkv_bytes(dur, size, info_last=rand.random() < 0.2)),
+                      'mp4':('.mp4', lambda dur, size, rand: make_mp4_bytes(dur, size, moov_last=rand.random() < 0.5)),
+                      'avi':('.avi', lambda dur, size, rand: make_avi_bytes(dur, size)),
+                      'ts':('.ts', lambda dur, size, rand: make_ts_bytes(dur, size))}
+
+def make_media_tree(root, num_media, num_other, depth=3, fanout=4, media_size=4096, seed=0, formats=('mkv',)):
+    """function creates a directory tree of media files with known durations mixed with non-media files
+
+    :param root: directory to create the tree in
+    :type root: `os` path
+    :param num_media: number of media files
+    :type num_media: `int`
+    :param num_other: number of non-media files
+    :type num_other: `int`
+    :param depth: directory levels below the root
+    :type depth: `int`
+    :param fanout: sub directories per directory
+    :type fanout: `int`
+    :param media_size: approx media file size in bytes
+    :type media_size: `int`
+    :param seed: random seed, the same seed gives the same tree
+    :type seed: `int`
+    :param formats: media formats to create, `CONST_media_makers` keys, used in turn
+    :type formats: `list` of `string`
+    :returns: media files created, {file path: duration in seconds (None if left out)}
+    :rtype: `dict`
+    """
+    rand = random.Random(seed)
+    dirs = [root]; level = [root]
+    for d in range(depth):
+        level = [os.path.join(parent, f'dir{d}_{i}') for parent in level for i in range(fanout)]
+        dirs.extend(level)
+    for dir_path in dirs: os.makedirs(dir_path, exist_ok=True)
+
+    media = {}
+    for i in range(num_media):
+        duration = None if rand.random() < 0.02 else float(rand.randint(60, 4*3600))   #a few files without a duration
+        ext, make_bytes = CONST_media_makers[formats[i % len(formats)]]
+        path = os.path.join(rand.choice(dirs), f'media_{i:07d}{ext}')
+        with open(path, 'wb') as f: f.write(make_bytes(duration, media_size, rand))
+        media[path] = duration
+    for i in range(num_other):
+        path = os.path.join(rand.choice(dirs), f'other_{i:07d}'+rand.choice(sys_other_exts))
+        with open(path, 'wb') as f: f.write(b'x'*rand.randint(0, 256))
+    return media
+
+def make_template_rows(src_files, dst_root, num_rows, dup_rate=0.01, missing_rate=0.01, seed=0):
+    """function builds update template rows, with some duplicate outputs and missing inputs injected
+
+    :param src_files: existing files to use as inputs, reused if there are fewer than the rows
+    :type src_files: `list` of `os` path
+    :param dst_root: directory the outputs are in
+    :type dst_root: `os` path
+    :param num_rows: number of rows
+    :type num_rows: `int`
+    :param dup_rate: fraction of rows with an output that is already used
+    :type dup_rate: `float`
+    :param missing_rate: fraction of rows with an input that doesn't exist
+    :type missing_rate: `float`
+    :param seed: random seed
+    :type seed: `int`
+    :returns: rows of (old file, new file)
+    :rtype: `list` of `tuple`
+    """
+    rand = random.Random(seed)
+    rows = []
+    for i in range(num_rows):
+        src = src_files[i % len(src_files)] if len(src_files) > 0 else ''
+        if src == '' or rand.random() < missing_rate: src = os.path.join(dst_root, 'missing', f'missing_{i:07d}.mkv')
+        if len(rows) > 0 and rand.random() < dup_rate: dst = rand.choice(rows)[1]
+        else: dst = os.path.join(dst_root, f'show_{i//100:05d}', f'episode_{i:07d}.mkv')
+        rows.append((src, dst))
+    return rows
+
+def write_template(path, rows):
+    """function writes update template rows to a CSV or XLSX (needs openpyxl) file, by the file extension
+
+    :param path: template file to create
+    :type path: `os` path
+    :param rows: rows of (old file, new file)
+    :type rows: `list` of `tuple`
+    """
+    if path.lower().endswith('.xlsx'):
+        import openpyxl
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append([sys_tmplt_oldFile_hdrName, sys_tmplt_newFile_hdrName])
+        for row in rows: sheet.append(list(row))
+        workbook.save(path)
+    else:
+        with open(path, 'w', newline='', encoding='utf-8') as out_csv:
+            file_writer = csv.writer(out_csv, delimiter=',')
+            file_writer.writerow([sys_tmplt_oldFile_hdrName, sys_tmplt_newFile_hdrName])
+            file_writer.writerows(rows)
+
+def main(argv=None):
+    """function creates a corpus in the passed directory"""
+    parser = argparse.ArgumentParser(description='Create a synthetic media corpus and update template.')
+    parser.add_argument('out_dir', help='directory to create the corpus in')
+    parser.add_argument('--media', type=int, default=200, help='media files (default: 200)')
+    parser.add_argument('--other', type=int, default=2000, help='non-media files (default: 2000)')
+    parser.add_argument('--rows', type=int, default=1000, help='template rows (default: 1000)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--formats', default='mkv', help=f"comma separated media formats, of {', '.join(CONST_media_makers)} (default: mkv)")
+    args = parser.parse_args(argv)
+    formats = [f.strip() for f in args.formats.split(',') if f.strip() != '']
+    for fmt in formats:
+        if fmt not in CONST_media_makers: parser.error(f"unknown format: {fmt}")
+
+    media = make_media_tree(os.path.join(args.out_dir, 'tree'), args.media, args.other, seed=args.seed, formats=formats)
+    rows = make_template_rows(sorted(media), os.path.join(args.out_dir, 'updated'), args.rows, seed=args.seed)
+    write_template(os.path.join(args.out_dir, 'template.csv'), rows)
+    print(f"{len(media)} media files, {args.other} other files, {len(rows)} template rows in {args.out_dir}")
+    return 0
+
+#-----------------------------main
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,488 @@
+"""
+Parallel file transfer engine used when copying files for a template update.
+
+Files are copied kernel side where the OS supports it (`os.copy_file_range`, then `os.sendfile`),
+with sequential read-ahead hints on the source, falling back to a plain buffered copy. Transfers
+run in a thread pool, but each source/destination device only gets a limited number of transfers
+at once so a single spinning disk isn't thrashed while independent disks are kept busy.
+
+Verified transfers hash the source while it is copied (so it is only read once), then hash the
+destination once it is on disk in a separate pool of hashing threads, so the next copies carry on
+while earlier ones are checked. A copy whose checksums don't match is removed and the run stops.
+
+Copies don't have to be full copies of the data: depending on the placement mode of the run, a
+destination on the same device is placed as a hard link, and one on the same copy-on-write file
+system (btrfs, XFS, ...) as a reflink clone, falling back to a copy if that fails. The method is
+chosen per file from the device and file system of the source and destination.
+"""
+
+#-----------------------------imports
+import collections
+import errno
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from job_engine import job_canceled
+try: import fcntl                           #reflink clones, not on Windows
+except ImportError: fcntl = None
+
+#-----------------------------supporting methods, classes, constants
+#--misc constants
+sys_transfer_workers = 8                    #max transfers running at once
+sys_transfer_per_device = 2                 #max transfers reading from/writing to one device at once
+sys_transfer_chunk = 16*1024*1024           #bytes copied per kernel call, also the cancel check interval
+sys_transfer_poll_sec = 0.2                 #interval to check for a cancel while waiting on transfers
+sys_hash_workers = 4                        #max destination files being hashed at once when verifying
+sys_hash_chunk = 8*1024*1024                #bytes read at a time when hashing files
+sys_ficlone = 0x40049409                    #FICLONE ioctl, clones a whole file on a copy-on-write file system (Linux)
+sys_mounts_path = '/proc/self/mounts'       #mounted file systems (Linux)
+sys_partial_ext = '.partial'                #appended to the destination file name while it is copied/cloned
+
+#--constant dict for the placement modes of an update, how copies may be placed
+CONST_placement_modes = {'copy':'copy',         #always a full copy of the data
+                         'reflink':'reflink',   #clone on copy-on-write file systems, otherwise copy
+                         'auto':'auto'}         #hard link on the same device, else clone, else copy
+
+#--constant dict for the placement method of a single file
+CONST_placement_methods = {'hardlink':'hardlink',   #same file (inode), no data written
+                           'reflink':'reflink',     #separate file sharing the data blocks until changed
+                           'copy':'copy'}           #full copy, see `copy_file_fast`
+
+#--file system types that support reflink clones
+CONST_reflink_fs_types = {'btrfs', 'xfs', 'bcachefs', 'ocfs2', 'zfs'}
+
+#--errors meaning the kernel copy method isn't supported for this pair of files, so try the next method
+CONST_copy_fallback_errnos = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EBADF, errno.EPERM,
+                              getattr(errno, 'ENOTSUP', errno.EINVAL), getattr(errno, 'EOPNOTSUPP', errno.EINVAL)}
+
+#--errors meaning a hard link can't be made here (or the file has too many), so clone/copy instead
+CONST_link_fallback_errnos = CONST_copy_fallback_errnos | {errno.EMLINK, errno.EACCES}
+
+class transfer_verify_error(OSError):
+    """exception raised when a copied file's checksum doesn't match its source"""
+    pass
+
+def new_file_hasher():
+    """function returns a new hash object for file checksums (BLAKE2b)"""
+    return hashlib.blake2b()
+
+def get_file_checksum(path):
+    """function returns the checksum (BLAKE2b) of the file at the passed path
+
+    :param path: file to hash
+    :type path: `os` path
+    :returns: hex digest
+    :rtype: `string`
+    """
+    h = new_file_hasher()
+    with open(path, 'rb') as f:
+        fadvise(f.fileno(), getattr(os, 'POSIX_FADV_SEQUENTIAL', 0))
+        while True:
+            buf = f.read(sys_hash_chunk)
+            if len(buf) == 0: break
+            h.update(buf)
+    return h.hexdigest()
+
+class file_transfer:
+    def __init__(self, src, dst, placement=CONST_placement_methods['copy']):
+        """class containing a single file transfer and its result
+
+        :param src: file to copy
+        :type src: `os` path
+        :param dst: destination file path, its directory must exist
+        :type dst: `os` path
+        :param placement: placement method to try first, falls back to the next method if it fails
+        :type placement: `CONST_placement_methods` entry
+        """
+        self.src = src                                  #source file path
+        self.dst = dst                                  #destination file path
+        self.placement = placement                      #placement method to try first
+        st = os.stat(src)
+        self.nbytes = st.st_size                        #bytes to copy
+        self.src_dev = st.st_dev                        #source device
+        self.dst_dev = os.stat(os.path.dirname(dst) or '.').st_dev    #destination device
+        self.seconds = None                             #time taken to copy, once done
+        self.method = None                              #placement/copy method used, once done
+        self.src_checksum = None                        #checksum of the data read from the source, if verified
+        self.dst_checksum = None                        #checksum of the destination on disk, if verified
+        self.verified = False                           #true once the checksums match
+        self.replace = False                            #destination may be a partial output of this transfer, see `link_file`
+
+    def get_devices(self):
+        """function returns the set of devices the transfer uses"""
+        return {self.src_dev, self.dst_dev}
+
+    def get_throughput(self):
+        """function returns the transfer throughput in bytes/sec, None if not done yet"""
+        if self.seconds is None: return None
+        return self.nbytes/max(self.seconds, 1e-6)
+
+def fadvise(fd, advice):
+    """function gives the OS a file access hint, ignored where not supported"""
+    if hasattr(os, 'posix_fadvise'):
+        try: os.posix_fadvise(fd, 0, 0, advice)
+        except OSError: pass
+
+def copy_file_fast(src, dst, stop_event=None, on_bytes=None, hasher=None):
+    """function copies a file (data and permission bits, like `shutil.copy`) using the fastest method the
+    OS supports. The data is written to a ".partial" file next to the destination, which replaces the
+    destination once the copy is done and is removed if the copy fails or is stopped, so an existing
+    destination is never left truncated or removed by a failed copy.
+
+    With a hasher, the data is copied through a buffer so it can be hashed as it is read, and the
+    destination is synced to disk and dropped from the cache so hashing it later reads what's on disk.
+
+    :param src: file to copy
+    :type src: `os` path
+    :param dst: destination file path
+    :type dst: `os` path
+    :param stop_event: copy stops (raising `job_canceled`) between chunks once this is set
+    :type stop_event: `threading.Event`
+    :param on_bytes: called with the number of bytes copied after each chunk
+    :type on_bytes: callable
+    :param hasher: hash object updated with the source data, None to not hash
+    :type hasher: `hashlib` hash object
+    :returns: copy method used ('copy_file_range', 'sendfile' or 'buffered')
+    :rtype: `string`
+    """
+    def chunk_done(n):
+        """function reports a copied chunk and checks for a stop request"""
+        if on_bytes is not None: on_bytes(n)
+        if stop_event is not None and stop_event.is_set(): raise job_canceled()
+
+    method = None
+    partial_path = dst + sys_partial_ext
+    try:
+        with open(src, 'rb') as fsrc, open(partial_path, 'wb') as fdst:
+            src_fd = fsrc.fileno(); dst_fd = fdst.fileno()
+            fadvise(src_fd, getattr(os, 'POSIX_FADV_SEQUENTIAL', 0))   #large sequential read, bigger read-ahead
+
+            #--kernel side copy, can be a server side copy or reflink on network/CoW file systems
+            if hasattr(os, 'copy_file_range') and hasher is None:
+                method = 'copy_file_range'
+                try:
+                    while True:
+                        n = os.copy_file_range(src_fd, dst_fd, sys_transfer_chunk)
+                        if n == 0: break
+                        chunk_done(n)
+                except OSError as e:
+                    if e.errno not in CONST_copy_fallback_errnos: raise
+                    method = None                       #not supported here, carry on from the current offsets
+
+            #--kernel side copy through the page cache
+            if method is None and hasattr(os, 'sendfile') and hasher is None:
+                method = 'sendfile'
+                try:
+                    while True:
+                        n = os.sendfile(dst_fd, src_fd, None, sys_transfer_chunk)
+                        if n == 0: break
+                        chunk_done(n)
+                except OSError as e:
+                    if e.errno not in CONST_copy_fallback_errnos: raise
+                    method = None
+
+            #--plain buffered copy
+            if method is None:
+                method = 'buffered'
+                fdst.seek(fsrc.tell())                  #carry on from where a failed method stopped
+                while True:
+                    buf = fsrc.read(sys_transfer_chunk)
+                    if len(buf) == 0: break
+                    if hasher is not None: hasher.update(buf)
+                    fdst.write(buf)
+                    chunk_done(len(buf))
+            fadvise(src_fd, getattr(os, 'POSIX_FADV_DONTNEED', 0))     #don't push everything else out of the cache
+            if hasher is not None:
+                fdst.flush(); os.fsync(dst_fd)                          #on disk before it is hashed
+                fadvise(dst_fd, getattr(os, 'POSIX_FADV_DONTNEED', 0))     #so hashing reads it back from disk
+        shutil.copymode(src, partial_path)
+        os.replace(partial_path, dst)
+    except BaseException:
+        if os.path.isfile(partial_path): os.remove(partial_path)  #don't leave a partial copy behind
+        raise
+    return method
+
+def link_file(src, dst, replace=False):
+    """function places a file as a hard link. An existing destination that is a different file raises
+    `FileExistsError`, unless it is known to be a partial output of the same transfer.
+
+    :param src: existing file
+    :type src: `os` path
+    :param dst: destination file path, its directory must exist
+    :type dst: `os` path
+    :param replace: the destination may be a partial output of this transfer (started before an update was
+        interrupted), so it is replaced
+    :type replace: `bool`
+    """
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        if os.path.samefile(src, dst): return   #already linked (e.g. an update being resumed)
+        if not replace: raise
+        os.remove(dst)
+        os.link(src, dst)
+
+def clone_file(src, dst):
+    """function places a file as a reflink clone (copy-on-write, no data is copied), Linux only. Like
+    `copy_file_fast`, the clone is made as a ".partial" file that only replaces the destination once done.
+
+    :param src: existing file
+    :type src: `os` path
+    :param dst: destination file path, its directory must be on the same file system
+    :type dst: `os` path
+    """
+    if fcntl is None: raise OSError(errno.ENOSYS, "Reflink clones are not supported on this OS")
+    partial_path = dst + sys_partial_ext
+    try:
+        with open(src, 'rb') as fsrc, open(partial_path, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), sys_ficlone, fsrc.fileno())
+        shutil.copymode(src, partial_path)
+        os.replace(partial_path, dst)
+    except BaseException:
+        if os.path.isfile(partial_path): os.remove(partial_path)
+        raise
+
+def place_file(src, dst, placement=CONST_placement_methods['copy'], stop_event=None, on_bytes=None, hasher=None, replace=False):
+    """function places a copy of a file with the passed placement method, falling back to a clone and then
+    a copy when the method isn't supported for this pair of files. A hasher is only updated by a copy.
+
+    :param src: file to copy
+    :type src: `os` path
+    :param dst: destination file path, its directory must exist
+    :type dst: `os` path
+    :param placement: placement method to try first
+    :type placement: `CONST_placement_methods` entry
+    :param stop_event: see `copy_file_fast`
+    :type stop_event: `threading.Event`
+    :param on_bytes: see `copy_file_fast`, called once with the file size for links/clones
+    :type on_bytes: callable
+    :param hasher: see `copy_file_fast`
+    :type hasher: `hashlib` hash object
+    :param replace: see `link_file`
+    :type replace: `bool`
+    :returns: method used ('hardlink', 'reflink' or the copy method)
+    :rtype: `string`
+    """
+    method = None
+    if placement == CONST_placement_methods['hardlink']:
+        try:
+            link_file(src, dst, replace); method = CONST_placement_methods['hardlink']
+        except OSError as e:
+            if e.errno not in CONST_link_fallback_errnos: raise
+    if method is None and placement in (CONST_placement_methods['hardlink'], CONST_placement_methods['reflink']):
+        try:
+            clone_file(src, dst); method = CONST_placement_methods['reflink']
+        except OSError as e:
+            if e.errno not in CONST_copy_fallback_errnos and e.errno != errno.ENOTTY: raise
+    if method is None: return copy_file_fast(src, dst, stop_event, on_bytes, hasher)
+    if on_bytes is not None: on_bytes(os.path.getsize(dst))
+    return method
+
+def get_mount_table():
+    """function reads the mounted file systems, longest mount point first. Empty where not available (not Linux).
+
+    :returns: mounted file systems [(mount point, source device, file system type)]
+    :rtype: `list` of `tuple`
+    """
+    unescape = lambda text: re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), text)    #spaces etc are octal escaped
+    mounts = []
+    try:
+        with open(sys_mounts_path, 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3: mounts.append((unescape(fields[1]), unescape(fields[0]), fields[2]))
+    except OSError:
+        return []
+    mounts.sort(key=lambda mount: len(mount[0]), reverse=True)
+    return mounts
+
+class placement_planner:
+    def __init__(self, mode=CONST_placement_modes['copy']):
+        """class that chooses the placement method of each file to copy from the device and file system
+        of the source and destination. Directory lookups are cached, so each directory is only checked once.
+
+        :param mode: placement mode of the update
+        :type mode: `CONST_placement_modes` entry
+        """
+        if mode not in CONST_placement_modes.values(): raise ValueError(f"Unknown placement mode: {mode}")
+        self.mode = mode
+        self.mounts = None                  #mounted file systems, read on first use
+        self.dir_info = {}                  #{directory: (device ID, (source device, file system type))}
+
+    def get_dir_info(self, dir_path):
+        """function returns the device and file system of a directory. A directory that doesn't exist yet
+        is looked up by its nearest existing parent, which it will be created in.
+
+        :param dir_path: directory path
+        :type dir_path: `os` path
+        :returns: device ID (None if not found), (source device, file system type) (None if not known)
+        :rtype: `int`, `tuple`
+        """
+        info = self.dir_info.get(dir_path)
+        if info is not None: return info
+        path = os.path.abspath(dir_path if dir_path != '' else '.')
+        while not os.path.isdir(path) and os.path.dirname(path) != path: path = os.path.dirname(path)
+        try: dev = os.stat(path).st_dev
+        except OSError: dev = None
+
+        if self.mounts is None: self.mounts = get_mount_table()
+        real_path = os.path.join(os.path.realpath(path), '')
+        fs = next(((source, fs_type) for mount_point, source, fs_type in self.mounts
+                   if real_path.startswith(os.path.join(mount_point, ''))), None)
+        info = self.dir_info[dir_path] = (dev, fs)
+        return info
+
+    def is_same_device(self, src, dst):
+        """function checks if a file and its destination are on the same device (so it can be renamed/linked)"""
+        src_dev = self.get_dir_info(os.path.dirname(src))[0]
+        return src_dev is not None and src_dev == self.get_dir_info(os.path.dirname(dst))[0]
+
+    def get_method(self, src, dst):
+        """function chooses the placement method for a copy of a file
+
+        :param src: file to copy
+        :type src: `os` path
+        :param dst: destination file path
+        :type dst: `os` path
+        :returns: placement method to try first
+        :rtype: `CONST_placement_methods` entry
+        """
+        if self.mode == CONST_placement_modes['copy']: return CONST_placement_methods['copy']
+        if self.mode == CONST_placement_modes['auto'] and self.is_same_device(src, dst): return CONST_placement_methods['hardlink']
+        src_fs = self.get_dir_info(os.path.dirname(src))[1]
+        dst_fs = self.get_dir_info(os.path.dirname(dst))[1]
+        if src_fs is not None and src_fs == dst_fs and src_fs[1] in CONST_reflink_fs_types:
+            return CONST_placement_methods['reflink']   #same file system (e.g. another btrfs subvolume)
+        return CONST_placement_methods['copy']
+
+def verify_transfer(t):
+    """function hashes the destination of a copied transfer and checks it against the source checksum
+    (hashing the source too if it wasn't read by the copy). A destination that doesn't match is removed
+    and `transfer_verify_error` is raised.
+
+    :param t: copied transfer, with its source checksum
+    :type t: `file_transfer` instance
+    :returns: the verified transfer
+    :rtype: `file_transfer` instance
+    """
+    if t.src_checksum is None: t.src_checksum = get_file_checksum(t.src)     #not read while placed (clone)
+    t.dst_checksum = get_file_checksum(t.dst)
+    if t.dst_checksum != t.src_checksum:
+        os.remove(t.dst)                        #bad copy, it must not be mistaken for a good one
+        raise transfer_verify_error(errno.EIO, f"Copy verification failed, checksums don't match: {t.src} -> {t.dst}")
+    t.verified = True
+    return t
+
+def copy_file_verified(src, dst, stop_event=None, on_bytes=None):
+    """function copies a single file, hashing the source as it is copied and the destination after
+
+    :param src: file to copy
+    :type src: `os` path
+    :param dst: destination file path, its directory must exist
+    :type dst: `os` path
+    :param stop_event: see `copy_file_fast`
+    :type stop_event: `threading.Event`
+    :param on_bytes: see `copy_file_fast`
+    :type on_bytes: callable
+    :returns: the verified transfer, with its checksums
+    :rtype: `file_transfer` instance
+    """
+    t = file_transfer(src, dst)
+    hasher = new_file_hasher()
+    t.method = copy_file_fast(src, dst, stop_event, on_bytes, hasher)
+    t.src_checksum = hasher.hexdigest()
+    return verify_transfer(t)
+
+def run_file_transfers(progress, transfers, workers=sys_transfer_workers, per_device=sys_transfer_per_device, on_start=None,
+                       verify=False, hash_workers=sys_hash_workers):
+    """function runs the passed transfers in a thread pool, limiting the number of transfers using each
+    device at once. Transfers between the same pair of devices start in the passed order. Progress is
+    stepped with the bytes as they are copied and once per finished file. If a transfer fails, the
+    others are stopped and the error is raised. When verifying, a transfer is only finished once its
+    destination has been hashed (in a separate pool) and matches the source.
+
+    :param progress: progress reporter, also checked for a cancel
+    :type progress: `job_progress` instance
+    :param transfers: transfers to run
+    :type transfers: `list` of `file_transfer` instance(s)
+    :param workers: max transfers running at once
+    :type workers: `int`
+    :param per_device: max transfers using one device at once
+    :type per_device: `int`
+    :param on_start: called with each transfer (on the calling thread) just before it starts
+    :type on_start: callable
+    :param verify: hash the source while copying and the destination after, see `verify_transfer`
+    :type verify: `bool`
+    :param hash_workers: max destinations being hashed at once when verifying
+    :type hash_workers: `int`
+    :returns: each transfer once it is done (and verified)
+    :rtype: generator of `file_transfer` instance
+    """
+    queues = collections.OrderedDict()          #{(src device, dst device): deque of waiting transfers}
+    for t in transfers: queues.setdefault((t.src_dev, t.dst_dev), collections.deque()).append(t)
+    dev_use = collections.Counter()             #{device: transfers running on it}
+    running = {}                                #{future: transfer}
+    hashing = {}                                #{future: transfer} copies being verified
+    stop_event = threading.Event()              #stops running transfers on a cancel/error
+
+    def run_one(t):
+        """function copies a single transfer on a worker thread and times it"""
+        start = time.monotonic(); start_perf = time.perf_counter()
+        hasher = new_file_hasher() if verify and t.placement == CONST_placement_methods['copy'] else None
+        t.method = place_file(t.src, t.dst, t.placement, stop_event, lambda n: progress.step(0, n), hasher, t.replace)
+        if hasher is not None and t.method not in CONST_placement_methods.values(): t.src_checksum = hasher.hexdigest()
+        t.seconds = time.monotonic()-start
+        progress.metrics.add_time('copy', start_perf, args={'file':t.dst, 'method':t.method, 'bytes':t.nbytes})
+        return t
+
+    def verify_one(t):
+        """function verifies a single transfer on a hash thread and times it"""
+        with progress.metrics.timer('verify', {'file':t.dst}): return verify_transfer(t)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    hash_pool = ThreadPoolExecutor(max_workers=max(1, hash_workers)) if verify else None
+    try:
+        while len(queues) > 0 or len(running) > 0 or len(hashing) > 0:
+            #--start waiting transfers whose devices have a free slot
+            for key in list(queues.keys()):
+                waiting = queues[key]
+                while len(running) < workers and len(waiting) > 0:
+                    devs = waiting[0].get_devices()
+                    if any(dev_use[d] >= per_device for d in devs): break
+                    t = waiting.popleft()
+                    for d in devs: dev_use[d] += 1
+                    if on_start is not None: on_start(t)
+                    running[pool.submit(run_one, t)] = t
+                if len(waiting) == 0: del queues[key]
+
+            #--wait for a transfer to finish, checking for a cancel while waiting
+            done, _ = wait(list(running)+list(hashing), timeout=sys_transfer_poll_sec, return_when=FIRST_COMPLETED)
+            if progress.is_canceled(): stop_event.set()
+            for fut in done:
+                if fut in hashing:
+                    t = hashing.pop(fut)
+                    fut.result()                #raises the verify error, if any
+                    progress.step(1)
+                    yield t
+                    continue
+                t = running.pop(fut)
+                for d in t.get_devices(): dev_use[d] -= 1
+                fut.result()                    #raises the transfer error, if any
+                progress.metrics.count('copy.files'); progress.metrics.count('copy.bytes', t.nbytes)
+                progress.metrics.count('copy.method.'+str(t.method))
+                if t.method == CONST_placement_methods['hardlink'] and verify:
+                    t.verified = True           #the same file, nothing to compare
+                elif hash_pool is not None:
+                    hashing[hash_pool.submit(verify_one, t)] = t        #device is free for the next copy meanwhile
+                    continue
+                progress.step(1)
+                yield t
+            progress.check_cancel()
+    finally:
+        stop_event.set()                        #stop anything still running on an error/cancel
+        pool.shutdown(wait=True, cancel_futures=True)
+        if hash_pool is not None: hash_pool.shutdown(wait=True, cancel_futures=True)
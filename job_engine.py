@@ -0,0 +1,256 @@
+"""
+Background job engine used to run long operations (parsing, error checks, file updates) off the
+GUI thread.
+
+A job runs its function on a worker thread and passes it a `job_progress` reporter. Progress and
+the final result are sent back through a thread-safe queue that the GUI polls (e.g. with `after()`),
+and a cancel request is checked by the job between files.
+
+Tasks count their work with `job_progress.start`/`step`. Steps are merged and only reported at a
+fixed rate, along with the throughput (items/sec, bytes/sec) and ETA, so per file loops don't pay for
+a progress update every item. Each stage is also timed in the progress reporter's `job_metrics`, and a
+job can be run under cProfile.
+"""
+
+#-----------------------------imports
+import cProfile
+import datetime
+import queue
+import threading
+import time
+import traceback
+from job_metrics import job_metrics
+
+#-----------------------------supporting methods, classes, constants
+#--constant dict for the job message types sent back through the queue
+CONST_job_msgs = {'progress':'progress',    #progress bar/label update, data is the update kwargs
+                  'done':'done',            #job finished, data is the function return value
+                  'canceled':'canceled',    #job was canceled by the user
+                  'error':'error'}          #job raised an exception, data is (exception, traceback text)
+
+#--misc constants
+sys_progress_interval = 0.05    #min seconds between progress reports while stepping (20 Hz)
+
+class job_canceled(Exception):
+    """exception raised inside a job when it has been asked to cancel"""
+    pass
+
+class job_progress:
+    def __init__(self):
+        """progress reporter passed to the task functions. Tracks the work done in the current stage and
+        reports it (rate limited) through `update`. The base class does not report anything, so it can
+        be used when running a task directly without a job."""
+        self.cancel_event = threading.Event()   #set when the job should stop
+        self.label = ''                         #current stage label
+        self.total = None                       #items in the current stage, None if not known (yet)
+        self.total_bytes = None                 #bytes in the current stage, None if not known
+        self.done = 0                           #items done in the current stage
+        self.bytes_done = 0                     #bytes done in the current stage
+        self.start_time = time.monotonic()      #time the current stage started
+        self.last_report = 0.0                  #time of the last progress report
+        self.lock = threading.Lock()            #steps can come from several worker threads
+        self.metrics = job_metrics()            #counters/timers of the job, replace before starting to trace
+        self.stage_perf = None                  #`time.perf_counter` start of the current stage, None if not started
+
+    def update(self, kwargs):
+        """function reports a progress update
+
+        :param kwargs: progress update, see `wndw_Main.progress_bar_update`. Updates made by the
+            stage tracking also include a 'stats' entry, see `get_stats`
+        :type kwargs: `dict`
+        """
+        pass
+
+    def start(self, label, total=None, total_bytes=None):
+        """function starts a new stage of work and reports it right away
+
+        :param label: stage label shown to the user
+        :type label: `string`
+        :param total: number of items in the stage, None if not known yet
+        :type total: `int`
+        :param total_bytes: number of bytes in the stage, None if not tracking bytes
+        :type total_bytes: `int`
+        """
+        self.finish()
+        self.label = label; self.total = total; self.total_bytes = total_bytes
+        self.done = 0; self.bytes_done = 0
+        self.start_time = time.monotonic()
+        self.stage_perf = time.perf_counter()
+        self.report()
+
+    def finish(self):
+        """function ends the current stage, called when the next stage starts or the job ends. The stage is
+        reported once more (not rate limited) so the last report has its final counts, then its timing ends"""
+        if self.stage_perf is None: return
+        with self.lock: self.report()
+        self.metrics.add_time('stage:'+self.label, self.stage_perf, args={'done':self.done, 'bytes':self.bytes_done})
+        self.stage_perf = None
+
+    def set_total(self, total=None, total_bytes=None):
+        """function sets the stage totals once they are known (e.g. when a directory walk finishes)"""
+        if total is not None: self.total = total
+        if total_bytes is not None: self.total_bytes = total_bytes
+
+    def step(self, items=1, nbytes=0):
+        """function counts work done in the current stage. A report is only sent if enough time has
+        passed since the last one, or when the stage is complete.
+
+        :param items: number of items done
+        :type items: `int`
+        :param nbytes: number of bytes done
+        :type nbytes: `int`
+        """
+        with self.lock:
+            self.done += items; self.bytes_done += nbytes
+            now = time.monotonic()
+            if now-self.last_report >= sys_progress_interval or (self.total is not None and self.done >= self.total):
+                self.report(now)
+
+    def get_stats(self, now=None):
+        """function returns the progress numbers of the current stage
+
+        :returns: dict of label, done, total, bytes_done, total_bytes, elapsed (sec), items_per_sec,
+            bytes_per_sec, eta (sec, None if unknown) and percent (None if unknown)
+        :rtype: `dict`
+        """
+        if now is None: now = time.monotonic()
+        elapsed = max(now-self.start_time, 1e-6)
+        items_per_sec = self.done/elapsed; bytes_per_sec = self.bytes_done/elapsed
+        percent = None; eta = None
+        if self.total_bytes:                                #byte totals give the best estimate
+            percent = min(100.0, self.bytes_done/self.total_bytes*100)
+            if bytes_per_sec > 0: eta = max(0.0, (self.total_bytes-self.bytes_done)/bytes_per_sec)
+        elif self.total:
+            percent = min(100.0, self.done/self.total*100)
+            if items_per_sec > 0: eta = max(0.0, (self.total-self.done)/items_per_sec)
+        elif self.total == 0: percent = 100.0
+        return {'label':self.label, 'done':self.done, 'total':self.total,
+                'bytes_done':self.bytes_done, 'total_bytes':self.total_bytes, 'elapsed':elapsed,
+                'items_per_sec':items_per_sec, 'bytes_per_sec':bytes_per_sec, 'eta':eta, 'percent':percent}
+
+    def report(self, now=None):
+        """function sends the current stage progress through `update`"""
+        if now is None: now = time.monotonic()
+        self.last_report = now
+        self.metrics.count('progress.reports')
+        stats = self.get_stats(now)
+        kwargs = {'label_text':format_progress_text(stats), 'stats':stats}
+        if stats['percent'] is None: kwargs['mode'] = 'indeterminate'
+        else: kwargs.update({'mode':'determinate', 'value':round(stats['percent'])})
+        self.update(kwargs)
+
+    def cancel(self):
+        """function asks the job to stop at the next cancel check"""
+        self.cancel_event.set()
+
+    def is_canceled(self):
+        """function returns true if the job has been asked to stop"""
+        return self.cancel_event.is_set()
+
+    def check_cancel(self):
+        """function raises `job_canceled` if the job has been asked to stop, called between files"""
+        if self.cancel_event.is_set(): raise job_canceled()
+
+def format_bytes(num_bytes):
+    """function formats a byte count in a human readable format, e.g. 1.5 GB"""
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if abs(num_bytes) < 1024 or unit == 'TB': break
+        num_bytes /= 1024.0
+    return f'{num_bytes:.0f} {unit}' if unit == 'B' else f'{num_bytes:.1f} {unit}'
+
+def format_progress_text(stats):
+    """function formats the progress numbers for the progress label, e.g.
+    "Copying 12/40 | 3.1/s | 95.2 MB/s | ETA 0:01:30"
+
+    :param stats: progress numbers
+    :type stats: `dict` from `job_progress.get_stats`
+    :returns: label text
+    :rtype: `string`
+    """
+    parts = [stats['label']]
+    if stats['done'] > 0 or stats['total'] is not None:
+        count = f"{stats['done']}" if stats['total'] is None else f"{stats['done']}/{stats['total']}"
+        parts[0] += ' '+count
+        parts.append(f"{stats['items_per_sec']:.1f}/s")
+    if stats['bytes_done'] > 0: parts.append(format_bytes(stats['bytes_per_sec'])+'/s')
+    if stats['eta'] is not None and stats['done'] > 0: parts.append('ETA '+str(datetime.timedelta(seconds=int(stats['eta']))))
+    return ' | '.join(parts)
+
+class queue_progress(job_progress):
+    def __init__(self, msg_queue):
+        """progress reporter that sends the updates through the passed queue
+
+        :param msg_queue: queue the updates are sent through
+        :type msg_queue: `queue.Queue`
+        """
+        super().__init__()
+        self.msg_queue = msg_queue
+
+    def update(self, kwargs):
+        """function sends a progress update through the queue"""
+        self.msg_queue.put((CONST_job_msgs['progress'], dict(kwargs)))
+
+class background_job:
+    def __init__(self, func, args=(), kwargs=None, profile=False):
+        """job that runs the passed function on a worker thread. The function is called as
+        `func(progress, *args, **kwargs)` where progress is a `job_progress` reporter.
+
+        :param func: function to run
+        :type func: callable
+        :param args: positional arguments passed after the progress reporter
+        :type args: `tuple`
+        :param kwargs: keyword arguments passed to the function
+        :type kwargs: `dict`
+        :param profile: run the function under cProfile, the stats are in `profiler` once it finishes.
+            Only the job's thread is profiled (not copy threads or probe worker processes)
+        :type profile: `bool`
+        """
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs if kwargs is not None else {}
+        self.profiler = cProfile.Profile() if profile else None
+        self.msg_queue = queue.Queue()                  #messages from the worker thread
+        self.progress = queue_progress(self.msg_queue)  #progress reporter passed to the function
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.finished = False                           #true once the done/canceled/error message has been read
+
+    def start(self):
+        """function starts the job on its worker thread"""
+        self.thread.start()
+        return self
+
+    def run(self):
+        """function runs the job function on the worker thread and reports how it finished"""
+        try:
+            if self.profiler is not None: result = self.profiler.runcall(self.func, self.progress, *self.args, **self.kwargs)
+            else: result = self.func(self.progress, *self.args, **self.kwargs)
+            self.progress.finish()
+            self.msg_queue.put((CONST_job_msgs['done'], result))
+        except job_canceled:
+            self.progress.finish()
+            self.msg_queue.put((CONST_job_msgs['canceled'], None))
+        except Exception as e:
+            self.progress.finish()
+            self.msg_queue.put((CONST_job_msgs['error'], (e, traceback.format_exc())))
+
+    def cancel(self):
+        """function asks the job to stop cleanly at the next file"""
+        self.progress.cancel()
+
+    def poll(self):
+        """function reads all the waiting messages without blocking. Progress updates are merged in to
+        one update so the caller only has to redraw once per poll.
+
+        :returns: merged progress update (None if no updates), final (message type, data) (None if still running)
+        :rtype: `dict`, `tuple`
+        """
+        progress = None; final = None
+        while True:
+            try: msg_type, data = self.msg_queue.get_nowait()
+            except queue.Empty: break
+            if msg_type == CONST_job_msgs['progress']:
+                if progress is None: progress = {}
+                progress.update(data)   #later updates replace earlier ones
+            else:
+                final = (msg_type, data); self.finished = True
+        return progress, final
@@ -0,0 +1,116 @@
+"""
+Instrumentation for the background jobs: per-stage timers, counters and an optional timeline.
+
+Every `job_progress` carries a `job_metrics` recorder. Stages are timed from one `job_progress.start`
+to the next, and the tasks add counters (files walked, probes by backend, bytes copied, stat calls)
+and timers (probe, copy, export write) as they go. Counters and timers are cheap enough to always be
+on. The timeline is only kept when tracing is enabled (e.g. `--profile` in the command line tool),
+and is written in the Chrome trace event format, so it can be opened in chrome://tracing or Perfetto.
+"""
+
+#-----------------------------imports
+import contextlib
+import json
+import os
+import threading
+import time
+
+#-----------------------------supporting methods, classes, constants
+#--misc constants
+sys_trace_max_events = 500000       #timeline events kept, later events are only counted in the timers
+
+class job_metrics:
+    def __init__(self, trace=False):
+        """recorder of the counters, timers and (optionally) timeline of a job. Safe to use from several threads.
+
+        :param trace: keep a timeline event for each timed span, see `write_trace`
+        :type trace: `bool`
+        """
+        self.trace = trace
+        self.counters = {}                  #{name: count}
+        self.values = {}                    #{name: last value set}, e.g. rates worked out at the end of a stage
+        self.timers = {}                    #{name: [number of spans, total sec, max sec]}
+        self.events = []                    #timeline events (Chrome trace format), when tracing
+        self.dropped_events = 0             #timeline events not kept, over `sys_trace_max_events`
+        self.origin = time.perf_counter()   #timeline zero
+        self.lock = threading.Lock()
+
+    def count(self, name, n=1):
+        """function adds to a counter
+
+        :param name: counter name, e.g. "probe.backend.mkv"
+        :type name: `string`
+        :param n: amount to add
+        :type n: `int`
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0)+n
+
+    def set_value(self, name, value):
+        """function sets a value, e.g. a rate worked out from the counters"""
+        with self.lock:
+            self.values[name] = value
+
+    def add_time(self, name, start, end=None, tid=None, args=None, trace=True):
+        """function adds a timed span to a timer, and to the timeline when tracing
+
+        :param name: timer name, e.g. "probe"
+        :type name: `string`
+        :param start: span start, `time.perf_counter` seconds
+        :type start: `float`
+        :param end: span end, `time.perf_counter` seconds, None for now
+        :type end: `float`
+        :param tid: timeline row the span is drawn in, None for the current thread
+        :type tid: `int`
+        :param args: details shown with the span on the timeline
+        :type args: `dict`
+        :param trace: add the span to the timeline, False for spans too small/many to be useful there
+        :type trace: `bool`
+        """
+        if end is None: end = time.perf_counter()
+        sec = max(0.0, end-start)
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None: self.timers[name] = [1, sec, sec]
+            else:
+                timer[0] += 1; timer[1] += sec
+                if sec > timer[2]: timer[2] = sec
+            if not self.trace or not trace: return
+            if len(self.events) >= sys_trace_max_events:
+                self.dropped_events += 1
+                return
+            event = {'name':name, 'cat':name.split(':')[0], 'ph':'X', 'pid':os.getpid(),
+                     'tid':tid if tid is not None else threading.get_ident(),
+                     'ts':round((start-self.origin)*1e6, 1), 'dur':round(sec*1e6, 1)}
+            if args is not None: event['args'] = args
+            self.events.append(event)
+
+    @contextlib.contextmanager
+    def timer(self, name, args=None, trace=True):
+        """context manager that times its block, see `add_time`"""
+        start = time.perf_counter()
+        try: yield
+        finally: self.add_time(name, start, args=args, trace=trace)
+
+    def get_summary(self):
+        """function returns the counters, values and timers so far
+
+        :returns: {'counters':{name: count}, 'values':{name: value}, 'timers':{name: {'count', 'total_sec', 'avg_ms', 'max_ms'}}}
+        :rtype: `dict`
+        """
+        with self.lock:
+            timers = {name:{'count':count, 'total_sec':round(total, 6), 'avg_ms':round(total/count*1000, 3), 'max_ms':round(peak*1000, 3)}
+                      for name, (count, total, peak) in sorted(self.timers.items())}
+            return {'counters':dict(sorted(self.counters.items())), 'values':dict(sorted(self.values.items())), 'timers':timers}
+
+    def write_trace(self, out_filepath):
+        """function writes the timeline in the Chrome trace event format
+
+        :param out_filepath: output file path (JSON)
+        :type out_filepath: `os` path
+        """
+        with self.lock:
+            events = list(self.events); dropped = self.dropped_events
+        with open(out_filepath, 'w') as f:
+            json.dump({'traceEvents':events, 'displayTimeUnit':'ms',
+                       'otherData':{'dropped_events':dropped, **self.get_summary()}}, f)
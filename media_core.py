@@ -0,0 +1,151 @@
+"""
+Common classes, constants and helper methods shared by the GUI and the media/file tasks.
+
+Nothing in here depends on tkinter so it can be used from worker threads and processes.
+"""
+
+#-----------------------------imports
+import datetime
+import os
+
+#-----------------------------supporting methods, classes, constants
+#--class for media file properties
+class media_file_props:
+    __slots__ = ('file_name', 'full_path', 'est_time_raw', 'good_estimate', 'est_time_str',
+                 'file_size', 'mod_time_ns', 'change', 'probe_backend', 'probe_status',
+                 'probe_sec')                               #no per instance dict, large scans hold many of these
+
+    def __init__(self, kwargs):
+        """class containing media file properties to import/export"""
+        self.file_name = kwargs.get('name')         #file name
+        self.full_path = kwargs.get('path')         #full file path
+        self.est_time_raw = kwargs.get('runtime')   #estimated playtime in seconds
+        self.good_estimate = kwargs.get('est_ok')   #able to successfully get estimate
+        self.est_time_str = None                    #estimated file length, formatted string in HH:MM:SS
+        self.file_size = kwargs.get('size')         #file size in bytes when parsed
+        self.mod_time_ns = kwargs.get('mtime_ns')   #file modification time (ns since epoch) when parsed
+        self.change = kwargs.get('change')          #change since the baseline export, `CONST_change_types` entry
+        self.probe_backend = kwargs.get('backend')  #probe backend that found the runtime, see `media_probe.register_probe_backend`
+        self.probe_status = kwargs.get('status')    #how the probe ended, `CONST_probe_status` entry
+        self.probe_sec = kwargs.get('probe_sec')    #seconds the probe took, None if the result was reused (cache/baseline)
+        self.calc_timestr()                         #when instancing, create output formatted string
+
+    def calc_timestr(self):
+        """function generates the output estimated time string in a human readable format of HH:MM:SS"""
+        if self.good_estimate == True: self.est_time_str = str(datetime.timedelta(seconds=int(self.est_time_raw)))
+        else: self.est_time_str = ''
+
+    def is_unchanged(self, size, mtime_ns):
+        """function checks if the file still has the size and modification time it had when parsed
+
+        :returns: true if both match, false if they differ or were not recorded
+        :rtype: `bool`
+        """
+        if self.file_size is None or self.mod_time_ns is None: return False
+        return self.file_size == size and self.mod_time_ns == mtime_ns
+
+def check_dir_exists(dir_path):
+    """function checks if the directory exists - ONLY for directories, not files
+
+    :param dir_path: absolute file path to the directory to find
+    :type dir_path: string
+    :returns: true if directory exists
+    :rtype: bool
+    """
+    rval = False                                #temp return value - default false if not found
+    if os.path.isdir(dir_path): rval = True     #if found, update to true
+    return rval
+
+def check_file_exists(file_path):
+    """function checks if the file exists - ONLY for files, not directories
+
+    :param file_path: absolute file path to the file to find
+    :type file_path: string
+    :returns: true if file exists
+    :rtype: bool
+    """
+    rval = False                                #temp return value - default false if not found
+    if os.path.isfile(file_path): rval = True   #if found, update to true
+    return rval
+
+def get_day_seconds():
+    """function returns the total seconds since midnight of the current day
+    :returns: seconds since midnight
+    :rtype: `int`
+    """
+    now = datetime.datetime.now()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return (now - midnight).seconds
+
+def get_file_ext(file_name):
+    """function returns the extension of the passed filename
+    """
+    return os.path.splitext(file_name)[-1].lower()
+
+#--constnant dict for open type
+CONST_openType = {'file':1,
+                  'dir':2,
+                  'refresh':3,  #directory, only files changed since a previous export are parsed
+                  'dedup':4}    #directory, duplicate files are found and a template to move them out is created
+
+#--constant dict for accepted media property formats
+CONST_media_formats = {'MKV': '.mkv',
+                       'WEBM': '.webm',
+                       'MP4': '.mp4',
+                       'M4V': '.m4v',
+                       'MOV': '.mov',
+                       'AVI': '.avi',
+                       'TS': '.ts',
+                       'M2TS': '.m2ts'}
+
+#--constant dict for the media properties export formats
+CONST_export_formats = {'CSV': '.csv',
+                        'JSONL': '.jsonl',      #JSON Lines, one object per file
+                        'Parquet': '.parquet'}  #needs pyarrow
+
+#--constant dict for accepted input template formats
+CONST_template_formats = {'XLSX': '.xlsx',
+                          'XLS': '.xls',
+                          'CSV': '.csv'}
+
+#--constant dict for the output CSV file used when parsing files
+CONST_CSVexport_hdrs = {'file_name':'File_Name',    #format for dict is {'media_file_props.attr_name':'CSV output File Header'}
+                        'full_path':'File_Path',
+                        'good_estimate':'Good_Estimate',
+                        'est_time_raw':'Runtime_Seconds',
+                        'est_time_str':'Runtime_HH:MM:SS',
+                        'file_size':'File_Size_Bytes',
+                        'mod_time_ns':'File_Modified_ns',
+                        'probe_backend':'Probe_Backend',
+                        'probe_status':'Probe_Status'}
+
+#--constant dict for the optional probe timing columns of the output CSV file
+CONST_CSVtiming_hdrs = {'probe_sec':'Probe_Seconds'}
+
+#--constant dict for the change types in an incremental (delta) export
+CONST_change_types = {'added':'added',
+                      'changed':'changed',
+                      'removed':'removed'}
+
+#--constant dict for the output CSV file of the changes since a previous export
+CONST_CSVdelta_hdrs = {'change':'Change', **CONST_CSVexport_hdrs}
+
+#--constant dict for the probe status of each file in an export
+CONST_probe_status = {'ok':'ok',                    #duration found
+                      'none':'no_duration',         #probed, no backend found a duration
+                      'error':'error',              #probe failed with an error
+                      'timeout':'timeout',          #probe ran over its time budget, the worker was killed
+                      'crash':'crashed'}            #worker process died while probing the file
+
+#--constant dict for error types
+CONST_err_types = {'err':'error',
+                   'warn':'warning',
+                   'info':'info'}      #not an issue, e.g. how a file will be placed
+
+#--file import key columns
+sys_tmplt_oldFile_hdrName = 'File_Path'
+sys_tmplt_newFile_hdrName = 'New_File_Path'
+
+#--constant list for the columns of the duplicate files report, starts with the template columns so it can be used as an update template
+CONST_CSVdedup_hdrs = [sys_tmplt_oldFile_hdrName, sys_tmplt_newFile_hdrName, 'Keep_File_Path', 'Duplicate_Group',
+                       'File_Size_Bytes', 'Runtime_HH:MM:SS', 'Checksum']
@@ -0,0 +1,241 @@
+"""
+Duplicate file index for the media library.
+
+Files are compared in stages so only a few are read in full: files are grouped by exact size
+first, files sharing a size are told apart by a checksum of a few blocks (start, middle and end),
+and only files that still match are hashed in full. Checksums are kept in a SQLite database in the
+user config directory, keyed on the file path, size and modification time (ns) like the refresh
+of an export, so re-runs only read files that are new or changed.
+
+Checksums are the same BLAKE2b used to verify copies, so a full checksum from here matches the
+checksum of a verified copy of the file.
+
+The report is an update template (File_Path/New_File_Path) that moves every copy but one in to a
+duplicates directory, so the clean up can be checked and run through the normal update flow.
+"""
+
+#-----------------------------imports
+import csv
+import os
+import sqlite3
+import threading
+import time
+from file_transfer import new_file_hasher, get_file_checksum, fadvise
+from probe_cache import get_user_config_dir
+from media_export import sys_partial_ext
+from media_core import CONST_CSVdedup_hdrs
+
+#-----------------------------supporting methods, classes, constants
+#--misc constants
+sys_dedup_file_name = 'dedup_index.sqlite'      #index database file name
+sys_dedup_block = 64*1024                       #bytes read from each sampled block of a file
+sys_dedup_workers = 8                           #threads hashing files at once
+sys_dedup_min_size = 1                          #smaller files are never reported as duplicates (empty files)
+sys_dedup_max_entries = 250000                  #index size before old entries are evicted
+sys_dedup_commit_every = 500                    #number of writes between commits
+
+def get_block_checksum(path, size, block_size=sys_dedup_block):
+    """function returns a checksum of the start, middle and end blocks of the file at the passed path.
+    Files no larger than the three blocks are hashed whole, so the checksum is their full checksum.
+
+    :param path: file to hash
+    :type path: `os` path
+    :param size: file size in bytes, as found by the scan
+    :type size: `int`
+    :param block_size: bytes read from each block
+    :type block_size: `int`
+    :returns: hex digest, if it is the full checksum of the file
+    :rtype: `string`, `bool`
+    """
+    h = new_file_hasher()
+    with open(path, 'rb') as f:
+        if size <= 3*block_size:
+            h.update(f.read())
+            return h.hexdigest(), True
+        fadvise(f.fileno(), getattr(os, 'POSIX_FADV_RANDOM', 0))
+        for offset in (0, (size-block_size)//2, size-block_size):
+            f.seek(offset)
+            h.update(f.read(block_size))
+    return h.hexdigest(), False
+
+class dedup_index:
+    def __init__(self, db_path=None, max_entries=sys_dedup_max_entries):
+        """on-disk index of file checksums keyed on (path, size, mtime_ns)
+
+        :param db_path: path of the index database, defaults to the user config directory
+        :type db_path: `os` path
+        :param max_entries: number of entries allowed before eviction on `prune`
+        :type max_entries: `int`
+        """
+        if db_path is None: db_path = os.path.join(get_user_config_dir(), sys_dedup_file_name)
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0               #number of lookups found in the index
+        self.misses = 0             #number of lookups not in the index (or out of date)
+        self.pending = 0            #writes since the last commit
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS hashes ('
+                          'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+                          'block_hash TEXT, full_hash TEXT, last_used REAL)')
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def get(self, path, size, mtime_ns):
+        """function looks up the checksums of the passed file
+
+        :param path: file path
+        :type path: `os` path
+        :param size: current file size in bytes
+        :type size: `int`
+        :param mtime_ns: current file modification time in ns
+        :type mtime_ns: `int`
+        :returns: (block checksum, full checksum or None if not hashed in full), None on a miss
+        :rtype: `tuple`
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT size, mtime_ns, block_hash, full_hash FROM hashes WHERE path=?', (path,)).fetchone()
+            if row is None or row[0] != size or row[1] != mtime_ns:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute('UPDATE hashes SET last_used=? WHERE path=?', (time.time(), path))
+            self.write_done()
+        return row[2], row[3]
+
+    def put(self, path, size, mtime_ns, block_hash, full_hash=None):
+        """function stores the checksums of the passed file
+
+        :param path: file path
+        :type path: `os` path
+        :param size: file size in bytes when it was hashed
+        :type size: `int`
+        :param mtime_ns: file modification time in ns when it was hashed
+        :type mtime_ns: `int`
+        :param block_hash: checksum of the sampled blocks, see `get_block_checksum`
+        :type block_hash: `string`
+        :param full_hash: checksum of the whole file, None if not hashed in full
+        :type full_hash: `string`
+        """
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO hashes VALUES (?,?,?,?,?,?)',
+                              (path, size, mtime_ns, block_hash, full_hash, time.time()))
+            self.write_done()
+
+    def write_done(self):
+        """function commits pending writes in batches - lock must be held"""
+        self.pending += 1
+        if self.pending >= sys_dedup_commit_every:
+            self.conn.commit()
+            self.pending = 0
+
+    def num_entries(self):
+        """function returns the number of entries in the index"""
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM hashes').fetchone()[0]
+
+    def prune(self):
+        """function evicts entries once the index is larger than `max_entries`. Entries for files that
+        no longer exist are removed first, then the least recently used entries.
+
+        :returns: number of entries removed
+        :rtype: `int`
+        """
+        removed = 0
+        with self.lock:
+            count = self.conn.execute('SELECT COUNT(*) FROM hashes').fetchone()[0]
+            if count <= self.max_entries: return 0
+
+            gone = [(row[0],) for row in self.conn.execute('SELECT path FROM hashes') if not os.path.isfile(row[0])]
+            self.conn.executemany('DELETE FROM hashes WHERE path=?', gone)
+            removed += len(gone); count -= len(gone)
+
+            if count > self.max_entries:    #still too large, drop the least recently used
+                cur = self.conn.execute('DELETE FROM hashes WHERE path IN (SELECT path FROM hashes ORDER BY last_used LIMIT ?)',
+                                        (count-self.max_entries,))
+                removed += cur.rowcount
+            self.conn.commit(); self.pending = 0
+        return removed
+
+    def close(self):
+        """function commits any pending writes and closes the database"""
+        with self.lock:
+            if self.conn is None: return
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+def get_file_checksums(path, size, known=None):
+    """function hashes a file for the duplicate check, reading only what isn't already known
+
+    :param path: file to hash
+    :type path: `os` path
+    :param size: file size in bytes, as found by the scan
+    :type size: `int`
+    :param known: (block checksum, full checksum or None) already known for the file, None to hash the blocks
+    :type known: `tuple`
+    :returns: block checksum, full checksum (the block checksum for small files). None, None if the file can't be read
+    :rtype: `string`, `string`
+    """
+    try:
+        if known is None:
+            block_hash, is_full = get_block_checksum(path, size)
+            return block_hash, block_hash if is_full else None
+        return known[0], known[1] if known[1] is not None else get_file_checksum(path)
+    except OSError:
+        return None, None
+
+def get_keep_order(file):
+    """function returns the sort key of a file in a group of duplicates, the first is the one kept:
+    the oldest copy (usually the original rip), then the one with the shortest path"""
+    return (file.mod_time_ns if file.mod_time_ns is not None else 0, len(file.full_path), file.full_path)
+
+def get_duplicate_rows(groups, root, dup_dir):
+    """function builds the rows of the duplicate files report. Every file but the one kept in each group
+    gets a row that moves it in to the duplicates directory, keeping its path below the scanned directory
+    so the moved files can't collide.
+
+    :param groups: groups of duplicate files, see `media_tasks.find_duplicate_files`
+    :type groups: `list` of (`string`, `list` of `media_file_props` instance)
+    :param root: directory that was scanned
+    :type root: `os` path
+    :param dup_dir: directory to move the duplicates to
+    :type dup_dir: `os` path
+    :returns: report rows, {`CONST_CSVdedup_hdrs` entry: value}
+    :rtype: `list` of `dict`
+    """
+    rows = []
+    for num, (checksum, files) in enumerate(groups, 1):
+        keep = files[0]
+        for file in files[1:]:
+            rows.append(dict(zip(CONST_CSVdedup_hdrs, [file.full_path,
+                                                       os.path.join(dup_dir, os.path.relpath(file.full_path, root)),
+                                                       keep.full_path, num, file.file_size, file.est_time_str, checksum])))
+    return rows
+
+def write_dedup_template(out_filepath, rows):
+    """function writes the duplicate files report, a CSV file that can be used as an update template.
+    The report is written to a partial file and renamed once complete.
+
+    :param out_filepath: output file path
+    :type out_filepath: `os` path
+    :param rows: report rows, see `get_duplicate_rows`
+    :type rows: `list` of `dict`
+    """
+    partial_path = out_filepath + sys_partial_ext
+    try:
+        with open(partial_path, 'w', newline='') as out_csv:
+            file_writer = csv.DictWriter(out_csv, fieldnames=CONST_CSVdedup_hdrs, delimiter=',')
+            file_writer.writeheader()
+            file_writer.writerows(rows)
+        os.replace(partial_path, out_filepath)
+    except BaseException:
+        if os.path.isfile(partial_path): os.remove(partial_path)
+        raise
@@ -0,0 +1,259 @@
+"""
+Streaming writer/reader for the media properties exports.
+
+Rows are written to the export as each file is parsed instead of once the whole scan is done, so
+memory doesn't grow with the library size. The export is written to a ".partial" file that is
+flushed periodically and only renamed to the export name once complete, so if the process dies the
+rows written so far are kept without leaving something that looks like a finished export. A
+canceled or failed export is removed.
+
+Exports can be CSV, JSON Lines (one object per row, typed values) or Parquet (columnar, for
+loading large catalogs in to analytics tools without parsing text).
+
+A rolling export (CSV or JSON Lines) is never renamed or rewritten: rows are appended to it as files
+are cataloged (e.g. by the watch folder), and a file cataloged again gets a new row. Readers keep the
+last row of each file, so it can also be the baseline of an incremental export.
+
+Optional (non-standard) dependencies:
+-pyarrow (Parquet exports only, imported on first use)
+"""
+
+#-----------------------------imports
+import csv
+import datetime
+import json
+import os
+import time
+from media_core import get_day_seconds, get_file_ext, CONST_export_formats
+
+#-----------------------------supporting methods, classes, constants
+#--constant dict for the column types of typed exports (JSON Lines/Parquet), {'media_file_props.attr_name':type}
+CONST_export_types = {'file_name':'string',
+                      'full_path':'string',
+                      'good_estimate':'bool_',
+                      'est_time_raw':'float64',
+                      'est_time_str':'string',
+                      'file_size':'int64',
+                      'mod_time_ns':'int64',
+                      'change':'string',
+                      'probe_backend':'string',
+                      'probe_status':'string',
+                      'probe_sec':'float64'}
+
+#--misc constants
+sys_export_flush_rows = 1000        #rows written between flushes to disk
+sys_export_flush_sec = 5.0          #max seconds between flushes to disk
+sys_export_group_rows = 50000       #rows per Parquet row group, rows are held in memory until written
+sys_partial_ext = '.partial'        #appended to the export file name while it is written
+
+def get_export_path(savedir, export_name, export_fmt=CONST_export_formats['CSV']):
+    """function builds the output file path of a new export, named with the current date and day seconds.
+    A number is added if an export with that name already exists (e.g. a baseline from the same second).
+
+    :param savedir: directory path to output the export at
+    :type savedir: `os` directory path
+    :param export_name: name of the export, used in the output file name
+    :type export_name: `string`
+    :param export_fmt: export format
+    :type export_fmt: `CONST_export_formats` entry
+    :returns: output file path
+    :rtype: `os` path
+    """
+    date_str = datetime.datetime.today().strftime('%Y%m%d')         #get current date
+    sec_str = str(get_day_seconds())                                #get current day seconds
+    outfilename = date_str+'_'+sec_str+'_'+export_name+export_fmt   #build output file name
+    out_filepath = savedir +'/' + outfilename                       #build output file path
+    num = 1
+    while os.path.exists(out_filepath) or os.path.exists(out_filepath+sys_partial_ext):
+        num += 1
+        out_filepath = savedir +'/' + date_str+'_'+sec_str+'_'+export_name+'_'+str(num)+export_fmt
+    return out_filepath
+
+def import_pyarrow():
+    """function imports pyarrow for Parquet exports, raising a `ValueError` if it isn't installed"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet exports need the pyarrow package installed.")
+    return pyarrow, pyarrow.parquet
+
+class export_writer:
+    def __init__(self, out_filepath, export_hdrs):
+        """writer that streams file properties to an export file, the format is taken from the file extension.
+        Use as a context manager: the export is completed when the block finishes, or removed if it raises.
+
+        :param out_filepath: output file path
+        :type out_filepath: `os` path
+        :param export_hdrs: output columns, {'media_file_props.attr_name':'output header'}
+        :type export_hdrs: `dict`
+        """
+        self.out_filepath = out_filepath
+        self.partial_path = out_filepath + sys_partial_ext
+        self.export_fmt = get_file_ext(out_filepath)
+        if self.export_fmt not in CONST_export_formats.values(): raise ValueError("Export file type is not supported.")
+        self.attrs = list(export_hdrs.keys())
+        self.hdrs = list(export_hdrs.values())
+        self.num_rows = 0                           #rows written so far
+        self.pending_rows = 0                       #rows written since the last flush
+        self.last_flush = time.monotonic()
+        self.file = None                            #output file (CSV/JSON Lines)
+        self.file_writer = None                     #csv writer (CSV)
+        self.columns = None                         #column values not yet written (Parquet)
+        self.pq_writer = None                       #Parquet writer (Parquet)
+
+    def open(self):
+        """function creates the partial export file and writes the header"""
+        if self.export_fmt == CONST_export_formats['Parquet']:
+            pa, pq = import_pyarrow()
+            schema = pa.schema([(hdr, getattr(pa, CONST_export_types.get(attr, 'string'))()) for attr, hdr in zip(self.attrs, self.hdrs)])
+            self.pq_writer = pq.ParquetWriter(self.partial_path, schema)
+            self.columns = [[] for _ in self.attrs]
+        else:
+            self.file = open(self.partial_path, 'w', newline='')
+            if self.export_fmt == CONST_export_formats['CSV']:
+                self.file_writer = csv.writer(self.file, delimiter=',')
+                self.file_writer.writerow(self.hdrs)
+        return self
+
+    def write(self, file):
+        """function writes the properties of a file to the export
+
+        :param file: file properties
+        :type file: `media_file_props` instance
+        """
+        values = [getattr(file, attr) for attr in self.attrs]
+        if self.file_writer is not None: self.file_writer.writerow(values)
+        elif self.columns is not None:
+            for column, value in zip(self.columns, values): column.append(value)
+        else: self.file.write(json.dumps(dict(zip(self.hdrs, values)))+'\n')
+        self.num_rows += 1; self.pending_rows += 1
+
+        if self.columns is not None:
+            if self.pending_rows >= sys_export_group_rows: self.flush()
+        elif self.pending_rows >= sys_export_flush_rows or time.monotonic()-self.last_flush >= sys_export_flush_sec:
+            self.flush()
+
+    def flush(self):
+        """function writes the rows so far to disk"""
+        if self.pq_writer is not None and self.pending_rows > 0:
+            pa, _ = import_pyarrow()
+            self.pq_writer.write_table(pa.Table.from_pydict(dict(zip(self.hdrs, self.columns)), schema=self.pq_writer.schema))
+            self.columns = [[] for _ in self.attrs]
+        elif self.file is not None: self.file.flush()
+        self.pending_rows = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        """function finishes the export, renaming it from the partial file
+
+        :returns: output file path
+        :rtype: `os` path
+        """
+        self.flush()
+        if self.pq_writer is not None: self.pq_writer.close(); self.pq_writer = None
+        if self.file is not None: self.file.close(); self.file = None
+        os.replace(self.partial_path, self.out_filepath)
+        return self.out_filepath
+
+    def abort(self):
+        """function stops writing the export and removes the partial file"""
+        try:
+            if self.pq_writer is not None: self.pq_writer.close()
+            if self.file is not None: self.file.close()
+        finally:
+            self.pq_writer = None; self.file = None
+            if os.path.isfile(self.partial_path): os.remove(self.partial_path)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None: self.close()
+        else: self.abort()                          #don't leave a partial export behind
+
+class rolling_export_writer:
+    def __init__(self, out_filepath, export_hdrs):
+        """writer that appends file properties to a rolling export, the format is taken from the file extension.
+        Every row is flushed as it is written. Use as a context manager.
+
+        :param out_filepath: export file path, created if it doesn't exist
+        :type out_filepath: `os` path
+        :param export_hdrs: output columns, {'media_file_props.attr_name':'output header'}. An existing CSV export
+            must have the same columns
+        :type export_hdrs: `dict`
+        """
+        self.out_filepath = out_filepath
+        self.export_fmt = get_file_ext(out_filepath)
+        if self.export_fmt not in (CONST_export_formats['CSV'], CONST_export_formats['JSONL']):
+            raise ValueError("Rolling exports must be CSV or JSON Lines files.")
+        self.attrs = list(export_hdrs.keys())
+        self.hdrs = list(export_hdrs.values())
+        self.num_rows = 0                           #rows written by this writer
+        self.file = None                            #output file
+        self.file_writer = None                     #csv writer (CSV)
+
+    def open(self):
+        """function opens the export for appending, writing the header if it is a new CSV file"""
+        is_new = not os.path.isfile(self.out_filepath) or os.path.getsize(self.out_filepath) == 0
+        if self.export_fmt == CONST_export_formats['CSV'] and not is_new:
+            with open(self.out_filepath, 'r', newline='') as in_csv:
+                if next(csv.reader(in_csv), []) != self.hdrs:
+                    raise ValueError(f"Rolling export has different columns, use a new export file: {self.out_filepath}")
+        if not is_new:
+            with open(self.out_filepath, 'rb') as in_file:
+                in_file.seek(-1, os.SEEK_END); ends_line = in_file.read(1) == b'\n'
+        self.file = open(self.out_filepath, 'a', newline='')
+        if not is_new and not ends_line: self.file.write('\n')    #last row was cut off (e.g. power loss), start a new line
+        if self.export_fmt == CONST_export_formats['CSV']:
+            self.file_writer = csv.writer(self.file, delimiter=',')
+            if is_new: self.file_writer.writerow(self.hdrs); self.file.flush()
+        return self
+
+    def write(self, file):
+        """function appends the properties of a file to the export
+
+        :param file: file properties
+        :type file: `media_file_props` instance
+        """
+        values = [getattr(file, attr) for attr in self.attrs]
+        if self.file_writer is not None: self.file_writer.writerow(values)
+        else: self.file.write(json.dumps(dict(zip(self.hdrs, values)))+'\n')
+        self.file.flush()                           #rows are visible as soon as a file is cataloged
+        self.num_rows += 1
+
+    def close(self):
+        """function closes the export"""
+        if self.file is not None: self.file.close(); self.file = None
+        return self.out_filepath
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()                                #rows written so far are kept, even on a cancel/error
+
+def iter_export_rows(path):
+    """function reads the rows of an export file, the format is taken from the file extension
+
+    :param path: export file
+    :type path: `os` path
+    :returns: each row, {output header: value}. CSV values are strings, JSON Lines/Parquet values are typed
+    :rtype: generator of `dict`
+    """
+    export_fmt = get_file_ext(path)
+    if export_fmt == CONST_export_formats['Parquet']:
+        _, pq = import_pyarrow()
+        pq_file = pq.ParquetFile(path)
+        for batch in pq_file.iter_batches():
+            yield from batch.to_pylist()
+    elif export_fmt == CONST_export_formats['JSONL']:
+        with open(path, 'r') as in_file:
+            for line in in_file:
+                if line.strip() == '': continue
+                try: row = json.loads(line)
+                except ValueError: continue             #row cut off while appended to a rolling export
+                yield row
+    else:
+        with open(path, 'r', newline='') as in_csv:
+            yield from csv.DictReader(in_csv, delimiter=',')
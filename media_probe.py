@@ -0,0 +1,808 @@
+"""
+Media file probing used to get the runtime of media files without decoding them.
+
+Files are probed by the backends registered for their extension, in order, until one finds a
+duration (see `register_probe_backend`). The built in backends only read the container headers:
+- Matroska/WebM: a small EBML reader finds the Segment Info "Duration" element near the start of
+  the file, following the SeekHead when Info is not at the start of the segment
+- MP4/M4V/MOV: the "mvhd" box in "moov" (or "mehd" for fragmented files), top level boxes are
+  skipped over by seeking so a "moov" at the end of the file costs a single extra read
+- AVI: the "avih" main header frame count and rate ("dmlh" total frames for OpenDML files)
+- MPEG-TS/M2TS: the first and last PCR of a stream, only the head and tail of the file are read
+OpenCV (cv2) is the last resort backend for every file, used only when the container header has no
+usable duration. It is only imported the first time it is needed (it is slow to import).
+
+Files are probed in disposable worker processes, each file with a wall clock time budget. A worker
+that runs over the budget (e.g. cv2 stuck seeking in a damaged file) is killed and replaced, as is
+one that crashes, and the file gets a "timeout"/"crashed" status instead of holding up the scan.
+Single files (see `probe_file`) share one long-lived worker, only replaced after a timeout/crash.
+
+Optional (non-standard) dependencies:
+-cv2 (fallback only, files without a header duration aren't estimated without it)
+"""
+
+#-----------------------------imports
+import multiprocessing
+import multiprocessing.connection
+import os
+import struct
+import threading
+import time
+from media_core import CONST_probe_status
+
+#-----------------------------supporting methods, classes, constants
+#--constant dict for the EBML/Matroska element IDs used when probing
+CONST_mkv_ids = {'ebml':0x1A45DFA3,         #EBML header
+                 'doctype':0x4282,          #EBML header document type
+                 'segment':0x18538067,      #segment, contains everything else
+                 'seekhead':0x114D9B74,     #index of the top level elements in the segment
+                 'seek':0x4DBB,             #single seekhead entry
+                 'seek_id':0x53AB,          #seekhead entry element ID
+                 'seek_pos':0x53AC,         #seekhead entry position, relative to the segment data
+                 'info':0x1549A966,         #segment information
+                 'timescale':0x2AD7B1,      #timestamp scale in nanoseconds
+                 'duration':0x4489,         #segment duration in timestamp scale units
+                 'cluster':0x1F43B675}      #media data - nothing needed for probing past here
+
+#--constant list of accepted EBML document types
+CONST_mkv_doctypes = ['matroska', 'webm']
+
+#--constant list of the box types a MP4/MOV file can start with
+CONST_mp4_first_boxes = [b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot']
+
+#--constant list of the MPEG-TS packet sizes, plain TS, M2TS (4 byte timestamp first) and TS with FEC
+CONST_ts_packet_sizes = [188, 192, 204]
+
+#--misc constants
+sys_mkv_timescale_default = 1000000     #default timestamp scale (1ms) when not in the file
+sys_mkv_max_hdr_size = 4096             #max size of the EBML header/Info element to read in to memory
+sys_mkv_max_seekheads = 4               #max number of chained seekheads to follow
+sys_mp4_max_boxes = 1000                #max boxes walked at one level before giving up
+sys_avi_max_chunks = 1000               #max chunks walked at one level before giving up
+sys_ts_scan_bytes = 2*1024*1024         #bytes read from the head and from the tail of a TS file for PCRs
+sys_ts_sync_checks = 5                  #sync bytes in a row needed to lock on to the packets
+sys_ts_pcr_hz = 90000                   #PCR base clock
+sys_ts_pcr_wrap = 1 << 33               #PCR base is 33 bits
+sys_probe_workers = min(8, os.cpu_count() or 1) #default number of worker processes for parallel probing
+sys_probe_inflight_per_worker = 4       #max files queued/waiting per worker when probing in parallel
+sys_probe_timeout = 60.0                #default wall clock budget in seconds to probe one file, None for no limit
+sys_probe_stop_wait = 1.0               #seconds an idle worker is given to exit before it is killed
+
+#--probe backends, {backend name: function returning the duration in seconds of the file at a path, None if not found}
+sys_probe_backends = {}
+#--probe backends tried for each file extension in order, {extension: [backend name]}
+sys_probe_ext_backends = {}
+sys_probe_fallback = 'cv2'              #backend tried last for every file
+
+class ebml_parse_error(Exception):
+    """exception raised when the file is not a valid/readable EBML file"""
+    pass
+
+class container_parse_error(Exception):
+    """exception raised when the file is not a valid/readable MP4, AVI or TS file"""
+    pass
+
+def read_ebml_id(f):
+    """function reads an EBML element ID (marker bits kept) at the current file position
+
+    :param f: file to read from
+    :type f: binary file object
+    :returns: element ID, or None at the end of the file
+    :rtype: `int`
+    """
+    first = f.read(1)
+    if len(first) == 0: return None             #end of file
+    id_len = 0
+    for i in range(4):                          #IDs are at most 4 bytes long
+        if first[0] & (0x80 >> i):
+            id_len = i+1; break
+    if id_len == 0: raise ebml_parse_error('invalid element ID')
+
+    rest = f.read(id_len-1)
+    if len(rest) != id_len-1: return None       #truncated file
+    return int.from_bytes(first+rest, 'big')
+
+def read_ebml_size(f):
+    """function reads an EBML variable length data size at the current file position
+
+    :param f: file to read from
+    :type f: binary file object
+    :returns: data size, or None if the size is "unknown" (all value bits set)
+    :rtype: `int`
+    """
+    first = f.read(1)
+    if len(first) == 0: raise ebml_parse_error('unexpected end of file')
+    size_len = 0
+    for i in range(8):                          #sizes are at most 8 bytes long
+        if first[0] & (0x80 >> i):
+            size_len = i+1; break
+    if size_len == 0: raise ebml_parse_error('invalid element size')
+
+    rest = f.read(size_len-1)
+    if len(rest) != size_len-1: raise ebml_parse_error('unexpected end of file')
+    value = int.from_bytes(bytes([first[0] & (0xFF >> size_len)])+rest, 'big')   #strip the length marker
+    if value == (1 << (7*size_len)) - 1: value = None                            #all ones is "unknown" size
+    return value
+
+def iter_ebml_elements(f, start, end):
+    """function iterates the EBML elements between the start and end position. After each element
+    is yielded the file is positioned at the start of the next element, so callers are free to read
+    the element data. Iteration stops at an element with an unknown size since it can't be skipped.
+
+    :param f: file to read from
+    :type f: binary file object
+    :param start: file position of the first element
+    :type start: `int`
+    :param end: file position of the end of the parent element
+    :type end: `int`
+    :returns: element ID, data start position, data size (None if unknown)
+    :rtype: generator of `tuple`
+    """
+    pos = start
+    while pos < end:
+        f.seek(pos)
+        eid = read_ebml_id(f)
+        if eid is None: break                   #end of file
+        size = read_ebml_size(f)
+        data_start = f.tell()
+        yield eid, data_start, size
+        if size is None: break                  #unknown size, can't skip over it
+        pos = data_start + size
+
+def read_ebml_uint(data):
+    """function converts EBML unsigned integer element data to an int"""
+    return int.from_bytes(data, 'big')
+
+def read_ebml_float(data):
+    """function converts EBML float element data (4 or 8 bytes) to a float, None if not valid"""
+    if len(data) == 4: return struct.unpack('>f', data)[0]
+    elif len(data) == 8: return struct.unpack('>d', data)[0]
+    return None
+
+def read_ebml_data(f, data_start, size):
+    """function reads the data of a (small) element in to memory
+
+    :returns: element data
+    :rtype: `bytes`
+    """
+    if size is None or size > sys_mkv_max_hdr_size: raise ebml_parse_error('element too large to read')
+    f.seek(data_start)
+    data = f.read(size)
+    if len(data) != size: raise ebml_parse_error('unexpected end of file')
+    return data
+
+def parse_mkv_info(f, data_start, size):
+    """function parses the segment Info element for the duration
+
+    :returns: duration in seconds, None if the Info element has no duration
+    :rtype: `float`
+    """
+    timescale = sys_mkv_timescale_default; duration = None     #temp values for the info element
+    for eid, child_start, child_size in iter_ebml_elements(f, data_start, data_start+size):
+        if eid == CONST_mkv_ids['timescale']:
+            timescale = read_ebml_uint(read_ebml_data(f, child_start, child_size))
+        elif eid == CONST_mkv_ids['duration']:
+            duration = read_ebml_float(read_ebml_data(f, child_start, child_size))
+
+    if duration is None or duration <= 0 or timescale <= 0: return None
+    return duration*timescale/1e9               #timestamp scale is in nanoseconds
+
+def parse_mkv_seekhead(f, data_start, size):
+    """function parses a seekhead element for the positions of the top level elements
+
+    :returns: dict of {element ID: position relative to the segment data}
+    :rtype: `dict`
+    """
+    positions = {}
+    for eid, seek_start, seek_size in iter_ebml_elements(f, data_start, data_start+size):
+        if eid != CONST_mkv_ids['seek'] or seek_size is None: continue
+        seek_id = None; seek_pos = None
+        for cid, child_start, child_size in iter_ebml_elements(f, seek_start, seek_start+seek_size):
+            if cid == CONST_mkv_ids['seek_id']: seek_id = read_ebml_uint(read_ebml_data(f, child_start, child_size))
+            elif cid == CONST_mkv_ids['seek_pos']: seek_pos = read_ebml_uint(read_ebml_data(f, child_start, child_size))
+        if seek_id is not None and seek_pos is not None:
+            positions.setdefault(seek_id, seek_pos)     #keep the first entry if listed more than once
+    return positions
+
+def read_mkv_element_at(f, pos, eid):
+    """function reads the element header at the passed file position and checks it is the expected element
+
+    :returns: data start position and data size of the element, None if not the expected element
+    :rtype: `tuple`
+    """
+    f.seek(pos)
+    if read_ebml_id(f) != eid: return None
+    size = read_ebml_size(f)
+    return f.tell(), size
+
+def get_mkv_duration(path):
+    """function gets the duration of a matroska file from its segment Info element. Only the
+    EBML header and the top level elements before the first cluster are read, plus the
+    element(s) the seekhead points to when Info is stored later in the file.
+
+    :param path: file path to process
+    :type path: `os` path
+    :returns: duration in seconds, None if not found
+    :rtype: `float`
+    """
+    with open(path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+
+        #--check the EBML header is for a matroska file
+        if read_ebml_id(f) != CONST_mkv_ids['ebml']: return None
+        hdr_size = read_ebml_size(f); hdr_start = f.tell()
+        doctype = None
+        for eid, child_start, child_size in iter_ebml_elements(f, hdr_start, hdr_start+hdr_size):
+            if eid == CONST_mkv_ids['doctype']:
+                doctype = read_ebml_data(f, child_start, child_size).rstrip(b'\x00').decode('ascii', 'replace')
+        if doctype not in CONST_mkv_doctypes: return None
+
+        #--find the segment
+        seg_start = None; seg_end = None
+        for eid, data_start, size in iter_ebml_elements(f, hdr_start+hdr_size, file_size):
+            if eid == CONST_mkv_ids['segment']:
+                seg_start = data_start
+                seg_end = file_size if size is None else min(data_start+size, file_size)
+                break
+        if seg_start is None: return None
+
+        #--walk the top level elements up to the first cluster
+        seek_positions = {}
+        for eid, data_start, size in iter_ebml_elements(f, seg_start, seg_end):
+            if eid == CONST_mkv_ids['info'] and size is not None:
+                return parse_mkv_info(f, data_start, size)
+            elif eid == CONST_mkv_ids['seekhead'] and size is not None:
+                seek_positions = parse_mkv_seekhead(f, data_start, size)
+            elif eid == CONST_mkv_ids['cluster']:
+                break   #reached the media data, info must be later in the file
+
+        #--Info was not before the clusters, follow the seekhead(s) to find it
+        visited = []
+        for i in range(sys_mkv_max_seekheads):
+            if CONST_mkv_ids['info'] in seek_positions:
+                elem = read_mkv_element_at(f, seg_start+seek_positions[CONST_mkv_ids['info']], CONST_mkv_ids['info'])
+                if elem is not None and elem[1] is not None: return parse_mkv_info(f, elem[0], elem[1])
+                return None
+            next_pos = seek_positions.get(CONST_mkv_ids['seekhead'])   #seekheads can point to another seekhead
+            if next_pos is None or next_pos in visited: return None
+            visited.append(next_pos)
+            elem = read_mkv_element_at(f, seg_start+next_pos, CONST_mkv_ids['seekhead'])
+            if elem is None or elem[1] is None: return None
+            seek_positions = parse_mkv_seekhead(f, elem[0], elem[1])
+    return None
+
+def iter_mp4_boxes(f, start, end):
+    """function iterates the MP4/MOV boxes between the start and end position. Boxes are skipped over
+    by seeking, so large boxes (e.g. the media data) are never read.
+
+    :param f: file to read from
+    :type f: binary file object
+    :param start: file position of the first box
+    :type start: `int`
+    :param end: file position of the end of the parent box
+    :type end: `int`
+    :returns: box type, data start position, data size
+    :rtype: generator of `tuple`
+    """
+    pos = start
+    for _ in range(sys_mp4_max_boxes):
+        if pos+8 > end: break
+        f.seek(pos)
+        hdr = f.read(8)
+        if len(hdr) != 8: break                 #truncated file
+        size, box_type = struct.unpack('>I4s', hdr)
+        hdr_size = 8
+        if size == 1:                           #64 bit size follows the type
+            ext = f.read(8)
+            if len(ext) != 8: break
+            size = struct.unpack('>Q', ext)[0]; hdr_size = 16
+        elif size == 0: size = end-pos          #box runs to the end of the file
+        if size < hdr_size: raise container_parse_error('invalid box size')
+        yield box_type, pos+hdr_size, min(size, end-pos)-hdr_size
+        pos += size
+
+def read_mp4_box_data(f, data_start, size, max_size=64):
+    """function reads the start of a box's data (full box version/flags included)
+
+    :returns: box data, at most `max_size` bytes
+    :rtype: `bytes`
+    """
+    f.seek(data_start)
+    return f.read(min(size, max_size))
+
+def parse_mp4_moov(f, data_start, size):
+    """function parses the movie box for the duration, from the movie header or the movie extends
+    header of fragmented files
+
+    :returns: duration in seconds, None if not found
+    :rtype: `float`
+    """
+    timescale = None; duration = None; fragment_duration = None
+    for box_type, child_start, child_size in iter_mp4_boxes(f, data_start, data_start+size):
+        if box_type == b'mvhd':
+            data = read_mp4_box_data(f, child_start, child_size)
+            if len(data) >= 32 and data[0] == 1: timescale, duration = struct.unpack('>IQ', data[20:32])
+            elif len(data) >= 20: timescale, duration = struct.unpack('>II', data[12:20])
+            if duration in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF): duration = None    #all ones is unknown
+        elif box_type == b'mvex':
+            for mvex_type, mvex_start, mvex_size in iter_mp4_boxes(f, child_start, child_start+child_size):
+                if mvex_type != b'mehd': continue
+                data = read_mp4_box_data(f, mvex_start, mvex_size)
+                if len(data) >= 12 and data[0] == 1: fragment_duration = struct.unpack('>Q', data[4:12])[0]
+                elif len(data) >= 8: fragment_duration = struct.unpack('>I', data[4:8])[0]
+
+    if not duration: duration = fragment_duration      #fragmented file, movie header has no duration
+    if not timescale or not duration: return None
+    return duration/timescale
+
+def get_mp4_duration(path):
+    """function gets the duration of a MP4/MOV file from its movie header. Only the top level box headers
+    are read up to the movie box, wherever it is in the file.
+
+    :param path: file path to process
+    :type path: `os` path
+    :returns: duration in seconds, None if not found
+    :rtype: `float`
+    """
+    with open(path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        for idx, (box_type, data_start, size) in enumerate(iter_mp4_boxes(f, 0, file_size)):
+            if idx == 0 and box_type not in CONST_mp4_first_boxes: return None     #not a MP4/MOV file
+            if box_type == b'moov': return parse_mp4_moov(f, data_start, size)
+    return None
+
+def iter_riff_chunks(f, start, end):
+    """function iterates the RIFF (AVI) chunks between the start and end position
+
+    :param f: file to read from
+    :type f: binary file object
+    :param start: file position of the first chunk
+    :type start: `int`
+    :param end: file position of the end of the parent chunk
+    :type end: `int`
+    :returns: chunk ID (list type for LIST chunks), data start position, data size
+    :rtype: generator of `tuple`
+    """
+    pos = start
+    for _ in range(sys_avi_max_chunks):
+        if pos+8 > end: break
+        f.seek(pos)
+        hdr = f.read(12)
+        if len(hdr) < 8: break                  #truncated file
+        chunk_id, size = struct.unpack('<4sI', hdr[:8])
+        if chunk_id == b'LIST':
+            if len(hdr) < 12 or size < 4: raise container_parse_error('invalid list chunk')
+            yield hdr[8:12], pos+12, size-4
+        else:
+            yield chunk_id, pos+8, size
+        pos += 8+size+(size & 1)                #chunks are padded to an even size
+
+def get_avi_duration(path):
+    """function gets the duration of an AVI file from its main header: frame count times the frame
+    time. OpenDML (large) files count every frame in their extended header instead.
+
+    :param path: file path to process
+    :type path: `os` path
+    :returns: duration in seconds, None if not found
+    :rtype: `float`
+    """
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) != 12 or riff[:4] != b'RIFF' or riff[8:12] != b'AVI ': return None
+        end = min(8+struct.unpack('<I', riff[4:8])[0], os.fstat(f.fileno()).st_size)
+
+        usec_per_frame = None; total_frames = None; odml_frames = None
+        for chunk_id, data_start, size in iter_riff_chunks(f, 12, end):
+            if chunk_id == b'movi': break                   #reached the media data
+            if chunk_id != b'hdrl': continue
+            for hdr_id, hdr_start, hdr_size in iter_riff_chunks(f, data_start, data_start+size):
+                if hdr_id == b'avih' and hdr_size >= 20:
+                    f.seek(hdr_start)
+                    usec_per_frame, _, _, _, total_frames = struct.unpack('<5I', f.read(20))
+                elif hdr_id == b'odml':
+                    for odml_id, odml_start, odml_size in iter_riff_chunks(f, hdr_start, hdr_start+hdr_size):
+                        if odml_id == b'dmlh' and odml_size >= 4:
+                            f.seek(odml_start)
+                            odml_frames = struct.unpack('<I', f.read(4))[0]
+            break
+
+    if odml_frames: total_frames = odml_frames
+    if not usec_per_frame or not total_frames: return None
+    return total_frames*usec_per_frame/1e6
+
+def find_ts_sync(buf, packet_sizes=CONST_ts_packet_sizes):
+    """function finds the packet size and the first packet of MPEG-TS data, where the sync byte repeats
+    at the packet size
+
+    :param buf: TS data
+    :type buf: `bytes`
+    :param packet_sizes: packet sizes to try
+    :type packet_sizes: `list` of `int`
+    :returns: packet size, position of the first packet's sync byte. None if not found
+    :rtype: `tuple`
+    """
+    for packet_size in packet_sizes:
+        for pos in range(min(packet_size, len(buf))):
+            if pos+(sys_ts_sync_checks-1)*packet_size >= len(buf): break
+            if all(buf[pos+i*packet_size] == 0x47 for i in range(sys_ts_sync_checks)): return packet_size, pos
+    return None
+
+def iter_ts_pcrs(buf, packet_size, pos):
+    """function iterates the PCRs in the adaptation fields of the MPEG-TS packets in the buffer
+
+    :param buf: TS data
+    :type buf: `bytes`
+    :param packet_size: packet size, see `find_ts_sync`
+    :type packet_size: `int`
+    :param pos: position of the first packet's sync byte
+    :type pos: `int`
+    :returns: PID of the packet, PCR base (90kHz clock)
+    :rtype: generator of `tuple`
+    """
+    for start in range(pos, len(buf)-187, packet_size):
+        if buf[start] != 0x47: continue                             #lost sync, skip the packet
+        if not buf[start+3] & 0x20 or buf[start+4] < 7: continue    #no adaptation field with room for a PCR
+        if not buf[start+5] & 0x10: continue                        #no PCR flag
+        pid = ((buf[start+1] & 0x1F) << 8) | buf[start+2]
+        p = buf[start+6:start+11]
+        yield pid, (p[0] << 25) | (p[1] << 17) | (p[2] << 9) | (p[3] << 1) | (p[4] >> 7)
+
+def get_ts_duration(path):
+    """function gets the duration of a MPEG-TS/M2TS file from the first and last PCR of a stream. Only
+    the head and the tail of the file are read.
+
+    :param path: file path to process
+    :type path: `os` path
+    :returns: duration in seconds, None if not found
+    :rtype: `float`
+    """
+    with open(path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        head = f.read(sys_ts_scan_bytes)
+        sync = find_ts_sync(head)
+        if sync is None: return None                                #not a TS file
+        packet_size, pos = sync
+        first = next(iter_ts_pcrs(head, packet_size, pos), None)
+        if first is None: return None
+        pcr_pid, first_pcr = first
+
+        tail_start = max(0, file_size-sys_ts_scan_bytes)
+        if tail_start > 0:
+            f.seek(tail_start)
+            tail = f.read(sys_ts_scan_bytes)
+            sync = find_ts_sync(tail, [packet_size])
+            if sync is None: return None
+            pos = sync[1]
+        else: tail = head
+
+    last_pcr = None
+    for pid, pcr in iter_ts_pcrs(tail, packet_size, pos):
+        if pid == pcr_pid: last_pcr = pcr
+    if last_pcr is None: return None
+    return ((last_pcr-first_pcr) % sys_ts_pcr_wrap)/sys_ts_pcr_hz   #PCR wraps around every ~26.5 hours
+
+def get_cv2_duration(path):
+    """function gets the duration of the file at the passed path by opening it with cv2
+
+    :param path: file path to process
+    :type path: `os` path
+    :returns: duration in seconds, if estimation was successful
+    :rtype: `float`, `bool`
+    """
+    duration_seconds = None #temp return for duration
+    est_success = False     #temp return if estimation was successful
+    try: import cv2         #imported on first use, slow to import and only needed as a fallback
+    except ImportError: return duration_seconds, est_success
+
+    #---first try the primary method of capture
+    cap = cv2.VideoCapture(path)                            #open capture path
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))    #get the total number of frames
+    fps = cap.get(cv2.CAP_PROP_FPS)                         #and the frames per second
+
+    if frame_count > 0 and fps > 0:         #if able to get frames, then primary method is OK
+        cap.release()                               #release the capture path - not needed anymore
+        duration_seconds=round(frame_count/fps,0)   #calculate the duration
+        est_success = True                          #and set success
+    else:                                   #else use the fallback method
+        #sometimes with some codecs/containers fps or frames is unreliable, so as an alternative
+        cap.set(cv2.CAP_PROP_POS_AVI_RATIO, 1)              #seek to the end of the file
+        duration_msec = cap.get(cv2.CAP_PROP_POS_MSEC)      #and read the milliseconds at the end
+        cap.release()                                       #release the capture path
+        if duration_msec > 0:
+            duration_seconds = round(duration_msec/1000.0,0)    #alternate calculation for duration
+            est_success = True                                  #and set success
+    #if both fail, reading was not accurate/successful so a None value will be returned
+
+    return duration_seconds, est_success
+
+def get_cv2_seconds(path):
+    """function is the cv2 probe backend, see `get_cv2_duration`
+
+    :returns: duration in seconds, None if not found
+    :rtype: `float`
+    """
+    return get_cv2_duration(path)[0]
+
+def register_probe_backend(name, func, extensions=()):
+    """function registers a probe backend, tried for files with the passed extensions after the backends
+    already registered for them (and before the fallback backend). Backends registered at runtime are
+    only used in worker processes that are forked after they are registered.
+
+    :param name: backend name, recorded with each result
+    :type name: `string`
+    :param func: probe function, called with the file path and returning the duration in seconds (None if
+        not found). Any exception is treated as not found
+    :type func: callable
+    :param extensions: file extensions (including the dot) to use the backend for
+    :type extensions: iterable of `string`
+    """
+    sys_probe_backends[name] = func
+    for ext in extensions:
+        names = sys_probe_ext_backends.setdefault(ext.lower(), [])
+        if name not in names: names.append(name)
+
+def get_probe_backends(path):
+    """function returns the names of the probe backends to try for the passed file, in order"""
+    names = list(sys_probe_ext_backends.get(os.path.splitext(path)[-1].lower(), []))
+    if sys_probe_fallback in sys_probe_backends and sys_probe_fallback not in names: names.append(sys_probe_fallback)
+    return names
+
+def get_mediafile_rawdir(path):
+    """function gets the duration of the file at the passed path. The backends for the file's extension
+    (header-only reads) are tried in order, the fallback backend (cv2) only when none found a duration.
+
+    :param path: file path to process
+    :type path: `os` path
+    :returns: duration in seconds, if estimation was successful, backend that found it (None if none did),
+        probe status
+    :rtype: `float`, `bool`, `string`, `CONST_probe_status` entry
+    """
+    for name in get_probe_backends(path):
+        try: duration = sys_probe_backends[name](path)
+        except Exception: duration = None       #not readable or not a valid file for this backend
+        if duration is not None and duration > 0: return round(duration, 0), True, name, CONST_probe_status['ok']
+    return None, False, None, CONST_probe_status['none']
+
+def safe_get_mediafile_rawdir(path):
+    """function gets the duration of the file at the passed path, any failure while probing is
+    returned as an unsuccessful estimate instead of raised
+
+    :param path: file path to process
+    :type path: `os` path
+    :returns: duration in seconds, if estimation was successful, backend that found it, probe status
+    :rtype: `float`, `bool`, `string`, `CONST_probe_status` entry
+    """
+    try:
+        return get_mediafile_rawdir(path)
+    except Exception:
+        return None, False, None, CONST_probe_status['error']
+
+def get_failed_result(status):
+    """function returns the probe result of a file that couldn't be probed, with the passed status"""
+    return None, False, None, status
+
+def run_probe_worker(conn):
+    """function is the loop of a probe worker process: probes each file path received and sends back
+    the result, until it receives None or the connection is closed
+
+    :param conn: connection to the parent process
+    :type conn: `multiprocessing.connection.Connection`
+    """
+    while True:
+        try: path = conn.recv()
+        except (EOFError, OSError): break       #parent went away
+        if path is None: break
+        conn.send(safe_get_mediafile_rawdir(path))
+
+class probe_worker:
+    def __init__(self, ctx):
+        """disposable worker process that probes one file at a time
+
+        :param ctx: multiprocessing context to start the process with
+        :type ctx: `multiprocessing` context
+        """
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=run_probe_worker, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()                      #only the worker holds its end, so a crash reads as EOF here
+        self.task = None                        #(index, path) of the file being probed, None if idle
+        self.deadline = None                    #monotonic time the probe must finish by, None for no limit
+        self.started = None                     #`time.perf_counter` time the file was sent
+
+    def submit(self, idx, path, timeout=None):
+        """function sends a file to the worker to probe
+
+        :param idx: index of the item, passed back with the result
+        :type idx: `int`
+        :param path: file path to probe
+        :type path: `os` path
+        :param timeout: seconds the probe may take, None for no limit
+        :type timeout: `float`
+        """
+        self.task = (idx, path)
+        self.deadline = time.monotonic()+timeout if timeout is not None else None
+        self.started = time.perf_counter()
+        self.conn.send(path)
+
+    def receive(self):
+        """function reads the result of the file being probed, the worker must have sent it (or died)
+
+        :returns: index, path and result of the probed file, result has a crashed status if the worker died
+        :rtype: `int`, `os` path, `tuple`
+        """
+        idx, path = self.task
+        self.task = None; self.deadline = None
+        try: result = self.conn.recv()
+        except (EOFError, OSError): result = get_failed_result(CONST_probe_status['crash'])
+        return idx, path, result
+
+    def is_alive(self):
+        """function checks if the worker process is still running and usable"""
+        return not self.conn.closed and self.process.is_alive()
+
+    def kill(self):
+        """function kills the worker process right away, e.g. when it ran over its time budget"""
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        """function stops the worker process, it is killed if busy or if it doesn't exit in time"""
+        if self.task is None and not self.conn.closed:
+            try: self.conn.send(None)
+            except OSError: pass
+            self.process.join(sys_probe_stop_wait)
+        if self.process.is_alive(): self.process.kill()
+        self.process.join()
+        if not self.conn.closed: self.conn.close()
+
+def probe_files_parallel(items, workers=sys_probe_workers, max_inflight=None, timeout=sys_probe_timeout, metrics=None):
+    """function probes the passed files in a pool of disposable worker processes. Results are yielded
+    in the same order as the passed items as soon as they (and every item before them) are done. Items
+    that already have a result (e.g. from the probe cache) are passed through in order without being
+    probed. The number of items taken but not yet yielded is bounded, so the passed items can be a lazy
+    generator and large scans don't queue everything at once. A worker that runs over the time budget
+    of a file is killed, as is one that crashes, the file gets a timeout/crashed status and a new worker
+    takes its place.
+
+    :param items: file path and known result, None if the file needs to be probed
+    :type items: iterable of (`os` path, (duration, estimation successful, backend, status) or None)
+    :param workers: number of worker processes, 1 or less probes in this process when there is no time budget
+    :type workers: `int`
+    :param max_inflight: max items taken and not yet yielded, defaults to a few per worker
+    :type max_inflight: `int`
+    :param timeout: wall clock seconds allowed to probe each file, None for no limit
+    :type timeout: `float`
+    :param metrics: recorder the probes are timed in (on the timeline by worker), None to not record them
+    :type metrics: `job_metrics` instance
+    :returns: file path, (duration in seconds, if estimation was successful, backend, status), if the file was
+        probed, seconds the probe took (None if not probed)
+    :rtype: generator of `tuple`
+    """
+    def probe_done(path, result, start, end, tid=None):
+        """function records a finished probe and returns it as yielded"""
+        if metrics is not None: metrics.add_time('probe', start, end, tid, {'file':path, 'backend':result[2], 'status':result[3]})
+        return path, result, True, round(end-start, 6)
+
+    if timeout is not None and timeout <= 0: timeout = None
+    if (workers is None or workers <= 1) and timeout is None:  #serial mode, no workers needed
+        for path, result in items:
+            if result is None:
+                start = time.perf_counter(); result = safe_get_mediafile_rawdir(path)
+                yield probe_done(path, result, start, time.perf_counter())
+            else: yield path, result, False, None
+        return
+    workers = max(1, workers or 1)
+    if max_inflight is None: max_inflight = workers*sys_probe_inflight_per_worker
+
+    ctx = multiprocessing.get_context()
+    item_iter = iter(items); items_done = False
+    pending = []            #files waiting on a free worker [(index, path)]
+    idle = []               #workers waiting on a file
+    busy = []               #workers probing a file
+    results = {}            #finished items waiting on an earlier item {index: (path, result, probed, probe seconds)}
+    taken = 0; next_out = 0
+    try:
+        while True:
+            #--keep the workers fed up to the in-flight limit
+            while not items_done and len(pending)+len(busy)+len(results) < max_inflight:
+                try: path, result = next(item_iter)
+                except StopIteration: items_done = True; break
+                if result is not None:      #already known, just keep its place in the order
+                    results[taken] = (path, result, False, None)
+                else: pending.append((taken, path))
+                taken += 1
+                if next_out in results: break   #yield what is ready before blocking on more items
+            while len(pending) > 0 and (len(idle) > 0 or len(busy) < workers):
+                worker = idle.pop() if len(idle) > 0 else probe_worker(ctx)
+                idx, path = pending.pop(0)
+                try: worker.submit(idx, path, timeout)
+                except OSError:             #worker died while idle, replace it and try again
+                    worker.kill(); pending.insert(0, (idx, path))
+                    continue
+                busy.append(worker)
+            if len(busy) == 0 and len(pending) == 0 and len(results) == 0: break
+
+            #--collect finished probes, kill workers over their budget
+            if len(busy) > 0 and next_out not in results:
+                deadlines = [w.deadline for w in busy if w.deadline is not None]
+                wait_sec = max(0.0, min(deadlines)-time.monotonic()) if len(deadlines) > 0 else None
+                ready = multiprocessing.connection.wait([w.conn for w in busy], wait_sec)
+                now = time.monotonic()
+                for worker in list(busy):
+                    started = worker.started; pid = worker.process.pid
+                    if worker.conn in ready:
+                        idx, path, result = worker.receive()
+                        busy.remove(worker)
+                        if worker.is_alive(): idle.append(worker)
+                        else: worker.stop()                             #crashed, replaced when needed
+                        results[idx] = probe_done(path, result, started, time.perf_counter(), pid)
+                    elif worker.deadline is not None and now >= worker.deadline:
+                        idx, path = worker.task
+                        busy.remove(worker); worker.kill()              #stuck, replaced when needed
+                        results[idx] = probe_done(path, get_failed_result(CONST_probe_status['timeout']), started, time.perf_counter(), pid)
+            while next_out in results:
+                yield results.pop(next_out)
+                next_out += 1
+    finally:
+        for worker in busy: worker.kill()       #don't wait on a probe that may never finish
+        for worker in idle: worker.stop()
+
+class file_prober:
+    def __init__(self):
+        """prober of single files with a time budget. Keeps one worker process for every file, so a file
+        doesn't pay for starting a process, and replaces it only once it times out or crashes. Safe to
+        use from several threads, files are probed one at a time."""
+        self.worker = None                      #worker process, started on first use
+        self.lock = threading.Lock()
+
+    def get_worker(self):
+        """function returns the worker, starting a new one if there is none or it died while idle"""
+        if self.worker is not None and not self.worker.is_alive():
+            self.worker.stop(); self.worker = None
+        if self.worker is None: self.worker = probe_worker(multiprocessing.get_context())
+        return self.worker
+
+    def probe(self, path, timeout=sys_probe_timeout):
+        """function probes a single file, see `probe_file`"""
+        if timeout is not None and timeout <= 0: timeout = None
+        if timeout is None: return safe_get_mediafile_rawdir(path)     #nothing to enforce, no worker needed
+        with self.lock:
+            worker = self.get_worker()
+            try: worker.submit(0, path, timeout)
+            except OSError:                     #died since the check, start over with a new one
+                worker.kill(); self.worker = None
+                worker = self.get_worker(); worker.submit(0, path, timeout)
+            if len(multiprocessing.connection.wait([worker.conn], timeout)) == 0:
+                worker.kill(); self.worker = None                       #stuck, replaced on the next file
+                return get_failed_result(CONST_probe_status['timeout'])
+            _, _, result = worker.receive()
+            if not worker.is_alive(): worker.stop(); self.worker = None    #crashed
+            return result
+
+    def close(self):
+        """function stops the worker process"""
+        with self.lock:
+            if self.worker is not None: self.worker.stop(); self.worker = None
+
+sys_file_prober = file_prober()         #shared by every `probe_file` call
+
+def probe_file(path, timeout=sys_probe_timeout):
+    """function probes a single file in a worker process with a time budget. The worker is kept for the next
+    file, and only replaced if it runs over the budget or crashes (see `file_prober`).
+
+    :param path: file path to process
+    :type path: `os` path
+    :param timeout: wall clock seconds allowed to probe the file, None to probe in this process
+    :type timeout: `float`
+    :returns: duration in seconds, if estimation was successful, backend that found it, probe status
+    :rtype: `float`, `bool`, `string`, `CONST_probe_status` entry
+    """
+    return sys_file_prober.probe(path, timeout)
+
+#--built in probe backends, cv2 is the fallback tried last for every file
+register_probe_backend('mkv', get_mkv_duration, ['.mkv', '.webm'])
+register_probe_backend('mp4', get_mp4_duration, ['.mp4', '.m4v', '.mov'])
+register_probe_backend('avi', get_avi_duration, ['.avi'])
+register_probe_backend('ts', get_ts_duration, ['.ts', '.m2ts'])
+register_probe_backend(sys_probe_fallback, get_cv2_seconds)
@@ -0,0 +1,56 @@
+"""
+Single pass directory scanner used to find media files to probe.
+
+The tree is walked once with `os.scandir` and files are filtered by extension using the
+directory entry data, so non-media files are never stat'd. Files are yielded lazily in the
+same order as a top-down `os.walk`, and the totals are counted as the walk goes.
+"""
+
+#-----------------------------imports
+import os
+
+#-----------------------------supporting methods, classes, constants
+class media_scanner:
+    def __init__(self, root, extensions):
+        """iterable that walks the passed directory and yields the `os.DirEntry` of each file with a
+        matching extension. Counters are updated while iterating so the total is known incrementally.
+
+        :param root: directory to walk, including its sub directories
+        :type root: `os` path
+        :param extensions: accepted file extensions (lower case, including the dot)
+        :type extensions: iterable of `string`
+        """
+        self.root = root
+        self.extensions = set(extensions)
+        self.num_dirs = 0           #directories walked so far
+        self.num_files = 0          #files (of any type) seen so far
+        self.num_found = 0          #files with a matching extension found so far
+        self.walk_done = False      #true once the whole tree has been walked
+        self.errors = []            #directories that could not be read
+
+    def __iter__(self):
+        dir_stack = [self.root]                         #directories left to walk
+        while len(dir_stack) > 0:
+            dir_path = dir_stack.pop()
+            try:
+                with os.scandir(dir_path) as it: entries = list(it)
+            except OSError:
+                self.errors.append(dir_path); continue  #can't read the directory, skip it like os.walk does
+            self.num_dirs += 1
+
+            sub_dirs = []                               #directories to walk after this directory's files
+            for entry in entries:
+                try: is_dir = entry.is_dir()
+                except OSError: is_dir = False
+                if is_dir:
+                    try: is_link = entry.is_symlink()
+                    except OSError: is_link = False
+                    if not is_link: sub_dirs.append(entry.path)    #don't follow directory links, same as os.walk
+                    continue
+
+                self.num_files += 1
+                if os.path.splitext(entry.name)[-1].lower() in self.extensions:
+                    self.num_found += 1
+                    yield entry
+            dir_stack.extend(reversed(sub_dirs))        #keep os.walk top-down order
+        self.walk_done = True
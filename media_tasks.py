@@ -0,0 +1,1197 @@
+"""
+Long running media/file tasks: parsing media files, creating the properties export, checking an
+update template for errors and updating/moving the files.
+
+Every task takes a `job_progress` reporter as its first argument. Progress is reported through it
+and it is checked between files so a running task can be canceled cleanly. Nothing in here depends
+on tkinter so the tasks can run on a background job thread.
+"""
+
+#-----------------------------imports
+import collections
+import errno
+import os
+import shutil
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import media_probe
+from file_transfer import (file_transfer, run_file_transfers, copy_file_fast, copy_file_verified, transfer_verify_error,
+                           placement_planner, sys_transfer_workers, CONST_placement_modes, CONST_placement_methods)
+from job_engine import format_bytes
+from media_scan import media_scanner
+from update_journal import CONST_journal_ops
+from update_template import template_reader
+from media_export import export_writer, rolling_export_writer, get_export_path, iter_export_rows
+from media_watch import inotify_watcher, poll_watcher, file_debouncer, CONST_watch_events, sys_watch_stable_sec, sys_watch_check_sec
+from media_dedup import get_file_checksums, get_keep_order, get_duplicate_rows, write_dedup_template, sys_dedup_workers, sys_dedup_min_size
+from media_core import (media_file_props, check_dir_exists, check_file_exists, get_file_ext,
+                        CONST_openType, CONST_media_formats, CONST_CSVexport_hdrs, CONST_CSVdelta_hdrs,
+                        CONST_CSVtiming_hdrs, CONST_export_formats, CONST_change_types, CONST_err_types, CONST_probe_status,
+                        sys_tmplt_oldFile_hdrName, sys_tmplt_newFile_hdrName)
+
+#-----------------------------supporting methods, classes, constants
+#--misc constants
+sys_probe_workers = media_probe.sys_probe_workers   #worker processes used when parsing a directory
+sys_probe_timeout = media_probe.sys_probe_timeout   #seconds allowed to probe each file
+sys_probe_unfinished = (CONST_probe_status['timeout'], CONST_probe_status['crash'])   #probes that didn't finish, tried again next time
+sys_check_workers = 16                              #threads used to check template files exist (hides NAS latency)
+sys_check_scandir_min = 8                           #files in one directory before it is listed instead of checking each file
+sys_watch_export_name = 'MediaProperties_Rolling'   #name of the rolling export the watch folder appends to
+sys_free_space_reserve = 64*1024*1024               #bytes left free on each destination file system by an update
+
+def get_mediafile_cached(path, cache=None, probe_timeout=sys_probe_timeout):
+    """function gets the duration of the file at the passed path, using the probe cache when the
+    file has not changed since it was last probed
+
+    :param path: file path to process
+    :type path: `os` path
+    :param cache: probe result cache, None to always probe
+    :type cache: `probe_cache` instance
+    :param probe_timeout: wall clock seconds allowed to probe the file, None for no limit
+    :type probe_timeout: `float`
+    :returns: duration in seconds, if estimation was successful, probe backend that found it, probe status
+    :rtype: `float`, `bool`, `string`, `CONST_probe_status` entry
+    """
+    if cache is None: return media_probe.probe_file(path, probe_timeout)
+    try: st = os.stat(path)
+    except OSError: return media_probe.get_failed_result(CONST_probe_status['error'])  #file not readable, nothing to probe
+
+    cached = cache.get(path, st)
+    if cached is not None: return cached        #unchanged since last probe
+    result = media_probe.probe_file(path, probe_timeout)
+    cache_mediafile_result(cache, path, *result, st=st)
+    return result
+
+def cache_mediafile_result(cache, path, dur, est_success, backend=None, status=None, st=None):
+    """function stores a probe result in the probe cache
+
+    :param cache: probe result cache, None to do nothing
+    :type cache: `probe_cache` instance
+    :param path: file path that was probed
+    :type path: `os` path
+    :param dur: duration in seconds
+    :type dur: `float`
+    :param est_success: if estimation was successful
+    :type est_success: `bool`
+    :param backend: probe backend that found the duration
+    :type backend: `string`
+    :param status: probe status, probes that timed out or crashed aren't cached so they are tried again
+    :type status: `CONST_probe_status` entry
+    :param st: stat result of the file when it was probed, None to stat it now
+    :type st: `os.stat_result`
+    """
+    if cache is None or status in sys_probe_unfinished: return
+    if st is None:
+        try: st = os.stat(path)
+        except OSError: return                  #file went away, nothing to cache
+    cache.put(path, st, dur, est_success, backend, status)
+
+def get_file_change(base, file):
+    """function compares a parsed file with its entry in the baseline export
+
+    :param base: file properties in the baseline, None if the file wasn't in it
+    :type base: `media_file_props` instance
+    :param file: file properties just parsed
+    :type file: `media_file_props` instance
+    :returns: type of change, None if unchanged
+    :rtype: `CONST_change_types` entry
+    """
+    if base is None: return CONST_change_types['added']
+    if base.is_unchanged(file.file_size, file.mod_time_ns):
+        #an unfinished probe in the baseline is tried again, it is only a change if it now has a different result
+        if base.probe_status not in sys_probe_unfinished or base.probe_status == file.probe_status: return None
+    if base.file_size is None or base.mod_time_ns is None:
+        #older export without the file size/time, so only a different result counts as a change
+        if base.good_estimate == file.good_estimate and base.est_time_str == file.est_time_str: return None
+    return CONST_change_types['changed']
+
+def iter_dir_mediafiles(progress, path, cache=None, workers=sys_probe_workers, baseline=None, scan_errors=None,
+                        probe_timeout=sys_probe_timeout):
+    """function parses all media files in the passed directory and its sub directories, yielding each
+    file in walk order as its result comes back. Files that are unchanged since the baseline export (same
+    size and modification time) reuse the baseline result and aren't probed, unless their probe timed out
+    or crashed.
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param path: directory path to process
+    :type path: `os` path
+    :param cache: probe result cache, None to always probe
+    :type cache: `probe_cache` instance
+    :param workers: number of worker processes to probe with, 1 probes one file at a time
+    :type workers: `int`
+    :param baseline: previous export {file path: file properties}, None for a full parse. When passed,
+        the change since the baseline is set on each file
+    :type baseline: `dict` of `media_file_props` instance
+    :param scan_errors: directories that couldn't be read are added to this list, if passed
+    :type scan_errors: `list`
+    :param probe_timeout: wall clock seconds allowed to probe each file, None for no limit
+    :type probe_timeout: `float`
+    :returns: file properties of each file found
+    :rtype: generator of `media_file_props` instance
+    """
+    progress.start('Parsing Files')                                 #total unknown until the walk is done
+    scanner = media_scanner(path, CONST_media_formats.values())     #single pass walk, media files only
+    file_stats = {}                                                 #{file path: stat result} of files waiting on their result
+    metrics = progress.metrics
+
+    def probe_items():
+        """generator of the scanned files and their known result, None if it needs to be probed"""
+        entries = iter(scanner)
+        while True:
+            walk_start = time.perf_counter()
+            entry = next(entries, None)
+            metrics.add_time('walk', walk_start, trace=False)  #time spent walking, between the files found
+            if entry is None: break
+            progress.check_cancel()                         #stop feeding new files once canceled
+            metrics.count('scan.stat')
+            try: st = entry.stat()
+            except OSError:                                 #file not readable, nothing to probe
+                yield entry.path, media_probe.get_failed_result(CONST_probe_status['error']); continue
+            file_stats[entry.path] = st
+            base = baseline.get(entry.path) if baseline is not None else None
+            if base is not None and base.is_unchanged(st.st_size, st.st_mtime_ns) and base.probe_status not in sys_probe_unfinished:
+                yield entry.path, (base.est_time_raw, base.good_estimate, base.probe_backend, base.probe_status)  #unchanged since the baseline
+            elif cache is None: yield entry.path, None
+            else: yield entry.path, cache.get(entry.path, st)
+
+    #--files without a known result are probed in parallel, results come back in walk order
+    probe_results = media_probe.probe_files_parallel(probe_items(), workers, timeout=probe_timeout, metrics=metrics)
+    for file_path, (dur, est_success, backend, status), probed, probe_sec in probe_results:
+        progress.check_cancel()                             #stop between files if canceled
+        if scanner.walk_done: progress.set_total(scanner.num_found)    #total known, show real progress
+        progress.step()                                     #update progress
+
+        st = file_stats.pop(file_path, None)
+        if probed:
+            cache_mediafile_result(cache, file_path, dur, est_success, backend, status, st)
+            metrics.count('probe.files'); metrics.count('probe.backend.'+(backend or 'none')); metrics.count('probe.status.'+status)
+        else: metrics.count('probe.reused')
+        file = media_file_props({'name':os.path.basename(file_path),
+                                 'path':file_path,
+                                 'runtime':dur,
+                                 'est_ok':est_success,
+                                 'size':st.st_size if st is not None else None,
+                                 'mtime_ns':st.st_mtime_ns if st is not None else None,
+                                 'backend':backend,
+                                 'status':status,
+                                 'probe_sec':probe_sec})
+        if baseline is not None: file.change = get_file_change(baseline.get(file_path), file)
+        yield file
+    if scan_errors is not None: scan_errors.extend(scanner.errors)
+    metrics.count('scan.dirs', scanner.num_dirs); metrics.count('scan.files', scanner.num_files); metrics.count('scan.found', scanner.num_found)
+    counters = metrics.get_summary()['counters']
+    if counters.get('probe.files', 0) > 0:                  #share of the probes that needed the fallback backend
+        metrics.set_value('probe.fallback_rate', counters.get('probe.backend.'+media_probe.sys_probe_fallback, 0)/counters['probe.files'])
+
+def parse_dir_mediafiles(progress, path, open_type, cache=None, workers=sys_probe_workers, probe_timeout=sys_probe_timeout):
+    """function prases the file at the passed path or all files in the passed directory and its sub directories
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param path: file or directory path to process
+    :type path: `os` path
+    :param open_type: file or directory choice
+    :param open_type: `CONST_openType` entry
+    :param cache: probe result cache, None to always probe
+    :type cache: `probe_cache` instance
+    :param workers: number of worker processes to probe with, 1 probes one file at a time
+    :type workers: `int`
+    :param probe_timeout: wall clock seconds allowed to probe each file, None for no limit
+    :type probe_timeout: `float`
+    :returns: list of file property objects to output
+    :rtype: `media_file_props` instance
+    """
+    tmp_parsed_files = []   #temp list of files found to return information on
+
+    if open_type == CONST_openType['file']:
+        filename = os.path.basename(path)
+        file_ext = get_file_ext(filename)                       #get the extention
+        if file_ext in CONST_media_formats.values():            #if its a valid file type, then process
+            progress.start('Parsing File', 1)
+            try: st = os.stat(path)
+            except OSError: st = None
+            dur, est_success, backend, status = get_mediafile_cached(path, cache, probe_timeout)  #get the file duration
+            progress.step()
+            #--append result to parsed files list
+            tmp_parsed_files.append(media_file_props({'name':filename,
+                                                      'path':path,
+                                                      'runtime':dur,
+                                                      'est_ok':est_success,
+                                                      'size':st.st_size if st is not None else None,
+                                                      'mtime_ns':st.st_mtime_ns if st is not None else None,
+                                                      'backend':backend,
+                                                      'status':status}))
+        else:
+            raise ValueError("Selected file type is not supported.")
+    elif open_type == CONST_openType['dir']:
+        tmp_parsed_files = list(iter_dir_mediafiles(progress, path, cache, workers, probe_timeout=probe_timeout))
+    else:
+        raise ValueError("Valid path/object was not selected. Please try again.")
+
+    return tmp_parsed_files
+
+def create_mediafiles_export(progress, files, savedir, export_name='MediaProperties', export_hdrs=CONST_CSVexport_hdrs,
+                             export_fmt=CONST_export_formats['CSV']):
+    """function creates the output file that contains the passed file(s) properties. If canceled
+    part way through, the partial file is removed.
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param files: file properties to output
+    :type files: list of `media_file_props` instance(s)
+    :param savedir: directory path to output created file at
+    :type savedir: `os` directory path
+    :param export_name: name of the export, used in the output file name
+    :type export_name: `string`
+    :param export_hdrs: output columns, {'media_file_props.attr_name':'output File Header'}
+    :type export_hdrs: `dict`
+    :param export_fmt: export format
+    :type export_fmt: `CONST_export_formats` entry
+    :returns: output file path
+    :rtype: `os` path
+    """
+    progress.start('Creating Export', len(files))                   #set label and total
+    with export_writer(get_export_path(savedir, export_name, export_fmt), export_hdrs) as writer:
+        for file in files:                                          #loop through all file(s)
+            progress.check_cancel()                                 #stop between files if canceled
+            writer.write(file)
+            progress.step()                                         #update progress
+    return writer.out_filepath
+
+def export_media_properties(progress, path, open_type, savedir, cache=None, workers=sys_probe_workers,
+                            export_fmt=CONST_export_formats['CSV'], on_file=None, probe_timeout=sys_probe_timeout, probe_timing=False):
+    """function parses the file(s) at the passed path and creates the output file of their properties.
+    Files are written to the export as they are parsed, so they aren't all held in memory.
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param path: file or directory path to process
+    :type path: `os` path
+    :param open_type: file or directory choice
+    :param open_type: `CONST_openType` entry
+    :param savedir: directory path to output created file at
+    :type savedir: `os` directory path
+    :param cache: probe result cache, None to always probe
+    :type cache: `probe_cache` instance
+    :param workers: number of worker processes to probe with, 1 probes one file at a time
+    :type workers: `int`
+    :param export_fmt: export format
+    :type export_fmt: `CONST_export_formats` entry
+    :param on_file: called with each file once it is written, e.g. to also output it elsewhere
+    :type on_file: callable
+    :param probe_timeout: wall clock seconds allowed to probe each file, None for no limit
+    :type probe_timeout: `float`
+    :param probe_timing: add the probe timing columns (`CONST_CSVtiming_hdrs`) to the export
+    :type probe_timing: `bool`
+    :returns: number of files exported, output file path
+    :rtype: `int`, `os` path
+    """
+    export_hdrs = {**CONST_CSVexport_hdrs, **CONST_CSVtiming_hdrs} if probe_timing else CONST_CSVexport_hdrs
+    with export_writer(get_export_path(savedir, 'MediaProperties', export_fmt), export_hdrs) as writer:
+        if open_type == CONST_openType['dir']: files = iter_dir_mediafiles(progress, path, cache, workers, probe_timeout=probe_timeout)
+        else: files = parse_dir_mediafiles(progress, path, open_type, cache, workers, probe_timeout)
+        for file in files:                                          #written as each file is parsed
+            with progress.metrics.timer('export.write', trace=False): writer.write(file)
+            if on_file is not None: on_file(file)
+    if cache is not None: cache.prune()                             #evict old entries if the cache is too large
+    return writer.num_rows, writer.out_filepath
+
+def get_csv_number(text, num_type):
+    """function converts a number read from an export, None if blank or not a number"""
+    try: return num_type(text)
+    except (TypeError, ValueError): return None
+
+def read_mediafiles_export(path):
+    """function reads a previous properties export (any `CONST_export_formats`), used as the baseline of
+    an incremental export
+
+    :param path: properties export file
+    :type path: `os` path
+    :returns: file properties in the export, {file path: file properties}
+    :rtype: `dict` of `media_file_props` instance
+    """
+    hdrs = CONST_CSVexport_hdrs
+    files = {}
+    for row in iter_export_rows(path):
+        if hdrs['full_path'] not in row: raise ValueError("Selected file is not a media properties export.")
+        file_path = row.get(hdrs['full_path']) or ''
+        if file_path == '': continue
+        est_ok = row.get(hdrs['good_estimate']) in (True, 'True')      #typed in JSON Lines/Parquet
+        files[file_path] = media_file_props({'name':row.get(hdrs['file_name']) or os.path.basename(file_path),
+                                             'path':file_path,
+                                             'runtime':get_csv_number(row.get(hdrs['est_time_raw']), float),
+                                             'est_ok':est_ok,
+                                             'size':get_csv_number(row.get(hdrs['file_size']), int),
+                                             'mtime_ns':get_csv_number(row.get(hdrs['mod_time_ns']), int),
+                                             'backend':row.get(hdrs['probe_backend']) or None,
+                                             'status':row.get(hdrs['probe_status']) or CONST_probe_status['ok' if est_ok else 'none']})
+    return files
+
+def is_path_in_dir(path, dir_path):
+    """function checks if the passed path is inside the passed directory (or one of its sub directories)"""
+    return get_path_key(path).startswith(os.path.join(get_path_key(dir_path), ''))
+
+def export_media_changes(progress, path, baseline_path, savedir, cache=None, workers=sys_probe_workers,
+                         export_fmt=CONST_export_formats['CSV'], probe_timeout=sys_probe_timeout, probe_timing=False):
+    """function parses the files in the passed directory against a previous export, only probing files that
+    are new or changed since. Creates an export of the added, changed and removed files and an updated full
+    export (snapshot) that can be the baseline of the next run. Files in the baseline outside the passed
+    directory, or in directories that couldn't be read, are carried over to the snapshot unchanged. The
+    snapshot is written as files are parsed, only the changes are held in memory.
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param path: directory path to process
+    :type path: `os` path
+    :param baseline_path: previous properties export file
+    :type baseline_path: `os` path
+    :param savedir: directory path to output created files at
+    :type savedir: `os` directory path
+    :param cache: probe result cache, None to always probe
+    :type cache: `probe_cache` instance
+    :param workers: number of worker processes to probe with, 1 probes one file at a time
+    :type workers: `int`
+    :param export_fmt: export format of the changes and snapshot
+    :type export_fmt: `CONST_export_formats` entry
+    :param probe_timeout: wall clock seconds allowed to probe each file, None for no limit
+    :type probe_timeout: `float`
+    :param probe_timing: add the probe timing columns (`CONST_CSVtiming_hdrs`) to the exports
+    :type probe_timing: `bool`
+    :returns: changed file property objects, changes output file path, snapshot output file path
+    :rtype: `list`, `os` path, `os` path
+    """
+    progress.start('Reading Baseline')
+    baseline = read_mediafiles_export(baseline_path)
+
+    timing_hdrs = CONST_CSVtiming_hdrs if probe_timing else {}
+    changes = []; scan_errors = []; found_paths = set()
+    with export_writer(get_export_path(savedir, 'MediaProperties', export_fmt), {**CONST_CSVexport_hdrs, **timing_hdrs}) as writer:
+        for file in iter_dir_mediafiles(progress, path, cache, workers, baseline, scan_errors, probe_timeout):
+            with progress.metrics.timer('export.write', trace=False): writer.write(file)   #written as each file is parsed
+            found_paths.add(file.full_path)
+            if file.change is not None: changes.append(file)
+
+        #--baseline files not found are removed, unless they weren't looked for
+        for file_path, base in baseline.items():
+            if file_path in found_paths: continue
+            if is_path_in_dir(file_path, path) and not any(is_path_in_dir(file_path, err_dir) for err_dir in scan_errors):
+                base.change = CONST_change_types['removed']
+                changes.append(base)
+            else: writer.write(base)
+
+        changes_filepath = create_mediafiles_export(progress, changes, savedir, 'MediaChanges', {**CONST_CSVdelta_hdrs, **timing_hdrs},
+                                                    export_fmt)
+    out_filepath = writer.out_filepath
+    if cache is not None: cache.prune()                 #evict old entries if the cache is too large
+    return changes, changes_filepath, out_filepath
+
+def get_rolling_export_path(savedir, export_fmt=CONST_export_formats['CSV']):
+    """function returns the path of the rolling export in the passed directory, see `watch_media_folder`"""
+    return os.path.join(savedir, sys_watch_export_name+export_fmt)
+
+def needs_catalog(base, st):
+    """function checks if a file has to be (re)cataloged: not cataloged yet, changed since, or its probe didn't finish
+
+    :param base: file properties when last cataloged, None if never
+    :type base: `media_file_props` instance
+    :param st: current stat result of the file
+    :type st: `os.stat_result`
+    :rtype: `bool`
+    """
+    return base is None or not base.is_unchanged(st.st_size, st.st_mtime_ns) or base.probe_status in sys_probe_unfinished
+
+def watch_media_folder(progress, path, savedir, cache=None, export_fmt=CONST_export_formats['CSV'], poll=False,
+                       stable_sec=sys_watch_stable_sec, probe_timeout=sys_probe_timeout, on_file=None):
+    """function watches the passed directory and its sub directories, cataloging each media file once it is
+    finished being written (see `media_watch`) by probing it and appending it to the rolling export. Files
+    already in the tree that are new or changed since they were last cataloged are done first. Runs until
+    canceled.
+
+    :param progress: progress reporter, stepped once per file cataloged
+    :type progress: `job_progress` instance
+    :param path: directory path to watch
+    :type path: `os` path
+    :param savedir: directory of the rolling export, created there if it doesn't exist
+    :type savedir: `os` directory path
+    :param cache: probe result cache, None to always probe
+    :type cache: `probe_cache` instance
+    :param export_fmt: rolling export format, CSV or JSON Lines
+    :type export_fmt: `CONST_export_formats` entry
+    :param poll: poll the tree instead of using inotify
+    :type poll: `bool`
+    :param stable_sec: seconds a file's size/time must be unchanged to be finished, if not seen closed after writing
+    :type stable_sec: `float`
+    :param probe_timeout: wall clock seconds allowed to probe each file, None for no limit
+    :type probe_timeout: `float`
+    :param on_file: called with each file once it is cataloged
+    :type on_file: callable
+    """
+    out_filepath = get_rolling_export_path(savedir, export_fmt)
+    progress.start('Reading Rolling Export')
+    known = read_mediafiles_export(out_filepath) if os.path.isfile(out_filepath) else {}   #{file path: last cataloged properties}
+
+    extensions = list(CONST_media_formats.values())
+    watcher = None
+    if not poll:
+        try: watcher = inotify_watcher(path, extensions).open()
+        except OSError: watcher = None                  #not on Linux, or out of watches
+    if watcher is None: watcher = poll_watcher(path, extensions).open()
+    progress.metrics.set_value('watch.inotify', isinstance(watcher, inotify_watcher))
+    debouncer = file_debouncer(stable_sec)
+
+    def catch_up():
+        """function queues the files in the tree that are new or changed since they were last cataloged"""
+        for entry in media_scanner(path, extensions):
+            try: st = entry.stat()
+            except OSError: continue
+            #files not modified for a while are finished, they only wait for the settle time
+            if needs_catalog(known.get(entry.path), st): debouncer.touch(entry.path, time.time()-st.st_mtime >= stable_sec)
+
+    try:
+        with rolling_export_writer(out_filepath, CONST_CSVexport_hdrs) as writer:
+            catch_up()                                  #after the watch started, so nothing is missed in between
+            progress.start('Watching Files')
+            next_check = 0.0
+            while True:
+                progress.check_cancel()
+                try: events = watcher.get_events(sys_watch_check_sec)
+                except OSError:
+                    if not isinstance(watcher, inotify_watcher): raise
+                    #can't watch a new directory (e.g. out of watches), so poll from now on. Events of the failed
+                    #read are lost, so the tree is walked again once the poll snapshot is taken
+                    watcher.close(); watcher = poll_watcher(path, extensions).open()
+                    progress.metrics.set_value('watch.inotify', False); progress.metrics.count('watch.fallback')
+                    catch_up(); events = []
+                for event, file_path in events:
+                    if event == CONST_watch_events['removed']: debouncer.remove(file_path)
+                    elif event == CONST_watch_events['rescan']: catch_up()
+                    else: debouncer.touch(file_path, event == CONST_watch_events['closed'])
+                if time.monotonic() < next_check: continue
+                next_check = time.monotonic()+sys_watch_check_sec
+
+                for file_path, st in debouncer.get_ready():
+                    progress.check_cancel()
+                    if not needs_catalog(known.get(file_path), st): continue      #touched, not changed
+                    start = time.perf_counter()
+                    dur, est_success, backend, status = get_mediafile_cached(file_path, cache, probe_timeout)
+                    file = media_file_props({'name':os.path.basename(file_path),
+                                             'path':file_path,
+                                             'runtime':dur,
+                                             'est_ok':est_success,
+                                             'size':st.st_size,
+                                             'mtime_ns':st.st_mtime_ns,
+                                             'backend':backend,
+                                             'status':status,
+                                             'probe_sec':round(time.perf_counter()-start, 6)})
+                    writer.write(file)
+                    known[file_path] = file
+                    progress.metrics.count('watch.cataloged')
+                    progress.step()
+                    if on_file is not None: on_file(file)
+    finally:
+        watcher.close()
+
+def group_dedup_files(files, key):
+    """function groups the passed files by the passed key, only groups of more than one file are kept
+
+    :param files: file properties
+    :type files: iterable of `media_file_props` instance
+    :param key: called with each file, returns its group key or None to leave the file out
+    :type key: callable
+    :returns: groups of files with the same key
+    :rtype: `list` of `list`
+    """
+    groups = {}
+    for file in files:
+        file_key = key(file)
+        if file_key is not None: groups.setdefault(file_key, []).append(file)
+    return [group for group in groups.values() if len(group) > 1]
+
+def hash_dedup_files(progress, files, hashes, full=False, index=None, workers=sys_dedup_workers):
+    """function checksums the passed files for the duplicate check in a thread pool. Checksums in the
+    index of files that haven't changed are used instead of reading the files again.
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param files: files to checksum
+    :type files: `list` of `media_file_props` instance
+    :param hashes: checksums so far, {file path: (block checksum, full checksum or None)}, updated with
+        the results. Files that can't be read are left out
+    :type hashes: `dict`
+    :param full: checksum the whole files (once their block checksums are known), otherwise the sampled blocks
+    :type full: `bool`
+    :param index: duplicate file index, None to read every file
+    :type index: `dedup_index` instance
+    :param workers: number of threads reading files at once
+    :type workers: `int`
+    """
+    progress.start('Hashing Files' if full else 'Hashing File Blocks', len(files))
+    to_hash = []                                                #(file, checksums known) of files to read
+    for file in files:
+        known = hashes.get(file.full_path)
+        if known is None and index is not None: known = index.get(file.full_path, file.file_size, file.mod_time_ns)
+        if known is not None and (not full or known[1] is not None):
+            hashes[file.full_path] = known                      #nothing left to read
+            progress.step()
+        else: to_hash.append((file, known))
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        results = pool.map(lambda item: get_file_checksums(item[0].full_path, item[0].file_size, item[1]), to_hash)
+        for (file, _), (block_hash, full_hash) in zip(to_hash, results):
+            progress.check_cancel()                             #stop between files if canceled
+            progress.step()
+            if block_hash is None:                              #file can't be read, so it can't be compared
+                hashes.pop(file.full_path, None); continue
+            hashes[file.full_path] = (block_hash, full_hash)
+            if index is not None: index.put(file.full_path, file.file_size, file.mod_time_ns, block_hash, full_hash)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def find_duplicate_files(progress, path, cache=None, workers=sys_probe_workers, index=None, hash_workers=sys_dedup_workers,
+                         exclude_dir=None):
+    """function finds the media files in the passed directory and its sub directories with the same contents.
+    Files are grouped by size from the directory scan, files sharing a size are compared by a checksum of a
+    few blocks and only the files that still match are read in full.
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param path: directory path to process
+    :type path: `os` path
+    :param cache: probe result cache, None to always probe
+    :type cache: `probe_cache` instance
+    :param workers: number of worker processes to probe with, 1 probes one file at a time
+    :type workers: `int`
+    :param index: duplicate file index, None to read every file
+    :type index: `dedup_index` instance
+    :param hash_workers: number of threads reading files at once
+    :type hash_workers: `int`
+    :param exclude_dir: files in this directory are left out (e.g. duplicates already moved there)
+    :type exclude_dir: `os` path
+    :returns: groups of duplicate files, largest first, (checksum, files sorted with the one to keep first)
+    :rtype: `list` of (`string`, `list` of `media_file_props` instance)
+    """
+    #--only files of the same size can be duplicates
+    by_size = {}
+    for file in iter_dir_mediafiles(progress, path, cache, workers):
+        if file.file_size is None or file.file_size < sys_dedup_min_size: continue
+        if exclude_dir is not None and is_path_in_dir(file.full_path, exclude_dir): continue
+        by_size.setdefault(file.file_size, []).append(file)
+    if cache is not None: cache.prune()                 #evict old entries if the cache is too large
+    candidates = [file for files in by_size.values() if len(files) > 1 for file in files]
+
+    #--checksum sampled blocks of the candidates, then the whole files that still match
+    hashes = {}
+    hash_dedup_files(progress, candidates, hashes, False, index, hash_workers)
+    survivors = [file for group in group_dedup_files(candidates, lambda f: (f.file_size, hashes[f.full_path][0]) if f.full_path in hashes else None)
+                 for file in group]
+    hash_dedup_files(progress, survivors, hashes, True, index, hash_workers)
+
+    groups = []
+    for files in group_dedup_files(survivors, lambda f: (f.file_size, hashes[f.full_path][1]) if f.full_path in hashes else None):
+        files.sort(key=get_keep_order)
+        groups.append((hashes[files[0].full_path][1], files))
+    groups.sort(key=lambda group: (-group[1][0].file_size, group[1][0].full_path))
+    if index is not None: index.prune()                 #evict old entries if the index is too large
+    return groups
+
+def export_duplicates_template(progress, path, savedir, cache=None, workers=sys_probe_workers, index=None, dup_dir=None):
+    """function finds the duplicate media files in the passed directory and creates a report of them that
+    is also an update template: updating with it moves every copy but one in to the duplicates directory.
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param path: directory path to process
+    :type path: `os` path
+    :param savedir: directory path to output created file at
+    :type savedir: `os` directory path
+    :param cache: probe result cache, None to always probe
+    :type cache: `probe_cache` instance
+    :param workers: number of worker processes to probe with, 1 probes one file at a time
+    :type workers: `int`
+    :param index: duplicate file index, None to read every file
+    :type index: `dedup_index` instance
+    :param dup_dir: directory to move the duplicates to, None for a "Duplicates" directory in `savedir`
+    :type dup_dir: `os` path
+    :returns: groups of duplicate files (see `find_duplicate_files`), report rows, output file path
+    :rtype: `list`, `list` of `dict`, `os` path
+    """
+    if dup_dir is None: dup_dir = os.path.join(savedir, 'Duplicates')
+    groups = find_duplicate_files(progress, path, cache, workers, index, exclude_dir=dup_dir)
+
+    progress.start('Creating Template')
+    rows = get_duplicate_rows(groups, path, dup_dir)
+    out_filepath = get_export_path(savedir, 'Duplicates', CONST_export_formats['CSV'])
+    write_dedup_template(out_filepath, rows)
+    return groups, rows, out_filepath
+
+def get_path_key(path):
+    """function returns a key for the passed path that is the same for paths that point to the same file
+    (redundant separators and dots removed, case folded only where the OS always ignores case)
+    """
+    return os.path.normcase(os.path.normpath(path))
+
+def get_path_collision_key(path):
+    """function returns a key for the passed path that is the same for paths that would point to the same
+    file on a case-insensitive or unicode normalizing file system (e.g. SMB shares, macOS, Windows)
+    """
+    return unicodedata.normalize('NFC', os.path.normpath(path)).casefold()
+
+def check_dir_files_exist(dir_path, file_paths):
+    """function checks which of the passed files exist in the passed directory. A few files are checked one
+    at a time, otherwise the directory is listed once and the files are looked up in the listing.
+
+    :param dir_path: directory containing the files
+    :type dir_path: `os` path
+    :param file_paths: paths of files in the directory to check
+    :type file_paths: `set` of `os` path
+    :returns: the passed paths that exist as files
+    :rtype: `set`
+    """
+    if len(file_paths) < sys_check_scandir_min:                 #not worth listing the whole directory
+        return {path for path in file_paths if check_file_exists(path)}
+
+    try:
+        with os.scandir(dir_path if dir_path != '' else '.') as it: entries = {entry.name:entry for entry in it}
+    except OSError:
+        return set()                                            #directory missing/unreadable, so no files in it
+    folded_names = None                                         #case folded names, built only if needed
+
+    found = set()
+    for path in file_paths:
+        name = os.path.basename(path)
+        entry = entries.get(name)
+        if entry is not None:
+            try:
+                if entry.is_file(): found.add(path)
+            except OSError: pass
+        else:
+            #name may still match with different case on a case-insensitive file system, so ask the OS
+            if folded_names is None: folded_names = {entry_name.casefold() for entry_name in entries}
+            if name.casefold() in folded_names and check_file_exists(path): found.add(path)
+    return found
+
+def get_dir_files(file_paths):
+    """function groups the passed file paths by their directory, blank paths are ignored
+
+    :returns: {directory: set of file paths in it}
+    :rtype: `dict`
+    """
+    dir_files = {}
+    for path in file_paths:
+        if path != '': dir_files.setdefault(os.path.dirname(path), set()).add(path)
+    return dir_files
+
+def check_files_exist(progress, file_paths, workers=sys_check_workers):
+    """function checks which of the passed files exist. Files are grouped by their directory so each
+    directory is checked once, and directories are checked in a thread pool to hide network latency.
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param file_paths: file paths to check, blank paths are ignored
+    :type file_paths: iterable of `os` path
+    :param workers: number of threads checking directories at once
+    :type workers: `int`
+    :returns: the passed paths that exist as files
+    :rtype: `set`
+    """
+    dir_files = get_dir_files(file_paths)
+    stat_dirs = [paths for paths in dir_files.values() if len(paths) < sys_check_scandir_min]  #checked a file at a time
+    progress.metrics.count('check.stat', sum(len(paths) for paths in stat_dirs))
+    progress.metrics.count('check.scandir', len(dir_files)-len(stat_dirs))
+
+    found = set()
+    progress.start('Checking Files', len(dir_files))
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        for dir_found in pool.map(check_dir_files_exist, dir_files.keys(), dir_files.values()):
+            progress.check_cancel()                             #stop between directories if canceled
+            found |= dir_found
+            progress.step()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    return found
+
+def get_free_space(dir_path):
+    """function returns the bytes free on the file system of a directory (for a normal user, like `os.statvfs`
+    f_bavail). A directory that doesn't exist yet is looked up by its nearest existing parent.
+
+    :param dir_path: directory path
+    :type dir_path: `os` path
+    :returns: bytes free, None if not known
+    :rtype: `int`
+    """
+    path = os.path.abspath(dir_path if dir_path != '' else '.')
+    while not os.path.isdir(path) and os.path.dirname(path) != path: path = os.path.dirname(path)
+    try: return shutil.disk_usage(path).free
+    except OSError: return None
+
+def get_space_shortfalls(file_tup_list, planner=None, del_old=False, skip_dsts=(), stat_cache=None, reserve=sys_free_space_reserve,
+                         workers=sys_check_workers):
+    """function sums the bytes an update copies to each destination file system and compares them with its
+    free space. Renames, hard links and clones don't use space. Old files are deleted only after every copy
+    is done, so they don't free any space in time.
+
+    :param file_tup_list: list of files to update/move and the new distination/name
+    :type file_tup_list: `list` of `string``tuples` formatted as [(old_file_path1,new_file_path1),(old_file_2....)...(n)]
+    :param planner: placement planner of the update, None to count every file as a copy (or move)
+    :type planner: `placement_planner` instance
+    :param del_old: the old files will be deleted, so the last destination of each is a move when possible
+    :type del_old: `bool`
+    :param skip_dsts: destinations already done (e.g. by the update being resumed), not counted
+    :type skip_dsts: `set` of `os` path
+    :param stat_cache: cache of file stat results, see `get_file_stat`
+    :type stat_cache: `dict`
+    :param reserve: bytes to leave free on each file system
+    :type reserve: `int`
+    :param workers: number of threads stat'ing the old files at once
+    :type workers: `int`
+    :returns: file systems without enough space, (a destination directory on it, bytes to copy, bytes free)
+    :rtype: `list` of `tuple`
+    """
+    if planner is None: planner = placement_planner()
+    if stat_cache is None: stat_cache = {}
+    last_rows = {}                                  #{old file: index of the last row it is copied/moved in}
+    if del_old:
+        for idx, tup in enumerate(file_tup_list):
+            if tup[1] != '': last_rows[tup[0]] = idx
+
+    #--stat each old file once, in a thread pool to hide network latency
+    old_files = [path for path in {tup[0] for tup in file_tup_list if tup[1] != ''} if path not in stat_cache]
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    try: list(pool.map(lambda path: get_file_stat(path, stat_cache), old_files))
+    finally: pool.shutdown(wait=True, cancel_futures=True)
+
+    needed = {}                                     #{device: [first destination directory on it, bytes to copy]}
+    for idx, (old_file, new_file) in enumerate(file_tup_list):
+        if new_file == '' or new_file in skip_dsts: continue
+        st = get_file_stat(old_file, stat_cache)
+        if st is None: continue                     #missing, flagged by the error check
+        new_file_dir = os.path.dirname(new_file)
+        dev = planner.get_dir_info(new_file_dir)[0]
+        if dev is None: continue
+        if last_rows.get(old_file) == idx and st.st_dev == dev: continue                #renamed
+        if planner.get_method(old_file, new_file) != CONST_placement_methods['copy']: continue  #linked/cloned
+        needed.setdefault(dev, [new_file_dir, 0])[1] += st.st_size
+
+    shortfalls = []
+    for new_file_dir, nbytes in needed.values():
+        free = get_free_space(new_file_dir)
+        if free is not None and nbytes+reserve > free: shortfalls.append((new_file_dir, nbytes, free))
+    return shortfalls
+
+def update_files_error_check(progress, file_tup_list, journal=None, existing=None, planner=None, del_old=False):
+    """function checks for errors in the files to update, including destination file systems without enough
+    free space for the copies (see `get_space_shortfalls`). With a placement planner, the number of files that
+    will be placed each way (moved, hard linked, cloned or copied) is also listed as info, one row per method.
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param file_tup_list: list of files to update/move and the new distination/name
+    :type file_tup_list: `list` of `string``tuples` formatted as [(old_file_path1,new_file_path1),(old_file_2....)...(n)]
+    :param journal: journal of an unfinished update that will be resumed, None if not resuming. Files
+        the journaled update already handled are not flagged
+    :type journal: `update_journal` instance
+    :param existing: the input and output files that exist, None to check them here
+    :type existing: `set` of `os` path
+    :param planner: placement planner of the update, None to not list the placements
+    :type planner: `placement_planner` instance
+    :param del_old: the old files will be deleted, so the last destination of each is a move when possible
+    :type del_old: `bool`
+    :returns: list of errors found
+    :rtype: `list` of (`CONST_err_types` entry, message text) `tuples`
+    """
+    errors = []         #temp error list (msg_type,msg_text)
+    done_dsts = set(); gone_srcs = set()            #files handled by the update being resumed
+    if journal is not None: done_dsts, gone_srcs = journal.get_resume_paths()
+
+    #--check which input and output files exist, once per directory
+    if existing is None: existing = check_files_exist(progress, [path for tup in file_tup_list for path in tup])
+
+    #--count the outputs so duplicates are found in one pass
+    new_file_counts = collections.Counter()             #{path key: count} outputs that are the same file
+    collision_keys = {}                                 #{collision key: set of path keys} outputs that may be the same file
+    last_rows = {}                                      #{old file: index of the last row it is placed in}
+    placement_counts = collections.Counter()            #{placement method: number of files}
+    for idx, tup in enumerate(file_tup_list):
+        if tup[1] == '': continue
+        last_rows[tup[0]] = idx
+        path_key = get_path_key(tup[1])
+        new_file_counts[path_key] += 1
+        collision_keys.setdefault(get_path_collision_key(tup[1]), set()).add(path_key)
+
+    progress.start('Checking For Errors', len(file_tup_list))  #set label and total
+    file_count = 0                                              #setup vars for row numbers
+    for tup in file_tup_list:
+        progress.check_cancel()                             #stop between files if canceled
+        file_count+=1                                       #update file counter
+        progress.step()                                     #update progress
+        row_txt = 'row:'+str(getattr(tup, 'row_num', file_count+1))     #row in the template file, counting blank rows
+
+        if tup[0] == '' and tup[1] == '':                   #blank row (or only other columns) in the middle of the template
+            errors.append((CONST_err_types['err'],row_txt+' | Row is missing the '+sys_tmplt_oldFile_hdrName+' and '+
+                           sys_tmplt_newFile_hdrName+' values'))
+            continue
+        if tup[0] not in existing and tup[0] not in gone_srcs:
+            errors.append((CONST_err_types['err'],row_txt+' | Cannot find input file: '+tup[0]))
+        if tup[1] == '':
+            errors.append((CONST_err_types['warn'],row_txt+' | Output file is blank, conversion/move will be skipped'))
+            continue
+        if tup[1] in existing and tup[1] not in done_dsts:
+            errors.append((CONST_err_types['err'],row_txt+' | Output file already exists: '+tup[1]))
+        if new_file_counts[get_path_key(tup[1])] > 1:
+            errors.append((CONST_err_types['err'],row_txt+' | Output file exists more than once: '+tup[1]))
+        elif len(collision_keys[get_path_collision_key(tup[1])]) > 1:
+            errors.append((CONST_err_types['warn'],row_txt+' | Output file only differs by case/accents from another output'
+                           ' and will be overwritten on case-insensitive drives: '+tup[1]))
+        if planner is not None and planner.mode != CONST_placement_modes['copy']:
+            if del_old and last_rows[tup[0]] == file_count-1 and planner.is_same_device(tup[0], tup[1]):
+                method = CONST_journal_ops['move']          #last destination on the same device is a rename
+            else: method = planner.get_method(tup[0], tup[1])
+            placement_counts[method] += 1
+
+    #--list how many files are placed each way, one row per method so real errors aren't buried
+    for method in [CONST_journal_ops['move']]+list(CONST_placement_methods.values()):
+        if placement_counts[method] > 0:
+            errors.append((CONST_err_types['info'],'all rows | '+str(placement_counts[method])+' file(s) will be placed by '+method))
+
+    #--check the destinations have room for the copies, so the update can't run out of space part way through
+    for new_file_dir, nbytes, free in get_space_shortfalls(file_tup_list, planner, del_old, done_dsts):
+        errors.append((CONST_err_types['err'],'all rows | Not enough free space to copy '+format_bytes(nbytes)+' (and keep '+
+                       format_bytes(sys_free_space_reserve)+' free), '+format_bytes(free)+' free on the drive of: '+new_file_dir))
+
+    return errors
+
+def get_files_to_update(tmplt_path):
+    """function opens the passed template file and builds the required new/old file list to update
+
+    :param tmplt_path: path to the template file for updates
+    :type tmplt_path: `os` path
+    :returns: list of tuples for new/old files
+    :rtype: [(old_filepath_1,new_filepath_1),...,(old_filepath_n,new_filepath_n)]
+    """
+    rfiles=[] #return list files to update
+    if tmplt_path is not None:
+        with template_reader(tmplt_path) as reader:         #streamed a chunk at a time
+            for chunk in reader: rfiles.extend(chunk)
+    return rfiles
+
+def load_and_check_template(progress, tmplt_path, journal=None, workers=sys_check_workers, placement=CONST_placement_modes['copy'],
+                            del_old=False):
+    """function loads the update template and checks it for errors. The template is streamed in chunks
+    and the files in each chunk are checked (in a thread pool, once per directory in the chunk) while the
+    next chunk is read.
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param tmplt_path: path to the template file for updates
+    :type tmplt_path: `os` path
+    :param journal: journal of an unfinished update that will be resumed, None if not resuming
+    :type journal: `update_journal` instance
+    :param workers: number of threads checking directories at once
+    :type workers: `int`
+    :param placement: placement mode of the update, the number of files placed each way is listed unless copying
+    :type placement: `CONST_placement_modes` entry
+    :param del_old: the old files will be deleted
+    :type del_old: `bool`
+    :returns: list of tuples for new/old files, list of errors found
+    :rtype: `list`, `list`
+    """
+    progress.start('Loading Template')
+    files_to_update = []; existing = set()
+    checks = []                                             #existence checks of each directory in each chunk
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        with template_reader(tmplt_path) as reader:         #header row is checked before any rows are read
+            for chunk in reader:
+                progress.check_cancel()                     #stop between chunks if canceled
+                files_to_update.extend(chunk)
+                for dir_path, dir_paths in get_dir_files(path for tup in chunk for path in tup).items():
+                    checks.append(pool.submit(check_dir_files_exist, dir_path, dir_paths))
+                progress.step(len(chunk))
+
+        progress.start('Checking Files', len(checks))
+        for fut in checks:
+            progress.check_cancel()                         #stop between directories if canceled
+            existing |= fut.result()
+            progress.step()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    errors = []
+    if len(files_to_update) > 0:
+        errors = update_files_error_check(progress, files_to_update, journal, existing, placement_planner(placement), del_old)
+    return files_to_update, errors
+
+def get_dir_device(dir_path, dev_cache):
+    """function returns the device ID of the passed directory, cached so each directory is only stat'd once
+
+    :param dir_path: directory path
+    :type dir_path: `os` path
+    :param dev_cache: cache of directory device IDs {directory: st_dev}
+    :type dev_cache: `dict`
+    :returns: device ID
+    :rtype: `int`
+    """
+    dev = dev_cache.get(dir_path)
+    if dev is None:
+        dev = os.stat(dir_path if dir_path != '' else '.').st_dev
+        dev_cache[dir_path] = dev
+    return dev
+
+def get_file_stat(path, stat_cache):
+    """function returns the stat result of the passed file, cached so a file used in several rows is only stat'd once
+
+    :param path: file path
+    :type path: `os` path
+    :param stat_cache: cache of file stat results {file: `os.stat_result`, None if it can't be stat'd}
+    :type stat_cache: `dict`
+    :returns: stat result, None if the file can't be stat'd (e.g. missing)
+    :rtype: `os.stat_result`
+    """
+    if path not in stat_cache:
+        try: stat_cache[path] = os.stat(path)
+        except OSError: stat_cache[path] = None
+    return stat_cache[path]
+
+def is_same_device(old_file, new_file, dev_cache, stat_cache):
+    """function checks if the file and the directory of its new path are on the same device
+
+    :param old_file: existing file
+    :type old_file: `os` path
+    :param new_file: new file path, its directory must exist
+    :type new_file: `os` path
+    :param dev_cache: cache of directory device IDs {directory: st_dev}
+    :type dev_cache: `dict`
+    :param stat_cache: cache of file stat results, see `get_file_stat`
+    :type stat_cache: `dict`
+    :returns: true if on the same device
+    :rtype: `bool`
+    """
+    st = get_file_stat(old_file, stat_cache)
+    return st is not None and st.st_dev == get_dir_device(os.path.dirname(new_file), dev_cache)
+
+def get_read_order(st):
+    """function returns the sort key that orders reads of files by their device and then inode number. Inodes
+    are numbered roughly in the order files are laid out on disk (ext4/XFS allocate a file's data near its
+    inode), so reads from a spinning disk seek less, and the copies of a file run back to back while it is
+    still cached. Files that can't be stat'd go first, so they fail before anything is copied.
+
+    :param st: stat result of the file, None if it can't be stat'd
+    :type st: `os.stat_result`
+    :rtype: `tuple`
+    """
+    if st is None: return (-1, -1)
+    return (st.st_dev, st.st_ino)
+
+def make_dest_dirs(dir_paths):
+    """function creates the destination directories (and their parents) that don't exist yet, checking each
+    directory once however many files go in it, and skipping the parents of directories already done
+
+    :param dir_paths: destination directories, may repeat
+    :type dir_paths: iterable of `os` path
+    :returns: number of directories checked, number created
+    :rtype: `int`, `int`
+    """
+    known = set(); checked = 0; made = 0           #directories known to exist
+    for dir_path in sorted(set(dir_paths), reverse=True):  #sub directories sort before their parents
+        if dir_path == '' or dir_path in known: continue
+        checked += 1
+        if not check_dir_exists(dir_path):
+            Path(dir_path).mkdir(parents=True, exist_ok=True)
+            made += 1
+        while dir_path not in known and dir_path != os.path.dirname(dir_path):  #its parents exist too
+            known.add(dir_path)
+            dir_path = os.path.dirname(dir_path)
+    return checked, made
+
+def move_media_file(old_file, new_file):
+    """function moves the file with a rename, only for a source and destination on the same device
+
+    :param old_file: file to move
+    :type old_file: `os` path
+    :param new_file: new file path, its directory must exist
+    :type new_file: `os` path
+    :returns: true if the file was moved, false if it can't be renamed across and has to be copied
+    :rtype: `bool`
+    """
+    try:
+        os.rename(old_file, new_file)       #same file system, so no data is copied
+    except OSError as e:
+        if e.errno == errno.EXDEV: return False     #same st_dev but still can't rename (e.g. bind/overlay mounts)
+        raise
+    return True
+
+def plan_media_updates(progress, file_tup_list, del_old, planner=None):
+    """function plans the operations to update/move the files based on the passed list, making the
+    destination directories first (each once, see `make_dest_dirs`). When deleting old files, a source on
+    the same device as its destination is moved (renamed) instead of copied. A source with several
+    destinations is copied to all but its last destination, which gets the move. Sources on another device
+    are copied, then deleted. Each copy gets the placement method chosen by the planner (hard link, clone
+    or copy). Copies are ordered by where their source is on disk (see `get_read_order`), not template order.
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param file_tup_list: list of files to update/move and the new distination/name
+    :type file_tup_list: `list` of `string``tuples` formatted as [(old_file_path1,new_file_path1),(old_file_2....)...(n)]
+    :param del_old: should the old files be deleted?
+    :type del_old: `bool` - True to delete old files
+    :param planner: placement planner, None to always copy
+    :type planner: `placement_planner` instance
+    :returns: operations in the order to run them (copies, moves, deletes), so old files are only moved/deleted
+        once every copy of them is done
+    :rtype: `list` of `dict` {id, action (`CONST_journal_ops` entry), src, dst, placement (copies only)}
+    """
+    last_rows = {}                                  #{old file: index of the last row it is copied/moved in}
+    if del_old == True:
+        for idx, tup in enumerate(file_tup_list):
+            if tup[1] != '': last_rows[tup[0]] = idx
+    copies = []; moves = []; deletes = []           #planned operations by type
+    dev_cache = {}                                  #destination directory device IDs
+    stat_cache = {}                                 #old file stat results
+
+    progress.start('Planning Updates', len(file_tup_list))
+    with progress.metrics.timer('plan.mkdir'):
+        checked, made = make_dest_dirs(os.path.dirname(tup[1]) for tup in file_tup_list if tup[1] != '')
+    progress.metrics.count('plan.dirs', checked); progress.metrics.count('plan.dirs_made', made)
+    for idx, tup in enumerate(file_tup_list):
+        progress.check_cancel()                             #stop between files if canceled
+        old_file = tup[0]; new_file = tup[1]        #temp new/old file names
+        if new_file != '':
+            last_use = last_rows.get(old_file) == idx   #last destination of a file to delete, so it can be moved
+            if last_use and is_same_device(old_file, new_file, dev_cache, stat_cache):
+                moves.append({'action':CONST_journal_ops['move'], 'src':old_file, 'dst':new_file})
+            else:
+                placement = planner.get_method(old_file, new_file) if planner is not None else CONST_placement_methods['copy']
+                copies.append({'action':CONST_journal_ops['copy'], 'src':old_file, 'dst':new_file, 'placement':placement})
+                #--wait to remove "old" files until done in case they were copied to multiple places or multiple times
+                if last_use: deletes.append({'action':CONST_journal_ops['delete'], 'src':old_file, 'dst':''})
+        progress.step()
+
+    copies.sort(key=lambda op: get_read_order(get_file_stat(op['src'], stat_cache)))   #stable, so ties keep template order
+    ops = copies + moves + deletes
+    for idx, op in enumerate(ops): op['id'] = idx
+    return ops
+
+def update_media_files(progress, file_tup_list, del_old, workers=sys_transfer_workers, journal=None, resume=False, verify=False,
+                       placement=CONST_placement_modes['copy']):
+    """function updates/moves the files based on the passed list, see `plan_media_updates`.
+
+    Copies run in parallel through the transfer engine, limited per device. Moves run once every copy is
+    done, and old files are only deleted after that, so canceling part way through never removes a file
+    that hasn't been copied or moved. With a journal, every operation is recorded as it starts/completes
+    so an interrupted update can be resumed from the first incomplete operation.
+
+    When verifying, each copy is checksummed (source while copying, destination after) and the update
+    stops if one doesn't match, and an old file is only deleted once every copy of it is verified. The
+    checksums are recorded in the journal.
+
+    With a placement mode other than copy, copies on the same device are hard links and copies on the same
+    copy-on-write file system are clones where possible, see `placement_planner`.
+
+    :param progress: progress reporter
+    :type progress: `job_progress` instance
+    :param file_tup_list: list of files to update/move and the new distination/name
+    :type file_tup_list: `list` of `string``tuples` formatted as [(old_file_path1,new_file_path1),(old_file_2....)...(n)]
+    :param del_old: should the old files be deleted?
+    :type del_old: `bool` - True to delete old files
+    :param workers: max copies running at once
+    :type workers: `int`
+    :param journal: journal to record the update in, None for no journal
+    :type journal: `update_journal` instance
+    :param resume: resume the unfinished update in the journal instead of starting a new one
+    :type resume: `bool`
+    :param verify: verify copies with checksums, and when resuming also checksum completed copies before skipping them
+    :type verify: `bool`
+    :param placement: placement mode of the copies, a resumed update keeps the placements it was planned with
+    :type placement: `CONST_placement_modes` entry
+    :returns: the finished copies, with their throughput (and checksums when verifying)
+    :rtype: `list` of `file_transfer` instance(s)
+    """
+    verified_ids = set()                            #IDs of the copies that are verified (or done, when not verifying)
+    if journal is not None and resume and journal.is_resumable():
+        #--carry on from the journal, skipping the operations that are done and still intact
+        ops = journal.ops; journal.reopen()
+        progress.start('Checking Finished Files', len(ops))
+        pending = []
+        for op in ops:
+            progress.check_cancel()
+            if not journal.is_op_done(op, verify): pending.append(op)
+            elif op['action'] == CONST_journal_ops['copy']: verified_ids.add(op['id'])     #checked above when verifying
+            progress.step()
+        make_dest_dirs(os.path.dirname(op['dst']) for op in pending if op['dst'] != '')
+    else:
+        pending = plan_media_updates(progress, file_tup_list, del_old, placement_planner(placement))
+        if journal is not None:
+            journal.begin(pending, del_old)
+            pending = journal.ops
+
+    def mark_started(op):
+        """function records an operation as started in the journal"""
+        if journal is not None: journal.mark_started(op)
+
+    def mark_completed(op, **kwargs):
+        """function records an operation as completed in the journal, with any extra values (e.g. checksum)"""
+        if journal is not None: journal.mark_completed(op, **kwargs)
+
+    try:
+        #--copy files from "File_Path" to "New_File_Path"
+        transfers = []
+        for op in pending:
+            if op['action'] != CONST_journal_ops['copy']: continue
+            t = file_transfer(op['src'], op['dst'], op.get('placement', CONST_placement_methods['copy'])); t.op = op
+            t.replace = journal is not None and op['id'] in journal.started     #started before, may have left a partial file
+            transfers.append(t)
+        progress.start('Copying Files', len(transfers), sum(t.nbytes for t in transfers))
+        done_transfers = []
+        for t in run_file_transfers(progress, transfers, workers, on_start=lambda t: mark_started(t.op), verify=verify):
+            if t.verified: mark_completed(t.op, checksum=t.src_checksum, verified=True)
+            else: mark_completed(t.op)
+            verified_ids.add(t.op['id'])
+            done_transfers.append(t)
+
+        #--move the files on the same device, after any copies of them are done
+        moves = [op for op in pending if op['action'] == CONST_journal_ops['move']]
+        if len(moves) > 0: progress.start('Moving Files', len(moves))  #no byte total, a rename moves no bytes
+        on_bytes = lambda n: progress.step(0, n)                #a move that has to copy counts its bytes as they go
+        for op in moves:
+            progress.check_cancel()                             #stop between files if canceled
+            mark_started(op)
+            if move_media_file(op['src'], op['dst']):
+                mark_completed(op)
+                progress.step()
+                continue
+            if verify:                                          #couldn't rename after all, so copy instead
+                t = copy_file_verified(op['src'], op['dst'], progress.cancel_event, on_bytes)
+                os.remove(op['src'])                            #every other copy of it is already done
+                mark_completed(op, checksum=t.src_checksum, verified=True)
+            else:
+                copy_file_fast(op['src'], op['dst'], progress.cancel_event, on_bytes)
+                os.remove(op['src'])
+                mark_completed(op)
+            progress.step()
+
+        #--remove the old files that were copied, only once every copy of them is verified
+        deletes = [op for op in pending if op['action'] == CONST_journal_ops['delete']]
+        if verify and len(deletes) > 0:
+            unverified = {op['src'] for op in (journal.ops if journal is not None else pending)
+                          if op['action'] == CONST_journal_ops['copy'] and op['id'] not in verified_ids}
+            num_unverified = sum(1 for op in deletes if op['src'] in unverified)
+            if num_unverified > 0:
+                raise transfer_verify_error(errno.EIO, f"{num_unverified} old file(s) have copies that weren't verified, nothing was deleted")
+        if len(deletes) > 0: progress.start('Deleting Old Files', len(deletes))     #set label and total
+        for op in deletes:                          #loop through list
+            progress.check_cancel()                         #stop between files if canceled
+            mark_started(op)
+            if os.path.exists(op['src']): os.remove(op['src'])  #and remove old file
+            mark_completed(op)
+            progress.step()                                 #update progress
+
+        if journal is not None: journal.mark_finished()
+    finally:
+        if journal is not None: journal.close()
+
+    return done_transfers
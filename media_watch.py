@@ -0,0 +1,267 @@
+"""
+Watch folder support: finds media files as they are added to a directory tree and tells when they
+are finished being written.
+
+On Linux the tree is watched with inotify (through ctypes, no extra packages), every directory gets
+a watch and new sub directories are added as they appear. Elsewhere, or if inotify can't be used
+(e.g. out of watches, network file systems that don't send events), the tree is polled instead by
+walking it and comparing file sizes/modification times.
+
+A file found by either watcher is only handed on once it is finished: shortly after it was closed
+after writing (or moved in to the tree) with no writes since, or once its size and modification time
+have not changed for a while (for writers that keep the file open, and for polling).
+"""
+
+#-----------------------------imports
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from media_scan import media_scanner
+
+#-----------------------------supporting methods, classes, constants
+#--constant dict for the inotify event masks used, see inotify(7)
+CONST_inotify_masks = {'modify':0x00000002,
+                       'attrib':0x00000004,
+                       'close_write':0x00000008,
+                       'moved_from':0x00000040,
+                       'moved_to':0x00000080,
+                       'create':0x00000100,
+                       'delete':0x00000200,
+                       'delete_self':0x00000400,
+                       'move_self':0x00000800,
+                       'overflow':0x00004000,      #event queue overflowed, events were lost
+                       'ignored':0x00008000,       #watch was removed
+                       'onlydir':0x01000000,
+                       'isdir':0x40000000}
+
+#--constant dict for the watch event types
+CONST_watch_events = {'changed':'changed',      #file was created or written to
+                      'closed':'closed',        #file was closed after writing, or moved in to the tree
+                      'removed':'removed',      #file was deleted or moved out of the tree
+                      'rescan':'rescan'}        #events were lost, the tree has to be walked again
+
+#--misc constants
+sys_watch_stable_sec = 30.0         #seconds a file's size/time must be unchanged to be finished, if not seen closed
+sys_watch_settle_sec = 2.0          #seconds with no writes after a file is closed before it is finished
+sys_watch_poll_sec = 10.0           #seconds between walks of the tree when polling
+sys_watch_check_sec = 1.0           #seconds between checks of the files waiting to be finished
+sys_inotify_read_size = 64*1024     #bytes read from inotify at a time
+sys_inotify_event_hdr = struct.Struct('iIII')   #watch descriptor, mask, cookie, name length
+sys_inotify_dir_mask = (CONST_inotify_masks['modify'] | CONST_inotify_masks['close_write'] | CONST_inotify_masks['moved_from'] |
+                        CONST_inotify_masks['moved_to'] | CONST_inotify_masks['create'] | CONST_inotify_masks['delete'] |
+                        CONST_inotify_masks['delete_self'] | CONST_inotify_masks['move_self'] | CONST_inotify_masks['onlydir'])
+
+def get_libc():
+    """function loads the C library for the inotify calls, raising `OSError` if inotify isn't available"""
+    if not sys.platform.startswith('linux'): raise OSError("inotify is only available on Linux")
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    if not hasattr(libc, 'inotify_init1'): raise OSError("inotify is not available")
+    return libc
+
+class inotify_watcher:
+    def __init__(self, root, extensions):
+        """watcher of the media files in a directory tree using inotify. `open` raises `OSError` if inotify
+        can't be used, so the caller can fall back to `poll_watcher`.
+
+        :param root: directory to watch, including its sub directories
+        :type root: `os` path
+        :param extensions: accepted file extensions (lower case, including the dot)
+        :type extensions: iterable of `string`
+        """
+        self.root = root
+        self.extensions = set(extensions)
+        self.fd = None                  #inotify file descriptor, once opened
+        self.libc = None
+        self.watches = {}               #{watch descriptor: directory path}
+
+    def open(self):
+        """function starts watching the tree, returning the watcher"""
+        self.libc = get_libc()
+        fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0: raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.fd = fd
+        try: self.add_tree(self.root)
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    def add_watch(self, dir_path):
+        """function watches a single directory, raising `OSError` if the watch can't be added (e.g. the
+        watch limit, fs.inotify.max_user_watches, was reached) unless the directory is gone"""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir_path), sys_inotify_dir_mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if not os.path.isdir(dir_path): return       #removed before it could be watched
+            raise OSError(err, f"inotify_add_watch failed: {os.strerror(err)}", dir_path)
+        self.watches[wd] = dir_path
+
+    def add_tree(self, dir_path):
+        """function watches a directory and its sub directories, not following directory links
+
+        :returns: media files already in the directories, found after their watch was added
+        :rtype: `list` of `os` path
+        """
+        found = []; dir_stack = [dir_path]
+        while len(dir_stack) > 0:
+            path = dir_stack.pop()
+            self.add_watch(path)                        #watch first, so files created while listing aren't missed
+            try:
+                with os.scandir(path) as it: entries = list(it)
+            except OSError: continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False): dir_stack.append(entry.path); continue
+                except OSError: continue
+                if os.path.splitext(entry.name)[-1].lower() in self.extensions: found.append(entry.path)
+        return found
+
+    def get_events(self, timeout):
+        """function waits for changes in the tree
+
+        :param timeout: max seconds to wait
+        :type timeout: `float`
+        :returns: events, (`CONST_watch_events` entry, file path)
+        :rtype: `list` of `tuple`
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if len(ready) == 0: return []
+        try: data = os.read(self.fd, sys_inotify_read_size)
+        except BlockingIOError: return []
+
+        events = []; pos = 0
+        while pos+sys_inotify_event_hdr.size <= len(data):
+            wd, mask, _, name_len = sys_inotify_event_hdr.unpack_from(data, pos)
+            pos += sys_inotify_event_hdr.size
+            name = os.fsdecode(data[pos:pos+name_len].rstrip(b'\0')); pos += name_len
+            if mask & CONST_inotify_masks['overflow']:
+                events.append((CONST_watch_events['rescan'], self.root)); continue
+            dir_path = self.watches.get(wd)
+            if dir_path is None: continue
+            if mask & CONST_inotify_masks['ignored']:
+                del self.watches[wd]; continue          #directory was removed or moved away
+            if name == '': continue                     #event on the watched directory itself
+            path = os.path.join(dir_path, name)
+
+            if mask & CONST_inotify_masks['isdir']:
+                if mask & (CONST_inotify_masks['create'] | CONST_inotify_masks['moved_to']):
+                    #new directory, its files are reported once it is watched. Files of a directory moved in (e.g. a
+                    #whole rip) are complete, files of a new one may still be being written
+                    event = CONST_watch_events['closed'] if mask & CONST_inotify_masks['moved_to'] else CONST_watch_events['changed']
+                    for file_path in self.add_tree(path): events.append((event, file_path))
+                continue
+            if os.path.splitext(name)[-1].lower() not in self.extensions: continue
+            if mask & (CONST_inotify_masks['close_write'] | CONST_inotify_masks['moved_to']):
+                events.append((CONST_watch_events['closed'], path))
+            elif mask & (CONST_inotify_masks['create'] | CONST_inotify_masks['modify']):
+                events.append((CONST_watch_events['changed'], path))
+            elif mask & (CONST_inotify_masks['delete'] | CONST_inotify_masks['moved_from']):
+                events.append((CONST_watch_events['removed'], path))
+        return events
+
+    def close(self):
+        """function stops watching the tree"""
+        if self.fd is not None: os.close(self.fd); self.fd = None
+        self.watches = {}
+
+class poll_watcher:
+    def __init__(self, root, extensions, interval=sys_watch_poll_sec):
+        """watcher of the media files in a directory tree that walks the tree every interval and compares
+        the file sizes/modification times with the previous walk
+
+        :param root: directory to watch, including its sub directories
+        :type root: `os` path
+        :param extensions: accepted file extensions (lower case, including the dot)
+        :type extensions: iterable of `string`
+        :param interval: seconds between walks
+        :type interval: `float`
+        """
+        self.root = root
+        self.extensions = list(extensions)
+        self.interval = interval
+        self.files = {}                 #{file path: (size, mtime_ns)} from the last walk
+        self.next_walk = 0.0            #monotonic time of the next walk
+
+    def open(self):
+        """function takes the first snapshot of the tree, returning the watcher"""
+        self.files = self.walk()
+        self.next_walk = time.monotonic()+self.interval
+        return self
+
+    def walk(self):
+        """function walks the tree, returning {file path: (size, mtime_ns)} of the media files"""
+        files = {}
+        for entry in media_scanner(self.root, self.extensions):
+            try: st = entry.stat()
+            except OSError: continue
+            files[entry.path] = (st.st_size, st.st_mtime_ns)
+        return files
+
+    def get_events(self, timeout):
+        """function waits for changes in the tree, see `inotify_watcher.get_events`"""
+        wait_sec = self.next_walk-time.monotonic()
+        if wait_sec > timeout:
+            time.sleep(max(0.0, timeout))
+            return []
+        time.sleep(max(0.0, wait_sec))
+        files = self.walk()
+        self.next_walk = time.monotonic()+self.interval
+        events = [(CONST_watch_events['changed'], path) for path, info in files.items() if self.files.get(path) != info]
+        events.extend((CONST_watch_events['removed'], path) for path in self.files if path not in files)
+        self.files = files
+        return events
+
+    def close(self):
+        """function stops watching the tree"""
+        self.files = {}
+
+class file_debouncer:
+    def __init__(self, stable_sec=sys_watch_stable_sec, settle_sec=sys_watch_settle_sec):
+        """tracker of the files that are still being written, see `get_ready`
+
+        :param stable_sec: seconds a file's size/time must be unchanged to be finished, if not seen closed
+        :type stable_sec: `float`
+        :param settle_sec: seconds with no writes after a file is closed before it is finished
+        :type settle_sec: `float`
+        """
+        self.stable_sec = stable_sec
+        self.settle_sec = settle_sec
+        self.pending = {}               #{file path: [size, mtime_ns, monotonic time of the last change, closed]}
+
+    def touch(self, path, closed=False):
+        """function records a change to a file (written to, or closed after writing)"""
+        entry = self.pending.get(path)
+        if entry is None: self.pending[path] = [None, None, time.monotonic(), closed]
+        else:
+            entry[2] = time.monotonic()
+            entry[3] = closed                           #a write after the close means it isn't done yet
+        return self
+
+    def remove(self, path):
+        """function stops tracking a file, e.g. once it is deleted"""
+        self.pending.pop(path, None)
+
+    def get_ready(self):
+        """function returns the files that are finished being written and stops tracking them. Files that are
+        gone are dropped, and a file whose size/time changed since the last check waits again.
+
+        :returns: finished files and their stat result
+        :rtype: `list` of (`os` path, `os.stat_result`)
+        """
+        ready = []; now = time.monotonic()
+        for path, entry in list(self.pending.items()):
+            try: st = os.stat(path)
+            except OSError:
+                del self.pending[path]; continue        #deleted/moved before it was finished
+            if (st.st_size, st.st_mtime_ns) != (entry[0], entry[1]):
+                if entry[0] is not None: entry[2] = now  #still being written
+                entry[0] = st.st_size; entry[1] = st.st_mtime_ns
+            wait_sec = self.settle_sec if entry[3] else self.stable_sec
+            if now-entry[2] >= wait_sec:
+                del self.pending[path]
+                ready.append((path, st))
+        return ready
@@ -0,0 +1,174 @@
+"""
+Persistent cache of media file probe results.
+
+Results are stored in a SQLite database in the user config directory and keyed on the file
+path, size, modification time (ns) and inode, so a file is only probed again when it changes.
+"""
+
+#-----------------------------imports
+import os
+import sys
+import sqlite3
+import threading
+import time
+from media_core import CONST_probe_status
+
+#-----------------------------supporting methods, classes, constants
+#--misc constants
+sys_app_dir_name = 'video_file_manage_assist'   #folder name in the user config location
+sys_cache_file_name = 'probe_cache.sqlite'      #cache database file name
+sys_cache_max_entries = 250000                  #cache size before old entries are evicted
+sys_cache_commit_every = 500                    #number of writes between commits
+
+def get_user_config_dir():
+    """function returns (and creates if needed) the per user config directory for the application
+
+    :returns: config directory path
+    :rtype: `os` path
+    """
+    if sys.platform.startswith('win'): base = os.environ.get('APPDATA', os.path.expanduser('~'))
+    elif sys.platform == 'darwin': base = os.path.expanduser('~/Library/Application Support')
+    else: base = os.environ.get('XDG_CONFIG_HOME', os.path.expanduser('~/.config'))
+    cfg_dir = os.path.join(base, sys_app_dir_name)
+    os.makedirs(cfg_dir, exist_ok=True)
+    return cfg_dir
+
+class probe_cache:
+    def __init__(self, db_path=None, max_entries=sys_cache_max_entries):
+        """on-disk cache of probe results keyed on (path, st_size, st_mtime_ns, st_ino)
+
+        :param db_path: path of the cache database, defaults to the user config directory
+        :type db_path: `os` path
+        :param max_entries: number of entries allowed before eviction on `prune`
+        :type max_entries: `int`
+        """
+        if db_path is None: db_path = os.path.join(get_user_config_dir(), sys_cache_file_name)
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0               #number of lookups found in the cache
+        self.misses = 0             #number of lookups not in the cache (or out of date)
+        self.pending = 0            #writes since the last commit
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS probe ('
+                          'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, ino INTEGER, '
+                          'runtime REAL, est_ok INTEGER, last_used REAL, backend TEXT, status TEXT)')
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(probe)')]
+        if 'backend' not in columns:
+            self.conn.execute('ALTER TABLE probe ADD COLUMN backend TEXT')     #cache from before probe backends
+        if 'status' not in columns:
+            self.conn.execute('ALTER TABLE probe ADD COLUMN status TEXT')      #cache from before probe statuses
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def get(self, path, st):
+        """function looks up the probe result for the passed file
+
+        :param path: file path
+        :type path: `os` path
+        :param st: current stat result of the file
+        :type st: `os.stat_result`
+        :returns: (duration in seconds, if estimation was successful, probe backend, probe status), None on a miss
+        :rtype: `tuple`
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT size, mtime_ns, ino, runtime, est_ok, backend, status FROM probe WHERE path=?',
+                                    (path,)).fetchone()
+            if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns or row[2] != st.st_ino or (row[4] and row[5] is None):
+                self.misses += 1        #missing, out of date or probed before the backend was recorded
+                return None
+            self.hits += 1
+            self.conn.execute('UPDATE probe SET last_used=? WHERE path=?', (time.time(), path))
+            self.write_done()
+        status = row[6] if row[6] is not None else CONST_probe_status['ok' if row[4] else 'none']   #older entries have no status
+        return row[3], bool(row[4]), row[5], status
+
+    def put(self, path, st, runtime, est_ok, backend=None, status=None):
+        """function stores the probe result for the passed file
+
+        :param path: file path
+        :type path: `os` path
+        :param st: stat result of the file when it was probed
+        :type st: `os.stat_result`
+        :param runtime: duration in seconds
+        :type runtime: `float`
+        :param est_ok: if estimation was successful
+        :type est_ok: `bool`
+        :param backend: probe backend that found the duration, None if none did
+        :type backend: `string`
+        :param status: probe status, None to derive it from est_ok
+        :type status: `CONST_probe_status` entry
+        """
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO probe (path, size, mtime_ns, ino, runtime, est_ok, last_used, backend, status) '
+                              'VALUES (?,?,?,?,?,?,?,?,?)',
+                              (path, st.st_size, st.st_mtime_ns, st.st_ino, runtime, int(bool(est_ok)), time.time(), backend, status))
+            self.write_done()
+
+    def write_done(self):
+        """function commits pending writes in batches - lock must be held"""
+        self.pending += 1
+        if self.pending >= sys_cache_commit_every:
+            self.conn.commit()
+            self.pending = 0
+
+    def num_entries(self):
+        """function returns the number of entries in the cache"""
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM probe').fetchone()[0]
+
+    def prune(self):
+        """function evicts entries once the cache is larger than `max_entries`. Entries for files that
+        no longer exist are removed first, then the least recently used entries.
+
+        :returns: number of entries removed
+        :rtype: `int`
+        """
+        removed = 0
+        with self.lock:
+            count = self.conn.execute('SELECT COUNT(*) FROM probe').fetchone()[0]
+            if count <= self.max_entries: return 0
+
+            gone = [(row[0],) for row in self.conn.execute('SELECT path FROM probe') if not os.path.isfile(row[0])]
+            self.conn.executemany('DELETE FROM probe WHERE path=?', gone)
+            removed += len(gone); count -= len(gone)
+
+            if count > self.max_entries:    #still too large, drop the least recently used
+                cur = self.conn.execute('DELETE FROM probe WHERE path IN (SELECT path FROM probe ORDER BY last_used LIMIT ?)',
+                                        (count-self.max_entries,))
+                removed += cur.rowcount
+            self.conn.commit(); self.pending = 0
+        return removed
+
+    def invalidate(self, path=None):
+        """function removes entries from the cache so the files are probed again
+
+        :param path: file or directory to invalidate, None to clear the whole cache
+        :type path: `os` path
+        :returns: number of entries removed
+        :rtype: `int`
+        """
+        with self.lock:
+            if path is None:
+                cur = self.conn.execute('DELETE FROM probe')
+            else:
+                dir_prefix = os.path.join(path, '')     #directory path with a trailing separator
+                cur = self.conn.execute('DELETE FROM probe WHERE path=? OR substr(path,1,?)=?',
+                                        (path, len(dir_prefix), dir_prefix))
+            self.conn.commit(); self.pending = 0
+        return cur.rowcount
+
+    def close(self):
+        """function commits any pending writes and closes the database"""
+        with self.lock:
+            if self.conn is None: return
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
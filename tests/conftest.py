@@ -0,0 +1,34 @@
+"""
+Shared set up for the tests: the repository modules and the benchmark corpus generator (used to
+create media files with known durations) are importable, and the helpers below build small trees.
+"""
+
+#-----------------------------imports
+import os
+import sys
+import pytest
+
+sys_repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (sys_repo_dir, os.path.join(sys_repo_dir, 'benchmarks')):
+    if path not in sys.path: sys.path.insert(0, path)
+from job_engine import job_progress
+
+#-----------------------------fixtures
+@pytest.fixture
+def progress():
+    """progress reporter for running the tasks outside of a background job"""
+    return job_progress()
+
+@pytest.fixture(autouse=True)
+def user_config_dir(tmp_path, monkeypatch):
+    """keeps caches/indexes opened with their default path out of the real user config directory"""
+    config_dir = tmp_path / 'config'
+    monkeypatch.setenv('XDG_CONFIG_HOME', str(config_dir))
+    monkeypatch.setenv('APPDATA', str(config_dir))
+    return config_dir
+
+def write_file(path, data):
+    """function writes a file, creating its directory, and returns its path as a string"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f: f.write(data)
+    return str(path)
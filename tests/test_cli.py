@@ -0,0 +1,47 @@
+"""
+Tests of the command line interface, run as a separate process like from a script or cron.
+"""
+
+#-----------------------------imports
+import json
+import os
+import subprocess
+import sys
+import corpus
+from conftest import sys_repo_dir, write_file
+
+#-----------------------------supporting methods
+def run_cli(*args):
+    """function runs the command line interface, returns (exit code, stdout, stderr events)"""
+    proc = subprocess.run([sys.executable, os.path.join(sys_repo_dir, 'video_file_manage_cli.py'), *args],
+                          capture_output=True, text=True, timeout=60)
+    events = [json.loads(line) for line in proc.stderr.splitlines() if line.startswith('{')]
+    return proc.returncode, proc.stdout, events
+
+#-----------------------------tests
+def test_scan(tmp_path):
+    paths = [write_file(tmp_path / 'lib' / f'{i}.mkv', corpus.make_mkv_bytes(60*(i+1))) for i in range(3)]
+    code, out, events = run_cli('scan', str(tmp_path / 'lib'), '--format', 'json', '-j', '1')
+    assert code == 0
+    assert sorted((row['File_Path'], row['Runtime_Seconds']) for row in json.loads(out)) == [(p, 60.0*(i+1)) for i, p in enumerate(paths)]
+    assert events[-1]['event'] == 'done'
+
+def test_validate_and_apply(tmp_path):
+    src = write_file(tmp_path / 'a.mkv', corpus.make_mkv_bytes(10))
+    tmplt_path = str(tmp_path / 'template.csv')
+    corpus.write_template(tmplt_path, [(src, str(tmp_path / 'out' / 'a.mkv')), (str(tmp_path / 'missing.mkv'), str(tmp_path / 'out' / 'b.mkv'))])
+    code, out, _ = run_cli('validate', tmplt_path)
+    assert code == 3 and 'Cannot find input file' in out
+
+    corpus.write_template(tmplt_path, [(src, str(tmp_path / 'out' / 'a.mkv'))])
+    assert run_cli('validate', tmplt_path)[0] == 0
+    code, _, events = run_cli('apply', tmplt_path, '--delete-old')
+    assert code == 0 and events[-1]['event'] == 'done'
+    assert os.path.isfile(tmp_path / 'out' / 'a.mkv') and not os.path.exists(src)
+
+def test_bad_arguments(tmp_path):
+    code, _, events = run_cli('scan', str(tmp_path / 'missing'))
+    assert code == 1 and events[-1]['event'] == 'error'
+    assert run_cli('scan', str(tmp_path), '--baseline', str(tmp_path / 'x.csv'))[0] == 1     #needs --out-dir
+    assert run_cli('scan', str(tmp_path), '--jobs', '0')[0] == 2
+    assert run_cli('scan', str(tmp_path), '--no-such-option')[0] == 2
@@ -0,0 +1,37 @@
+"""
+Tests of the benchmark corpus generator: the same seed gives the same corpus, and the durations it
+records are the ones the probers read back.
+"""
+
+#-----------------------------imports
+import os
+import corpus
+import media_probe
+import media_tasks
+
+#-----------------------------tests
+def test_same_seed_same_tree(tmp_path):
+    first = corpus.make_media_tree(str(tmp_path / 'a'), 30, 50, depth=2, seed=7, formats=('mkv', 'mp4', 'avi', 'ts'))
+    second = corpus.make_media_tree(str(tmp_path / 'b'), 30, 50, depth=2, seed=7, formats=('mkv', 'mp4', 'avi', 'ts'))
+    assert [os.path.relpath(path, tmp_path / 'a') for path in first] == [os.path.relpath(path, tmp_path / 'b') for path in second]
+    assert list(first.values()) == list(second.values())
+    for path_a, path_b in zip(first, second):
+        with open(path_a, 'rb') as f_a, open(path_b, 'rb') as f_b: assert f_a.read() == f_b.read()
+
+def test_durations_are_read_back(tmp_path, monkeypatch):
+    monkeypatch.setitem(media_probe.sys_probe_backends, media_probe.sys_probe_fallback, lambda path: None)   #no cv2 here
+    media = corpus.make_media_tree(str(tmp_path), 40, 10, depth=2, seed=3, formats=('mkv', 'mp4', 'avi', 'ts'))
+    for path, duration in media.items():
+        dur, est_ok, _, _ = media_probe.get_mediafile_rawdir(path)
+        assert est_ok == (duration is not None)
+        if duration is not None: assert abs(dur-duration) < 1
+
+def test_template_rows(tmp_path, progress):
+    src_files = list(corpus.make_media_tree(str(tmp_path / 'lib'), 20, 0, depth=1))
+    rows = corpus.make_template_rows(src_files, str(tmp_path / 'out'), 200, dup_rate=0.05, missing_rate=0.05, seed=1)
+    tmplt_path = str(tmp_path / 'template.csv')
+    corpus.write_template(tmplt_path, rows)
+    assert [tuple(row) for row in media_tasks.get_files_to_update(tmplt_path)] == rows
+    num_missing = sum(1 for src, _ in rows if not os.path.isfile(src))
+    num_dups = len(rows)-len({dst for _, dst in rows})
+    assert num_missing > 0 and num_dups > 0                         #both kinds of error are injected
@@ -0,0 +1,100 @@
+"""
+Tests of the update template error check: missing inputs, existing/duplicate/colliding outputs and the
+row numbers the errors point at.
+"""
+
+#-----------------------------imports
+import pickle
+import unicodedata
+import media_tasks
+from update_template import template_reader
+from file_transfer import placement_planner, CONST_placement_modes
+from media_core import CONST_err_types
+from conftest import write_file
+
+#-----------------------------supporting methods
+def get_messages(errors, err_type):
+    """function returns the messages of the passed error type"""
+    return [msg for found_type, msg in errors if found_type == err_type]
+
+#-----------------------------tests
+def test_missing_and_existing(tmp_path, progress):
+    src = write_file(tmp_path / 'a.mkv', b'x'); existing = write_file(tmp_path / 'out' / 'b.mkv', b'y')
+    rows = [(str(tmp_path / 'missing.mkv'), str(tmp_path / 'out' / 'a.mkv')),
+            (src, existing),
+            (src, '')]
+    errors = media_tasks.update_files_error_check(progress, rows)
+    assert get_messages(errors, CONST_err_types['err']) == ['row:2 | Cannot find input file: '+rows[0][0],
+                                                            'row:3 | Output file already exists: '+existing]
+    assert get_messages(errors, CONST_err_types['warn']) == ['row:4 | Output file is blank, conversion/move will be skipped']
+
+def test_duplicate_outputs(tmp_path, progress):
+    srcs = [write_file(tmp_path / f'{i}.mkv', b'x') for i in range(3)]
+    out = str(tmp_path / 'out' / 'same.mkv')
+    rows = [(srcs[0], out), (srcs[1], str(tmp_path / 'out' / 'other.mkv')), (srcs[2], out)]
+    errors = get_messages(media_tasks.update_files_error_check(progress, rows), CONST_err_types['err'])
+    assert errors == ['row:2 | Output file exists more than once: '+out, 'row:4 | Output file exists more than once: '+out]
+
+def test_case_and_accent_collisions(tmp_path, progress):
+    srcs = [write_file(tmp_path / f'{i}.mkv', b'x') for i in range(3)]
+    rows = [(srcs[0], str(tmp_path / 'out' / 'Show.mkv')),
+            (srcs[1], str(tmp_path / 'out' / 'show.mkv')),
+            (srcs[2], str(tmp_path / 'out' / unicodedata.normalize('NFC', 'Caf\u00e9.mkv'))),
+            (srcs[2], str(tmp_path / 'out' / unicodedata.normalize('NFD', 'Caf\u00e9.mkv')))]   #same name, decomposed accent
+    errors = media_tasks.update_files_error_check(progress, rows)
+    warnings = get_messages(errors, CONST_err_types['warn'])
+    assert [msg.split(' |')[0] for msg in warnings] == ['row:2', 'row:3', 'row:4', 'row:5']
+    assert get_messages(errors, CONST_err_types['err']) == []
+
+def test_rows_numbered_from_template(tmp_path, progress):
+    tmplt_path = tmp_path / 'template.csv'
+    tmplt_path.write_text('File_Path,New_File_Path\n'
+                          f'{tmp_path}/missing1.mkv,{tmp_path}/out/a.mkv\n'
+                          ',\n'
+                          '\n'
+                          f'{tmp_path}/missing2.mkv,{tmp_path}/out/b.mkv\n'
+                          ',\n')                                               #trailing blank row
+    files, errors = media_tasks.load_and_check_template(progress, str(tmplt_path))
+    assert [tup.row_num for tup in files] == [2, 3, 4, 5]
+    assert get_messages(errors, CONST_err_types['err']) == [
+        f'row:2 | Cannot find input file: {tmp_path}/missing1.mkv',
+        'row:3 | Row is missing the File_Path and New_File_Path values',
+        'row:4 | Row is missing the File_Path and New_File_Path values',
+        f'row:5 | Cannot find input file: {tmp_path}/missing2.mkv']
+
+def test_free_space_shortfall(tmp_path, progress, monkeypatch):
+    src = write_file(tmp_path / 'a.mkv', b'x'*4096)
+    rows = [(src, str(tmp_path / 'out' / 'a.mkv'))]
+    assert media_tasks.get_space_shortfalls(rows, reserve=0) == []
+    monkeypatch.setattr(media_tasks, 'get_free_space', lambda dir_path: 1000)
+    assert media_tasks.get_space_shortfalls(rows, reserve=0) == [(str(tmp_path / 'out'), 4096, 1000)]
+    assert media_tasks.get_space_shortfalls(rows, del_old=True, reserve=0) == []   #renamed on the same drive, no space used
+    errors = get_messages(media_tasks.update_files_error_check(progress, rows), CONST_err_types['err'])
+    assert len(errors) == 1 and 'Not enough free space' in errors[0]
+
+def test_template_reader_chunks(tmp_path):
+    tmplt_path = tmp_path / 'template.csv'
+    tmplt_path.write_text('Notes,File_Path,New_File_Path\n'
+                          'first,a.mkv,b.mkv\n'
+                          'only a note,,\n'                                 #not blank, other columns have values
+                          ',,\n'
+                          ',c.mkv,\n'
+                          ',,\n,,\n')
+    with template_reader(str(tmplt_path), chunk_rows=2) as reader:
+        chunks = list(reader)
+    assert [[(tuple(row), row.row_num) for row in chunk] for chunk in chunks] == \
+        [[(('a.mkv', 'b.mkv'), 2), (('', ''), 3)], [(('', ''), 4), (('c.mkv', ''), 5)]]
+    assert reader.num_rows == 4
+    row = chunks[1][1]
+    assert pickle.loads(pickle.dumps(row)).row_num == 5                       #rows are sent to worker processes
+
+def test_placements_are_summarized(tmp_path, progress):
+    srcs = [write_file(tmp_path / f'{i}.mkv', b'x') for i in range(5)]
+    rows = [(src, str(tmp_path / 'out' / f'{i}.mkv')) for i, src in enumerate(srcs)]
+    rows.append((srcs[0], str(tmp_path / 'out' / 'extra.mkv')))
+    errors = media_tasks.update_files_error_check(progress, rows, planner=placement_planner(CONST_placement_modes['auto']), del_old=True)
+    assert get_messages(errors, CONST_err_types['info']) == ['all rows | 5 file(s) will be placed by move',
+                                                             'all rows | 1 file(s) will be placed by hardlink']
+    assert get_messages(errors, CONST_err_types['err']) == []
+    errors = media_tasks.update_files_error_check(progress, rows, planner=placement_planner(CONST_placement_modes['copy']))
+    assert get_messages(errors, CONST_err_types['info']) == []           #nothing to list when only copying
@@ -0,0 +1,91 @@
+"""
+Tests of the file transfer engine: copies, links, stopping part way through and verification.
+"""
+
+#-----------------------------imports
+import os
+import threading
+import pytest
+import file_transfer
+from file_transfer import (copy_file_fast, copy_file_verified, verify_transfer, run_file_transfers, link_file, place_file,
+                           transfer_verify_error, CONST_placement_methods)
+from job_engine import job_canceled
+from conftest import write_file
+
+#-----------------------------tests
+def test_copy(tmp_path):
+    data = os.urandom(3*1024*1024+17)
+    src = write_file(tmp_path / 'a.mkv', data); dst = str(tmp_path / 'b.mkv')
+    seen = []
+    copy_file_fast(src, dst, on_bytes=seen.append)
+    with open(dst, 'rb') as f: assert f.read() == data
+    assert sum(seen) == len(data)
+    assert sorted(os.listdir(tmp_path)) == ['a.mkv', 'b.mkv']
+
+def test_stopped_copy_leaves_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_transfer, 'sys_transfer_chunk', 64*1024)
+    src = write_file(tmp_path / 'a.mkv', os.urandom(1024*1024)); dst = str(tmp_path / 'b.mkv')
+    stop_event = threading.Event()
+    with pytest.raises(job_canceled):
+        copy_file_fast(src, dst, stop_event, lambda n: stop_event.set())
+    assert sorted(os.listdir(tmp_path)) == ['a.mkv']
+
+def test_failed_copy_keeps_existing_destination(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_transfer, 'sys_transfer_chunk', 64*1024)
+    dst = write_file(tmp_path / 'b.mkv', b'already here')
+    with pytest.raises(FileNotFoundError):
+        copy_file_fast(str(tmp_path / 'missing.mkv'), dst)              #fails before anything is written
+    stop_event = threading.Event()
+    src = write_file(tmp_path / 'a.mkv', os.urandom(1024*1024))
+    with pytest.raises(job_canceled):
+        copy_file_fast(src, dst, stop_event, lambda n: stop_event.set())   #fails part way through
+    with open(dst, 'rb') as f: assert f.read() == b'already here'
+    assert sorted(os.listdir(tmp_path)) == ['a.mkv', 'b.mkv']
+
+def test_run_file_transfers(tmp_path, progress):
+    transfers = []
+    os.makedirs(tmp_path / 'dst')
+    for i in range(6):
+        src = write_file(tmp_path / 'src' / f'{i}.mkv', os.urandom(50000+i))
+        transfers.append(file_transfer.file_transfer(src, str(tmp_path / 'dst' / f'{i}.mkv')))
+    progress.start('Copying Files', len(transfers), sum(t.nbytes for t in transfers))
+    done = list(run_file_transfers(progress, transfers, 3))
+    assert sorted(t.dst for t in done) == sorted(t.dst for t in transfers)
+    for t in done:
+        with open(t.src, 'rb') as f_src, open(t.dst, 'rb') as f_dst: assert f_src.read() == f_dst.read()
+    assert progress.bytes_done == progress.total_bytes and progress.done == len(transfers)
+
+def test_verified_copy(tmp_path):
+    src = write_file(tmp_path / 'a.mkv', os.urandom(100000))
+    t = copy_file_verified(src, str(tmp_path / 'b.mkv'))
+    assert t.verified and t.src_checksum == t.dst_checksum == file_transfer.get_file_checksum(src)
+
+def test_bad_copy_is_removed(tmp_path):
+    src = write_file(tmp_path / 'a.mkv', b'x'*1000); dst = write_file(tmp_path / 'b.mkv', b'y'*1000)   #as if corrupted on the way
+    t = file_transfer.file_transfer(src, dst)
+    t.src_checksum = file_transfer.get_file_checksum(src)
+    with pytest.raises(transfer_verify_error):
+        verify_transfer(t)
+    assert not os.path.exists(dst) and not t.verified
+
+def test_run_verified_transfers(tmp_path, progress):
+    os.makedirs(tmp_path / 'dst')
+    transfers = [file_transfer.file_transfer(write_file(tmp_path / 'src' / f'{i}.mkv', os.urandom(20000)), str(tmp_path / 'dst' / f'{i}.mkv'))
+                 for i in range(4)]
+    progress.start('Copying Files', len(transfers), sum(t.nbytes for t in transfers))
+    done = list(run_file_transfers(progress, transfers, 2, verify=True))
+    assert len(done) == 4 and all(t.verified and t.src_checksum == t.dst_checksum for t in done)
+
+def test_link_keeps_other_files(tmp_path):
+    src = write_file(tmp_path / 'a.mkv', b'new'); dst = write_file(tmp_path / 'b.mkv', b'old')
+    with pytest.raises(FileExistsError): link_file(src, dst)
+    with open(dst, 'rb') as f: assert f.read() == b'old'
+    link_file(src, dst, replace=True)                                   #a partial output of the same transfer
+    assert os.path.samefile(src, dst)
+    link_file(src, dst)                                                 #already linked, nothing to do
+
+def test_place_file_hardlink(tmp_path):
+    src = write_file(tmp_path / 'a.mkv', b'x'*100); dst = str(tmp_path / 'b.mkv')
+    seen = []
+    assert place_file(src, dst, CONST_placement_methods['hardlink'], on_bytes=seen.append) == CONST_placement_methods['hardlink']
+    assert os.path.samefile(src, dst) and seen == [100]
@@ -0,0 +1,94 @@
+"""
+Tests of the job progress reporter and background jobs.
+"""
+
+#-----------------------------imports
+import threading
+import time
+import job_engine
+from job_engine import job_progress, background_job, CONST_job_msgs
+
+#-----------------------------supporting methods
+class recorded_progress(job_progress):
+    def __init__(self):
+        """progress reporter that keeps the stats of every report"""
+        super().__init__()
+        self.reports = []
+
+    def update(self, kwargs):
+        """function keeps the reported stats"""
+        self.reports.append(kwargs['stats'])
+
+def run_job(func):
+    """function runs a background job to the end, returns (merged progress updates, final message)"""
+    job = background_job(func).start()
+    progress = {}; final = None
+    while final is None:
+        update, final = job.poll()
+        if update is not None: progress.update(update)
+        time.sleep(0.01)
+    return progress, final
+
+#-----------------------------tests
+def test_steps_are_rate_limited(monkeypatch):
+    monkeypatch.setattr(job_engine, 'sys_progress_interval', 60)
+    progress = recorded_progress()
+    progress.start('Parsing', 1000)
+    for _ in range(999): progress.step()
+    assert len(progress.reports) == 1                               #only the stage start
+    progress.step()
+    assert progress.reports[-1]['done'] == 1000                     #complete stages are always reported
+
+def test_finish_reports_final_counts(monkeypatch):
+    monkeypatch.setattr(job_engine, 'sys_progress_interval', 60)
+    progress = recorded_progress()
+    progress.start('Walking')                                       #total never known
+    for _ in range(5): progress.step(1, 100)
+    assert progress.reports[-1]['done'] == 0                        #steps inside the rate limit window
+    progress.finish()
+    assert (progress.reports[-1]['done'], progress.reports[-1]['bytes_done']) == (5, 500)
+    progress.finish()                                               #already finished, nothing more
+    assert len(progress.metrics.timers) == 1
+
+def test_next_stage_reports_previous_counts():
+    progress = recorded_progress()
+    progress.start('Walking')
+    progress.step(3)
+    progress.start('Parsing', 3)
+    assert [(stats['label'], stats['done']) for stats in progress.reports[-2:]] == [('Walking', 3), ('Parsing', 0)]
+
+def test_job_last_progress_matches():
+    def task(progress):
+        progress.start('Parsing')
+        for _ in range(7): progress.step()
+        return 'result'
+    progress, final = run_job(task)
+    assert final == (CONST_job_msgs['done'], 'result')
+    assert progress['stats']['done'] == 7
+
+def test_eta_from_bytes():
+    progress = job_progress()
+    progress.start('Copying', 2, 1000)
+    progress.start_time -= 10                                       #10 seconds in
+    progress.step(1, 250)
+    stats = progress.get_stats()
+    assert stats['percent'] == 25.0 and round(stats['eta']) == 30
+
+def test_job_cancel():
+    started = threading.Event()
+    def task(progress):
+        progress.start('Parsing')
+        started.set()
+        while True:
+            progress.check_cancel()
+            time.sleep(0.01)
+    job = background_job(task).start()
+    started.wait(5)
+    job.cancel()
+    job.thread.join(5)
+    assert job.poll()[1] == (CONST_job_msgs['canceled'], None)
+
+def test_job_error():
+    def task(progress): raise ValueError("bad template")
+    _, (msg_type, (error, trace)) = run_job(task)
+    assert msg_type == CONST_job_msgs['error'] and str(error) == 'bad template' and 'ValueError' in trace
@@ -0,0 +1,46 @@
+"""
+Tests of the job instrumentation: counters, stage timers, the timeline and the --profile output.
+"""
+
+#-----------------------------imports
+import json
+import os
+import job_metrics
+from job_metrics import job_metrics as metrics_recorder
+from test_cli import run_cli
+from conftest import write_file
+import corpus
+
+#-----------------------------tests
+def test_counters_and_timers():
+    metrics = metrics_recorder()
+    metrics.count('probe.files'); metrics.count('probe.files', 2)
+    metrics.add_time('probe', 1.0, 1.5); metrics.add_time('probe', 2.0, 2.25)
+    with metrics.timer('walk'): pass
+    summary = metrics.get_summary()
+    assert summary['counters'] == {'probe.files':3}
+    assert summary['timers']['probe'] == {'count':2, 'total_sec':0.75, 'avg_ms':375.0, 'max_ms':500.0}
+    assert summary['timers']['walk']['count'] == 1
+    assert metrics.events == []                                     #no timeline unless tracing
+
+def test_trace(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_metrics, 'sys_trace_max_events', 2)
+    metrics = metrics_recorder(trace=True)
+    for i in range(3): metrics.add_time('stage:Parsing', metrics.origin+i, metrics.origin+i+1, args={'n':i})
+    metrics.add_time('walk', metrics.origin, trace=False)           #timed only
+    metrics.write_trace(str(tmp_path / 'trace.json'))
+    with open(tmp_path / 'trace.json') as f: trace = json.load(f)
+    assert [(event['cat'], event['ts'], event['dur']) for event in trace['traceEvents']] == [('stage', 0, 1e6), ('stage', 1e6, 1e6)]
+    assert trace['otherData']['dropped_events'] == 1
+    assert trace['otherData']['timers']['stage:Parsing']['count'] == 3
+
+def test_scan_profile(tmp_path):
+    for i in range(3): write_file(tmp_path / 'lib' / f'{i}.mkv', corpus.make_mkv_bytes(10+i))
+    prefix = str(tmp_path / 'prof')
+    code, _, events = run_cli('scan', str(tmp_path / 'lib'), '-j', '1', '--profile', prefix)
+    assert code == 0
+    profile = next(event for event in events if event['event'] == 'profile')
+    assert profile['counters']['scan.found'] == 3 and profile['counters']['probe.backend.mkv'] == 3
+    assert any(name.startswith('stage:') for name in profile['timers'])
+    assert profile['profile'].startswith(prefix+'_') and os.path.isfile(profile['profile'])
+    with open(profile['trace']) as f: assert json.load(f)['traceEvents']
@@ -0,0 +1,69 @@
+"""
+Tests of the duplicate file check: grouping by size and contents, the copy kept and the index.
+"""
+
+#-----------------------------imports
+import os
+import corpus
+import media_dedup
+import media_tasks
+from media_dedup import dedup_index
+from conftest import write_file
+
+#-----------------------------supporting methods
+def make_tree(root):
+    """function creates media files, two of them the same and one the same size with other contents"""
+    same = corpus.make_mkv_bytes(60, 300*1024)                          #larger than the sampled blocks
+    paths = {'orig':write_file(root / 'Movies' / 'a.mkv', same),
+             'copy':write_file(root / 'Backup' / 'deep' / 'a copy.mkv', same),
+             'other':write_file(root / 'Movies' / 'b.mkv', same[:-10]+b'0123456789'),   #differs only at the end
+             'small':write_file(root / 'Movies' / 'c.mkv', corpus.make_mkv_bytes(60, 8192))}
+    os.utime(paths['orig'], ns=(0, 1_000_000_000))                      #the oldest copy is kept
+    os.utime(paths['copy'], ns=(0, 2_000_000_000))
+    return paths
+
+#-----------------------------tests
+def test_groups(tmp_path, progress):
+    paths = make_tree(tmp_path / 'lib')
+    groups = media_tasks.find_duplicate_files(progress, str(tmp_path / 'lib'), workers=1)
+    assert len(groups) == 1
+    checksum, files = groups[0]
+    assert [file.full_path for file in files] == [paths['orig'], paths['copy']]
+    assert checksum == media_dedup.get_file_checksum(paths['orig'])
+
+def test_rows_move_all_but_the_kept_copy(tmp_path, progress):
+    root = tmp_path / 'lib'; paths = make_tree(root)
+    groups = media_tasks.find_duplicate_files(progress, str(root), workers=1)
+    rows = media_dedup.get_duplicate_rows(groups, str(root), str(tmp_path / 'dups'))
+    assert [(row['File_Path'], row['New_File_Path']) for row in rows] == \
+        [(paths['copy'], os.path.join(str(tmp_path / 'dups'), 'Backup', 'deep', 'a copy.mkv'))]
+
+def test_small_files_hashed_whole(tmp_path):
+    path = write_file(tmp_path / 'a.mkv', b'abc'*100)
+    checksum, is_full = media_dedup.get_block_checksum(path, 300)
+    assert is_full and checksum == media_dedup.get_file_checksum(path)
+
+def test_index_reuses_checksums(tmp_path, progress):
+    root = tmp_path / 'lib'; paths = make_tree(root)
+    with dedup_index(str(tmp_path / 'index.sqlite')) as index:
+        first = media_tasks.find_duplicate_files(progress, str(root), workers=1, index=index)
+        misses = index.misses
+        second = media_tasks.find_duplicate_files(progress, str(root), workers=1, index=index)
+        assert index.misses == misses and index.hits > 0            #nothing read again
+        assert [c for c, _ in first] == [c for c, _ in second]
+
+        with open(paths['copy'], 'r+b') as f: f.seek(-1, os.SEEK_END); f.write(b'!')   #same size, no longer a duplicate
+        os.utime(paths['copy'], ns=(0, 3_000_000_000))
+        assert media_tasks.find_duplicate_files(progress, str(root), workers=1, index=index) == []
+
+def test_index_prune_drops_missing_then_least_recently_used(tmp_path):
+    paths = [write_file(tmp_path / f'{i}.mkv', b'x') for i in range(5)]
+    with dedup_index(str(tmp_path / 'index.sqlite'), max_entries=2) as index:
+        for i, path in enumerate(paths):
+            index.put(path, 1, i, 'block')
+            index.conn.execute('UPDATE hashes SET last_used=? WHERE path=?', (i, path))
+        assert index.get(paths[0], 1, 0) == ('block', None)         #used again, no longer the oldest
+        os.remove(paths[4])
+        assert index.prune() == 3
+        assert [index.get(path, 1, i) is not None for i, path in enumerate(paths[:4])] == [True, False, False, True]
+        assert index.prune() == 0                                   #within its size
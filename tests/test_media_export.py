@@ -0,0 +1,80 @@
+"""
+Tests of the properties exports: incremental exports against a baseline and the streaming writer.
+"""
+
+#-----------------------------imports
+import os
+import pytest
+import corpus
+import media_tasks
+from job_engine import job_progress
+from media_export import export_writer, rolling_export_writer, iter_export_rows
+from media_core import media_file_props, CONST_openType, CONST_change_types, CONST_CSVexport_hdrs
+from conftest import write_file
+
+#-----------------------------supporting methods
+def make_library(root):
+    """function creates a small library of media files, returns their paths"""
+    return [write_file(root / f'{i}.mkv', corpus.make_mkv_bytes(100+i)) for i in range(4)]
+
+def make_props(num):
+    """function returns the properties of a parsed file"""
+    return media_file_props({'name':f'{num}.mkv', 'path':f'/media/{num}.mkv', 'runtime':90.5+num, 'est_ok':True,
+                             'size':1000+num, 'mtime_ns':num, 'backend':'mkv', 'status':'ok'})
+
+#-----------------------------tests
+def test_incremental_export(tmp_path):
+    lib = tmp_path / 'lib'; paths = make_library(lib)
+    os.makedirs(tmp_path / 'out')
+    _, baseline_path = media_tasks.export_media_properties(job_progress(), str(lib), CONST_openType['dir'], str(tmp_path / 'out'), workers=1)
+
+    added = write_file(lib / 'new.mkv', corpus.make_mkv_bytes(50))
+    write_file(paths[1], corpus.make_mkv_bytes(200))                            #re-ripped, longer
+    os.remove(paths[2])
+    progress = job_progress()
+    changes, changes_path, snapshot_path = media_tasks.export_media_changes(progress, str(lib), baseline_path, str(tmp_path / 'out'),
+                                                                            workers=1)
+    assert {file.full_path:file.change for file in changes} == {added:CONST_change_types['added'],
+                                                                paths[1]:CONST_change_types['changed'],
+                                                                paths[2]:CONST_change_types['removed']}
+    assert progress.metrics.get_summary()['counters']['probe.reused'] == 2      #unchanged files aren't probed again
+    assert len(list(iter_export_rows(changes_path))) == 3
+    snapshot = {row[CONST_CSVexport_hdrs['full_path']]:row for row in iter_export_rows(snapshot_path)}
+    assert sorted(snapshot) == sorted([paths[0], paths[1], paths[3], added])
+    assert float(snapshot[paths[1]][CONST_CSVexport_hdrs['est_time_raw']]) == 200
+
+def test_baseline_outside_scan_is_kept(tmp_path):
+    paths = make_library(tmp_path / 'lib' / 'a') + make_library(tmp_path / 'lib' / 'b')
+    os.makedirs(tmp_path / 'out')
+    _, baseline_path = media_tasks.export_media_properties(job_progress(), str(tmp_path / 'lib'), CONST_openType['dir'],
+                                                           str(tmp_path / 'out'), workers=1)
+    changes, _, snapshot_path = media_tasks.export_media_changes(job_progress(), str(tmp_path / 'lib' / 'a'), baseline_path,
+                                                                 str(tmp_path / 'out'), workers=1)
+    assert changes == []
+    assert sorted(row[CONST_CSVexport_hdrs['full_path']] for row in iter_export_rows(snapshot_path)) == sorted(paths)
+
+@pytest.mark.parametrize('ext', ['.csv', '.jsonl'])
+def test_export_round_trip(tmp_path, ext):
+    out_path = str(tmp_path / ('export'+ext))
+    with export_writer(out_path, CONST_CSVexport_hdrs) as writer:
+        for num in range(3): writer.write(make_props(num))
+        assert os.path.isfile(out_path+'.partial') and not os.path.exists(out_path)   #only named once complete
+    rows = list(iter_export_rows(out_path))
+    assert [row[CONST_CSVexport_hdrs['full_path']] for row in rows] == ['/media/0.mkv', '/media/1.mkv', '/media/2.mkv']
+    if ext == '.jsonl': assert rows[1][CONST_CSVexport_hdrs['est_time_raw']] == 91.5                  #typed values
+    else: assert rows[1][CONST_CSVexport_hdrs['est_time_raw']] == '91.5'
+    assert os.listdir(tmp_path) == ['export'+ext]
+
+def test_failed_export_is_removed(tmp_path):
+    with pytest.raises(RuntimeError):
+        with export_writer(str(tmp_path / 'export.csv'), CONST_CSVexport_hdrs) as writer:
+            writer.write(make_props(0))
+            raise RuntimeError("canceled")
+    assert os.listdir(tmp_path) == []
+
+def test_rolling_export_appends(tmp_path):
+    out_path = str(tmp_path / 'rolling.jsonl')
+    with rolling_export_writer(out_path, CONST_CSVexport_hdrs) as writer: writer.write(make_props(0))
+    with open(out_path, 'a') as f: f.write('{"File_Name": "cut')                   #last row cut off by a power loss
+    with rolling_export_writer(out_path, CONST_CSVexport_hdrs) as writer: writer.write(make_props(1))
+    assert [row[CONST_CSVexport_hdrs['file_name']] for row in iter_export_rows(out_path)] == ['0.mkv', '1.mkv']
@@ -0,0 +1,124 @@
+"""
+Tests of the header-only container parsers and the probe entry points, on generated files.
+"""
+
+#-----------------------------imports
+import os
+import time
+import pytest
+import corpus
+import media_probe
+from media_core import CONST_probe_status
+from conftest import write_file
+
+#-----------------------------tests
+@pytest.mark.parametrize('name, data, backend, duration', [
+    ('a.mkv', corpus.make_mkv_bytes(125), 'mkv', 125),
+    ('b.mkv', corpus.make_mkv_bytes(3600, 64*1024, info_last=True), 'mkv', 3600),   #Info after the padding, found by the SeekHead
+    ('c.webm', corpus.make_mkv_bytes(61), 'mkv', 61),
+    ('d.mp4', corpus.make_mp4_bytes(90), 'mp4', 90),
+    ('e.mp4', corpus.make_mp4_bytes(5400, 64*1024, moov_last=True), 'mp4', 5400),
+    ('f.mov', corpus.make_mp4_bytes(42), 'mp4', 42),
+    ('g.avi', corpus.make_avi_bytes(30), 'avi', 30),
+    ('h.ts', corpus.make_ts_bytes(45, 188*40), 'ts', 45),
+    ('i.m2ts', corpus.make_ts_bytes(1800, 188*40), 'ts', 1800),
+])
+def test_container_durations(tmp_path, name, data, backend, duration):
+    path = write_file(tmp_path / name, data)
+    assert media_probe.get_mediafile_rawdir(path) == (duration, True, backend, CONST_probe_status['ok'])
+
+def test_mkv_fractional_duration(tmp_path):
+    path = write_file(tmp_path / 'a.mkv', corpus.make_mkv_bytes(12.5))
+    assert media_probe.get_mkv_duration(path) == 12.5
+
+@pytest.mark.parametrize('name, data', [
+    ('none.mkv', corpus.make_mkv_bytes(None)),
+    ('empty.mkv', b''),
+])
+def test_mkv_without_duration(tmp_path, name, data):
+    assert media_probe.get_mkv_duration(write_file(tmp_path / name, data)) is None
+
+def test_mkv_not_ebml(tmp_path):
+    with pytest.raises(media_probe.ebml_parse_error):
+        media_probe.get_mkv_duration(write_file(tmp_path / 'garbage.mkv', b'\0'*1000))
+
+def test_ts_pcr_wrap(tmp_path):
+    start_pcr = (1 << 33) - 90000*10                                #wraps 10 seconds in
+    path = write_file(tmp_path / 'wrap.ts', corpus.make_ts_bytes(60, 188*40, start_pcr=start_pcr))
+    assert media_probe.get_ts_duration(path) == pytest.approx(60, abs=1)
+
+@pytest.mark.parametrize('name, data', [
+    ('none.mkv', corpus.make_mkv_bytes(None)),
+    ('none.avi', corpus.make_avi_bytes(None)),
+    ('none.ts', corpus.make_ts_bytes(None)),
+    ('garbage.mp4', b'\0'*1000),
+    ('empty.mkv', b''),
+])
+def test_no_duration(tmp_path, monkeypatch, name, data):
+    monkeypatch.setitem(media_probe.sys_probe_backends, media_probe.sys_probe_fallback, lambda path: None)  #no cv2 here
+    path = write_file(tmp_path / name, data)
+    assert media_probe.get_mediafile_rawdir(path) == (None, False, None, CONST_probe_status['none'])
+
+def test_backend_error_tries_next(tmp_path, monkeypatch):
+    def fail(path): raise ValueError("bad file")
+    monkeypatch.setitem(media_probe.sys_probe_backends, 'mkv', fail)
+    monkeypatch.setitem(media_probe.sys_probe_backends, media_probe.sys_probe_fallback, lambda path: 33.0)
+    path = write_file(tmp_path / 'a.mkv', corpus.make_mkv_bytes(10))
+    assert media_probe.get_mediafile_rawdir(path) == (33.0, True, media_probe.sys_probe_fallback, CONST_probe_status['ok'])
+
+def test_registered_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_probe, 'sys_probe_backends', dict(media_probe.sys_probe_backends))
+    monkeypatch.setattr(media_probe, 'sys_probe_ext_backends', {ext:list(names) for ext, names in media_probe.sys_probe_ext_backends.items()})
+    media_probe.register_probe_backend('fixed', lambda path: 12.0, ['.mkv', '.XYZ'])
+    assert media_probe.get_probe_backends('a.mkv') == ['mkv', 'fixed', media_probe.sys_probe_fallback]    #after the built in, fallback last
+    path = write_file(tmp_path / 'a.xyz', b'x')
+    assert media_probe.get_mediafile_rawdir(path) == (12.0, True, 'fixed', CONST_probe_status['ok'])
+
+def test_probe_error_is_status(tmp_path, monkeypatch):
+    def fail(path): raise OSError("backend lookup failed")
+    monkeypatch.setattr(media_probe, 'get_probe_backends', fail)
+    path = write_file(tmp_path / 'a.mkv', corpus.make_mkv_bytes(10))
+    assert media_probe.safe_get_mediafile_rawdir(path)[3] == CONST_probe_status['error']
+
+def test_probe_files_parallel_order(tmp_path):
+    items = []; expected = []
+    for i in range(20):
+        path = write_file(tmp_path / f'{i:02d}.mkv', corpus.make_mkv_bytes(100+i))
+        known = (1.0, True, 'mkv', CONST_probe_status['ok']) if i % 5 == 0 else None   #cached results pass through
+        items.append((path, known)); expected.append((path, 1.0 if known else 100+i))
+    results = [(path, result[0]) for path, result, _, _ in media_probe.probe_files_parallel(items, 3)]
+    assert results == expected
+
+def test_probe_file_timeout_and_crash(tmp_path):
+    prober = media_probe.file_prober()
+    try:
+        media_probe.register_probe_backend('hang', lambda path: time.sleep(30), ['.hang'])
+        media_probe.register_probe_backend('crash', lambda path: os._exit(1), ['.crash'])
+        start = time.monotonic()
+        assert prober.probe(write_file(tmp_path / 'a.hang', b'x'), 0.5)[3] == CONST_probe_status['timeout']
+        assert time.monotonic()-start < 10
+        assert prober.probe(write_file(tmp_path / 'a.crash', b'x'), 5)[3] == CONST_probe_status['crash']
+        assert prober.probe(write_file(tmp_path / 'a.mkv', corpus.make_mkv_bytes(77)), 5)[:3] == (77, True, 'mkv')
+    finally:
+        prober.close()
+        for ext in ('.hang', '.crash'): media_probe.sys_probe_ext_backends.pop(ext, None)
+        for name in ('hang', 'crash'): media_probe.sys_probe_backends.pop(name, None)
+
+def test_probe_file_reuses_worker(tmp_path):
+    prober = media_probe.file_prober()
+    try:
+        paths = [write_file(tmp_path / f'{i}.mkv', corpus.make_mkv_bytes(10+i)) for i in range(3)]
+        assert prober.probe(paths[0], 5)[0] == 10
+        pid = prober.worker.process.pid
+        assert [prober.probe(path, 5)[0] for path in paths[1:]] == [11, 12]
+        assert prober.worker.process.pid == pid
+    finally:
+        prober.close()
+
+def test_parallel_timeout(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_probe, 'sys_probe_backends', dict(media_probe.sys_probe_backends))
+    monkeypatch.setattr(media_probe, 'sys_probe_ext_backends', {ext:list(names) for ext, names in media_probe.sys_probe_ext_backends.items()})
+    media_probe.register_probe_backend('hang', lambda path: time.sleep(30), ['.hang'])     #before the workers are forked
+    items = [(write_file(tmp_path / 'a.hang', b'x'), None), (write_file(tmp_path / 'b.mkv', corpus.make_mkv_bytes(5)), None)]
+    results = [result for _, result, _, _ in media_probe.probe_files_parallel(items, 2, timeout=0.5)]
+    assert [result[3] for result in results] == [CONST_probe_status['timeout'], CONST_probe_status['ok']]
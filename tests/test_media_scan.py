@@ -0,0 +1,44 @@
+"""
+Tests of the directory scan: the single pass walk and parsing the media files it finds.
+"""
+
+#-----------------------------imports
+import os
+import corpus
+import media_tasks
+from media_scan import media_scanner
+from media_core import CONST_media_formats
+from conftest import write_file
+
+#-----------------------------supporting methods
+def make_tree(root):
+    """function creates a small library of media and other files, returns {media file path: duration}"""
+    durations = {}
+    for i, rel_path in enumerate(['a.mkv', 'Show/S01/e1.mkv', 'Show/S01/e2.MKV', 'Show/S02/e1.mkv', 'Movies/m.mkv']):
+        durations[write_file(root / rel_path, corpus.make_mkv_bytes(100+i))] = 100+i
+    for rel_path in ['notes.txt', 'Show/S01/e1.nfo', 'Show/S01/cover.jpg']: write_file(root / rel_path, b'x')
+    return durations
+
+#-----------------------------tests
+def test_scanner_matches_walk(tmp_path):
+    durations = make_tree(tmp_path / 'lib')
+    os.symlink(tmp_path / 'lib' / 'Show', tmp_path / 'lib' / 'Link')     #directory links aren't followed
+    scanner = media_scanner(str(tmp_path / 'lib'), CONST_media_formats.values())
+    found = [entry.path for entry in scanner]
+    walked = [os.path.join(dir_path, name) for dir_path, _, names in os.walk(str(tmp_path / 'lib'))
+              for name in names if os.path.splitext(name)[1].lower() in CONST_media_formats.values()]
+    assert found == walked
+    assert sorted(found) == sorted(durations)
+    assert scanner.walk_done and (scanner.num_found, scanner.num_files, scanner.num_dirs) == (5, 8, 5)
+
+def test_unreadable_directory_is_skipped(tmp_path):
+    make_tree(tmp_path / 'lib')
+    scanner = media_scanner(str(tmp_path / 'missing'), CONST_media_formats.values())
+    assert list(scanner) == [] and scanner.errors == [str(tmp_path / 'missing')]
+
+def test_iter_dir_mediafiles(tmp_path, progress):
+    durations = make_tree(tmp_path / 'lib')
+    files = list(media_tasks.iter_dir_mediafiles(progress, str(tmp_path / 'lib'), workers=2))
+    assert {file.full_path:file.est_time_raw for file in files} == durations
+    assert all(file.good_estimate and file.file_size == os.path.getsize(file.full_path) for file in files)
+    assert (progress.done, progress.total) == (5, 5)
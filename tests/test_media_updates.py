@@ -0,0 +1,111 @@
+"""
+Tests of template updates: moves on the same device, journaled updates resumed after an interruption
+and the update plan.
+"""
+
+#-----------------------------imports
+import os
+import pytest
+import corpus
+import media_tasks
+from job_engine import job_progress
+from update_journal import update_journal
+from conftest import write_file
+
+#-----------------------------supporting methods
+def make_update(tmp_path, num_files=4):
+    """function creates source files and an update template copying them, returns (template path, rows)"""
+    rows = []
+    for i in range(num_files):
+        src = write_file(tmp_path / 'src' / f'{i}.mkv', corpus.make_mkv_bytes(10+i, 8192))
+        rows.append((src, str(tmp_path / 'dst' / f'season {i % 2}' / f'{i}.mkv')))
+    tmplt_path = str(tmp_path / 'template.csv')
+    corpus.write_template(tmplt_path, rows)
+    return tmplt_path, rows
+
+def interrupt_after(monkeypatch, num_copies):
+    """function makes the next update stop with an error once the passed number of copies are done"""
+    run_file_transfers = media_tasks.run_file_transfers
+    def interrupted(*args, **kwargs):
+        transfers = run_file_transfers(*args, **kwargs)
+        for _ in range(num_copies): yield next(transfers)
+        transfers.close()
+        raise RuntimeError("interrupted")
+    monkeypatch.setattr(media_tasks, 'run_file_transfers', interrupted)
+
+#-----------------------------tests
+def test_same_device_moves_are_renames(tmp_path):
+    _, rows = make_update(tmp_path)
+    rows.append((rows[0][0], str(tmp_path / 'dst' / 'extra' / '0.mkv')))   #a source with two destinations
+    inodes = {src:os.stat(src).st_ino for src, _ in rows}
+    with open(rows[0][0], 'rb') as f: data = f.read()
+    transfers = media_tasks.update_media_files(job_progress(), rows, True, 1)
+    assert [(t.src, t.dst) for t in transfers] == [rows[0]]                 #only the extra destination is copied
+    for src, dst in rows[1:]: assert os.stat(dst).st_ino == inodes[src]     #the rest are renamed
+    with open(rows[0][1], 'rb') as f: assert f.read() == data
+    assert not any(os.path.exists(src) for src, _ in rows)
+
+def test_renames_have_no_byte_rate(tmp_path):
+    _, rows = make_update(tmp_path)
+    reports = []
+    progress = job_progress(); progress.update = reports.append
+    media_tasks.update_media_files(progress, rows, True, 1)
+    progress.finish()
+    moves = [kwargs['stats'] for kwargs in reports if kwargs['stats']['label'] == 'Moving Files']
+    assert moves[-1]['done'] == len(rows) and moves[-1]['percent'] == 100.0
+    assert all(stats['bytes_done'] == 0 and stats['bytes_per_sec'] == 0 for stats in moves)   #nothing was copied
+
+def test_resume_after_interruption(tmp_path, monkeypatch):
+    tmplt_path, rows = make_update(tmp_path)
+    interrupt_after(monkeypatch, 1)
+    with pytest.raises(RuntimeError):
+        media_tasks.update_media_files(job_progress(), rows, False, 1, update_journal(tmplt_path))
+    monkeypatch.undo()
+
+    journal = update_journal(tmplt_path)
+    assert journal.is_resumable()
+    assert len(journal.completed) == 1
+    done_dst = journal.ops[next(iter(journal.completed))]['dst']
+    done_stamp = os.stat(done_dst).st_mtime_ns
+
+    transfers = media_tasks.update_media_files(job_progress(), rows, False, 1, journal, resume=True)
+    assert len(transfers) == len(rows)-1                                #the finished copy isn't redone
+    assert os.stat(done_dst).st_mtime_ns == done_stamp
+    for src, dst in rows:
+        with open(src, 'rb') as f_src, open(dst, 'rb') as f_dst: assert f_src.read() == f_dst.read()
+    assert not update_journal(tmplt_path).is_resumable()                #finished
+
+def test_resume_with_delete(tmp_path, monkeypatch):
+    tmplt_path, rows = make_update(tmp_path)
+    rows.append((rows[0][0], str(tmp_path / 'dst' / 'extra' / '0.mkv')))   #a source with two destinations
+    interrupt_after(monkeypatch, 2)
+    monkeypatch.setattr(media_tasks, 'is_same_device', lambda *args: False)     #copy then delete, like another drive
+    with pytest.raises(RuntimeError):
+        media_tasks.update_media_files(job_progress(), rows, True, 1, update_journal(tmplt_path))
+    assert all(os.path.isfile(src) for src, _ in rows)                  #nothing deleted before every copy is done
+    monkeypatch.undo()
+
+    journal = update_journal(tmplt_path)
+    assert journal.get_del_old() and journal.is_resumable()
+    media_tasks.update_media_files(job_progress(), rows, True, 1, journal, resume=True)
+    assert all(os.path.isfile(dst) for _, dst in rows)
+    assert not any(os.path.exists(src) for src, _ in rows)
+
+def test_changed_template_is_not_resumed(tmp_path, monkeypatch):
+    tmplt_path, rows = make_update(tmp_path)
+    interrupt_after(monkeypatch, 1)
+    with pytest.raises(RuntimeError):
+        media_tasks.update_media_files(job_progress(), rows, False, 1, update_journal(tmplt_path))
+    with open(tmplt_path, 'a') as f: f.write('\n')
+    assert not update_journal(tmplt_path).is_resumable()
+
+def test_plan_orders_ops(tmp_path, progress):
+    tmplt_path, rows = make_update(tmp_path)
+    rows.append((rows[0][0], str(tmp_path / 'dst' / 'extra' / '0.mkv')))
+    ops = media_tasks.plan_media_updates(progress, rows, True)
+    actions = [op['action'] for op in ops]
+    assert actions == sorted(actions, key=['copy', 'move', 'delete'].index)    #copies, then moves, then deletes
+    assert [op['id'] for op in ops] == list(range(len(ops)))
+    assert os.path.isdir(tmp_path / 'dst' / 'extra')                          #destination directories made up front
+    moved = [op['src'] for op in ops if op['action'] == 'move']
+    assert sorted(moved) == sorted(src for src, _ in rows[:-1])               #each source moved once, to its last row
@@ -0,0 +1,64 @@
+"""
+Tests of the watch folder support: the debouncer that decides when a file is finished and the
+watchers that report new files.
+"""
+
+#-----------------------------imports
+import os
+import sys
+import time
+import pytest
+import corpus
+from media_watch import inotify_watcher, poll_watcher, file_debouncer, CONST_watch_events
+from conftest import write_file
+
+#-----------------------------tests
+def test_closed_file_is_ready_after_settling(tmp_path):
+    path = write_file(tmp_path / 'a.mkv', b'x')
+    debouncer = file_debouncer(stable_sec=60, settle_sec=0.2)
+    debouncer.touch(path, closed=True)
+    assert debouncer.get_ready() == []                                  #first look at its size
+    time.sleep(0.3)
+    assert [p for p, _ in debouncer.get_ready()] == [path]
+    assert debouncer.get_ready() == []                                  #handed on once
+
+def test_growing_file_waits(tmp_path):
+    path = write_file(tmp_path / 'a.mkv', b'x')
+    debouncer = file_debouncer(stable_sec=0.3, settle_sec=0.1)
+    debouncer.touch(path)
+    debouncer.get_ready()
+    time.sleep(0.2)
+    with open(path, 'ab') as f: f.write(b'more')                        #still being written, without events
+    assert debouncer.get_ready() == []
+    time.sleep(0.4)
+    assert [p for p, _ in debouncer.get_ready()] == [path]
+
+def test_removed_file_is_dropped(tmp_path):
+    path = write_file(tmp_path / 'a.mkv', b'x')
+    debouncer = file_debouncer(stable_sec=0, settle_sec=0)
+    debouncer.touch(path); os.remove(path)
+    assert debouncer.get_ready() == [] and debouncer.pending == {}
+
+def test_poll_watcher(tmp_path):
+    watcher = poll_watcher(str(tmp_path), ['.mkv'], interval=0).open()
+    path = write_file(tmp_path / 'sub' / 'a.mkv', corpus.make_mkv_bytes(10))
+    write_file(tmp_path / 'sub' / 'a.nfo', b'x')
+    assert watcher.get_events(1) == [(CONST_watch_events['changed'], path)]
+    os.remove(path)
+    assert watcher.get_events(1) == [(CONST_watch_events['removed'], path)]
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is Linux only')
+def test_inotify_watcher(tmp_path):
+    watcher = inotify_watcher(str(tmp_path), ['.mkv']).open()
+    try:
+        path = write_file(tmp_path / 'a.mkv', corpus.make_mkv_bytes(10))
+        staged = write_file(tmp_path.parent / (tmp_path.name+'_staged') / 'b.mkv', b'x')
+        os.rename(os.path.dirname(staged), tmp_path / 'moved')          #a whole directory moved in
+        events = []
+        for _ in range(10):
+            events += watcher.get_events(0.2)
+            if (CONST_watch_events['closed'], str(tmp_path / 'moved' / 'b.mkv')) in events: break
+        assert (CONST_watch_events['closed'], path) in events
+        assert (CONST_watch_events['closed'], str(tmp_path / 'moved' / 'b.mkv')) in events
+    finally:
+        watcher.close()
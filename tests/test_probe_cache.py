@@ -0,0 +1,85 @@
+"""
+Tests of the probe result cache: hits, misses, invalidation when a file changes and the statuses kept.
+"""
+
+#-----------------------------imports
+import os
+import sqlite3
+import corpus
+import media_tasks
+from probe_cache import probe_cache
+from media_core import CONST_probe_status
+from conftest import write_file
+
+#-----------------------------tests
+def test_hit_and_miss(tmp_path):
+    path = write_file(tmp_path / 'a.mkv', corpus.make_mkv_bytes(100))
+    with probe_cache(str(tmp_path / 'cache.sqlite')) as cache:
+        st = os.stat(path)
+        assert cache.get(path, st) is None
+        cache.put(path, st, 100.0, True, 'mkv', CONST_probe_status['ok'])
+        assert cache.get(path, st) == (100.0, True, 'mkv', CONST_probe_status['ok'])
+        assert (cache.hits, cache.misses) == (1, 1)
+
+def test_changed_file_is_a_miss(tmp_path):
+    path = write_file(tmp_path / 'a.mkv', corpus.make_mkv_bytes(100))
+    with probe_cache(str(tmp_path / 'cache.sqlite')) as cache:
+        cache.put(path, os.stat(path), 100.0, True, 'mkv')
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns+1_000_000_000))      #touched
+        assert cache.get(path, os.stat(path)) is None
+        cache.put(path, os.stat(path), 100.0, True, 'mkv')
+        with open(path, 'ab') as f: f.write(b'\0'*10)                          #grown
+        assert cache.get(path, os.stat(path)) is None
+
+def test_status_is_kept(tmp_path):
+    path = write_file(tmp_path / 'a.mkv', b'x')
+    with probe_cache(str(tmp_path / 'cache.sqlite')) as cache:
+        media_tasks.cache_mediafile_result(cache, path, None, False, None, CONST_probe_status['error'])
+        assert cache.get(path, os.stat(path)) == (None, False, None, CONST_probe_status['error'])
+
+def test_unfinished_probes_are_not_cached(tmp_path):
+    path = write_file(tmp_path / 'a.mkv', b'x')
+    with probe_cache(str(tmp_path / 'cache.sqlite')) as cache:
+        for status in media_tasks.sys_probe_unfinished: media_tasks.cache_mediafile_result(cache, path, None, False, None, status)
+        assert cache.num_entries() == 0
+
+def test_get_mediafile_cached(tmp_path):
+    path = write_file(tmp_path / 'a.mkv', corpus.make_mkv_bytes(321))
+    with probe_cache(str(tmp_path / 'cache.sqlite')) as cache:
+        first = media_tasks.get_mediafile_cached(path, cache, None)
+        assert first == media_tasks.get_mediafile_cached(path, cache, None) == (321, True, 'mkv', CONST_probe_status['ok'])
+        assert (cache.hits, cache.misses) == (1, 1)
+
+def test_invalidate(tmp_path):
+    inside = [write_file(tmp_path / 'lib' / name, b'x') for name in ('a.mkv', 'b.mkv')]
+    outside = write_file(tmp_path / 'lib2' / 'c.mkv', b'x')            #shares the name prefix, not the directory
+    with probe_cache(str(tmp_path / 'cache.sqlite')) as cache:
+        for path in inside+[outside]: cache.put(path, os.stat(path), 1.0, True, 'mkv')
+        assert cache.invalidate(str(tmp_path / 'lib')) == 2
+        assert cache.get(outside, os.stat(outside)) is not None
+        assert cache.invalidate() == 1
+
+def test_prune_drops_missing_then_least_recently_used(tmp_path):
+    paths = [write_file(tmp_path / f'{i}.mkv', b'x') for i in range(5)]
+    with probe_cache(str(tmp_path / 'cache.sqlite'), max_entries=2) as cache:
+        for i, path in enumerate(paths):
+            cache.put(path, os.stat(path), 1.0, True, 'mkv')
+            cache.conn.execute('UPDATE probe SET last_used=? WHERE path=?', (i, path))
+        cache.get(paths[0], os.stat(paths[0]))                  #used again, no longer the oldest
+        os.remove(paths[4])
+        assert cache.prune() == 3
+        assert [cache.get(path, os.stat(path)) is not None for path in paths[:4]] == [True, False, False, True]
+
+def test_old_schema_is_upgraded(tmp_path):
+    path = write_file(tmp_path / 'a.mkv', b'x'); st = os.stat(path)
+    db_path = str(tmp_path / 'cache.sqlite')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE probe (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, ino INTEGER, '
+                 'runtime REAL, est_ok INTEGER, last_used REAL)')
+    conn.execute('INSERT INTO probe VALUES (?,?,?,?,?,?,?)', (path, st.st_size, st.st_mtime_ns, st.st_ino, 5.0, 1, 0))
+    conn.commit(); conn.close()
+    with probe_cache(db_path) as cache:
+        assert cache.get(path, st) is None                  #probed before the backend was recorded
+        cache.put(path, st, 5.0, True, 'mkv')
+        assert cache.get(path, st) == (5.0, True, 'mkv', CONST_probe_status['ok'])
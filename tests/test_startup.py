@@ -0,0 +1,18 @@
+"""
+Tests that the heavy optional modules (cv2, pandas, numpy) aren't imported at startup.
+"""
+
+#-----------------------------imports
+import subprocess
+import sys
+import pytest
+from conftest import sys_repo_dir
+
+#-----------------------------tests
+@pytest.mark.parametrize('module', ['video_file_manage_cli', 'media_tasks', 'media_probe'])
+def test_no_heavy_imports(module):
+    code = (f'import sys; import {module}; '
+            'print(",".join(name for name in ("cv2", "pandas", "numpy") if name in sys.modules))')
+    proc = subprocess.run([sys.executable, '-c', code], cwd=sys_repo_dir, capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == ''
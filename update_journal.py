@@ -0,0 +1,199 @@
+"""
+Write-ahead journal for template updates so an interrupted update can be resumed.
+
+The journal is a JSON lines file stored next to the update template. It records the planned
+operations (copy/move/delete), then each operation as it is started and completed. Completed
+records are synced to disk, so after a crash, full disk or closed window the update can continue
+from the first incomplete operation instead of starting over.
+"""
+
+#-----------------------------imports
+import datetime
+import json
+import os
+from file_transfer import get_file_checksum
+
+#-----------------------------supporting methods, classes, constants
+#--constant dict for the journal record types
+CONST_journal_recs = {'plan':'plan',            #journal header, template/options the plan was made for
+                      'op':'op',                #planned operation
+                      'started':'started',      #operation started, destination may be partial
+                      'completed':'completed',  #operation done
+                      'finished':'finished'}    #every operation done
+
+#--constant dict for the planned operation types
+CONST_journal_ops = {'copy':'copy',
+                     'move':'move',
+                     'delete':'delete'}
+
+#--misc constants
+sys_journal_ext = '.journal.jsonl'      #appended to the template file name
+
+class update_journal:
+    def __init__(self, tmplt_path):
+        """journal of the planned and completed operations for the update template at the passed path.
+        Any existing journal is read in when created.
+
+        :param tmplt_path: path to the template file for updates
+        :type tmplt_path: `os` path
+        """
+        self.tmplt_path = tmplt_path
+        self.journal_path = tmplt_path + sys_journal_ext
+        self.header = None                  #plan header record
+        self.ops = []                       #planned operations, list of dicts {id, action, src, dst}
+        self.started = set()                #IDs of started operations
+        self.completed = {}                 #{ID: completed record} of completed operations
+        self.finished = False               #true if every operation was done
+        self.file = None                    #journal file, open while writing
+        self.load()
+
+    def get_template_stamp(self):
+        """function returns the template size and modification time, used to check it hasn't changed"""
+        st = os.stat(self.tmplt_path)
+        return [st.st_size, st.st_mtime_ns]
+
+    def load(self):
+        """function reads the existing journal, if any. A partly written last line (crash while writing) is ignored."""
+        if not os.path.isfile(self.journal_path): return
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try: rec = json.loads(line)
+                except ValueError: continue     #partial line from a crash
+                rec_type = rec.get('type')
+                if rec_type == CONST_journal_recs['plan']:
+                    self.header = rec; self.ops = []; self.started = set(); self.completed = {}; self.finished = False
+                elif rec_type == CONST_journal_recs['op']: self.ops.append(rec)
+                elif rec_type == CONST_journal_recs['started']: self.started.add(rec['id'])
+                elif rec_type == CONST_journal_recs['completed']: self.completed[rec['id']] = rec
+                elif rec_type == CONST_journal_recs['finished']: self.finished = True
+
+    def is_resumable(self):
+        """function checks if there is an unfinished update for the (unchanged) template to resume
+
+        :returns: true if the update can be resumed
+        :rtype: `bool`
+        """
+        if self.header is None or self.finished or len(self.ops) == 0: return False
+        try: return self.header.get('template_stamp') == self.get_template_stamp()
+        except OSError: return False
+
+    def get_del_old(self):
+        """function returns the "delete old files" option the journaled update was started with"""
+        return bool(self.header.get('del_old')) if self.header is not None else False
+
+    def write(self, rec, sync=False):
+        """function appends a record to the journal
+
+        :param rec: record to write
+        :type rec: `dict`
+        :param sync: force the record to disk before returning
+        :type sync: `bool`
+        """
+        self.file.write(json.dumps(rec)+'\n')
+        self.file.flush()
+        if sync: os.fsync(self.file.fileno())
+
+    def begin(self, ops, del_old):
+        """function starts a new journal for the passed plan, replacing any existing journal
+
+        :param ops: planned operations, list of dicts {action, src, dst, placement (optional)}, IDs are assigned here
+        :type ops: `list`
+        :param del_old: "delete old files" option of the update
+        :type del_old: `bool`
+        """
+        self.close()
+        self.header = {'type':CONST_journal_recs['plan'], 'template':self.tmplt_path, 'template_stamp':self.get_template_stamp(),
+                       'del_old':bool(del_old), 'created':datetime.datetime.now().isoformat(timespec='seconds')}
+        self.ops = []; self.started = set(); self.completed = {}; self.finished = False
+        self.file = open(self.journal_path, 'w', encoding='utf-8')
+        self.write(self.header)
+        for idx, op in enumerate(ops):
+            rec = {'type':CONST_journal_recs['op'], 'id':idx, 'action':op['action'], 'src':op['src'], 'dst':op['dst']}
+            if 'placement' in op: rec['placement'] = op['placement']    #copies keep their placement when resumed
+            self.file.write(json.dumps(rec)+'\n')
+            self.ops.append(rec)
+        self.file.flush(); os.fsync(self.file.fileno())     #the whole plan is on disk before anything is done
+
+    def reopen(self):
+        """function opens the existing journal to append to when resuming"""
+        self.close()
+        self.file = open(self.journal_path, 'a', encoding='utf-8')
+
+    def mark_started(self, op):
+        """function records (synced to disk) that the operation has started, so a partial destination
+        left by a crash is known to be ours to overwrite"""
+        self.started.add(op['id'])
+        self.write({'type':CONST_journal_recs['started'], 'id':op['id']}, sync=True)
+
+    def mark_completed(self, op, **kwargs):
+        """function records (synced to disk) that the operation is done. For copies/moves the destination
+        size and modification time are recorded so the result can be checked when resuming.
+
+        :param op: operation that is done
+        :type op: `dict`
+        :param kwargs: extra values to record (e.g. checksum)
+        """
+        rec = {'type':CONST_journal_recs['completed'], 'id':op['id']}
+        if op['action'] != CONST_journal_ops['delete']:
+            st = os.stat(op['dst'])
+            rec.update({'size':st.st_size, 'mtime_ns':st.st_mtime_ns})
+        rec.update(kwargs)
+        self.completed[op['id']] = rec
+        self.write(rec, sync=True)
+
+    def mark_finished(self):
+        """function records that every operation is done"""
+        self.finished = True
+        self.write({'type':CONST_journal_recs['finished'], 'time':datetime.datetime.now().isoformat(timespec='seconds')}, sync=True)
+        self.close()
+
+    def is_op_done(self, op, verify_checksum=False):
+        """function checks if a journaled operation is done and its result is still intact. A completed
+        copy/move must still have a destination with the recorded size and modification time.
+
+        :param op: planned operation
+        :type op: `dict`
+        :param verify_checksum: also compare the source and destination checksums of completed copies
+        :type verify_checksum: `bool`
+        :returns: true if the operation can be skipped
+        :rtype: `bool`
+        """
+        action = op['action']
+        rec = self.completed.get(op['id'])
+        if action == CONST_journal_ops['delete']:
+            return rec is not None or (op['id'] in self.started and not os.path.exists(op['src']))
+
+        if rec is None:
+            #a move is a single rename, so a started move with the source gone did finish
+            if action == CONST_journal_ops['move'] and op['id'] in self.started:
+                return os.path.isfile(op['dst']) and not os.path.exists(op['src'])
+            return False
+        try: st = os.stat(op['dst'])
+        except OSError: return False
+        if st.st_size != rec.get('size') or st.st_mtime_ns != rec.get('mtime_ns'): return False
+        if verify_checksum and action == CONST_journal_ops['copy'] and os.path.isfile(op['src']):
+            if rec.get('checksum') is not None: return get_file_checksum(op['dst']) == rec['checksum']
+            return get_file_checksum(op['src']) == get_file_checksum(op['dst'])
+        return True
+
+    def get_resume_paths(self):
+        """function returns the paths a resumed update has already handled (or will overwrite), so the
+        template error check doesn't flag them
+
+        :returns: destinations already written or partly written, sources already moved/deleted
+        :rtype: `set`, `set`
+        """
+        done_dsts = set(); gone_srcs = set()
+        for op in self.ops:
+            if op['action'] == CONST_journal_ops['copy'] and op['id'] in self.started:
+                done_dsts.add(op['dst'])        #partial copies are written again when resuming
+            if not self.is_op_done(op): continue
+            if op['action'] != CONST_journal_ops['delete']: done_dsts.add(op['dst'])
+            if op['action'] != CONST_journal_ops['copy']: gone_srcs.add(op['src'])
+        return done_dsts, gone_srcs
+
+    def close(self):
+        """function closes the journal file if open"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
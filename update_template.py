@@ -0,0 +1,166 @@
+"""
+Streaming reader for update templates.
+
+Templates are read a chunk of rows at a time instead of being loaded whole: CSV files with the csv
+module and XLSX files with openpyxl in read only mode. The header row is read and checked as the
+first row of the same pass, so a template without the required columns fails right away, and the
+rows can be used (e.g. checked) while the rest of the file is still being read. Old XLS files can't
+be streamed, so they are read with pandas (imported on first use).
+
+Required (non-standard) dependencies:
+-openpyxl (XLSX templates only)
+-pandas, xlrd (XLS templates only)
+"""
+
+#-----------------------------imports
+import csv
+import itertools
+import math
+import os
+from media_core import get_file_ext, CONST_template_formats, sys_tmplt_oldFile_hdrName, sys_tmplt_newFile_hdrName
+
+#-----------------------------supporting methods, classes, constants
+#--misc constants
+sys_template_chunk_rows = 10000         #template rows yielded at a time
+
+def get_cell_text(value):
+    """function converts a template cell value to text, blank cells (None/NaN) are empty strings"""
+    if value is None: return ''
+    if isinstance(value, float) and math.isnan(value): return ''
+    return value if isinstance(value, str) else str(value)
+
+class template_row(tuple):
+    def __new__(cls, old_file, new_file, row_num):
+        """(old file, new file) row of a template, that also knows its row number in the template file (the
+        header row is row 1), so errors point at the row to fix even when trailing blank rows were skipped
+
+        :param old_file: old file path
+        :type old_file: `string`
+        :param new_file: new file path
+        :type new_file: `string`
+        :param row_num: row number in the template file
+        :type row_num: `int`
+        """
+        row = super().__new__(cls, (old_file, new_file))
+        row.row_num = row_num
+        return row
+
+    def __reduce__(self):
+        return (template_row, (self[0], self[1], self.row_num))
+
+class template_reader:
+    def __init__(self, tmplt_path, chunk_rows=sys_template_chunk_rows):
+        """iterable that reads the update template at the passed path and yields its (old file, new file)
+        rows (`template_row`, with their row number) in chunks. Blank rows between other rows are yielded as
+        ('', '') rows so the error check can flag them, blank rows after the last row (e.g. formatted but empty
+        spreadsheet rows) are skipped. Use as a context manager, which opens the file and checks the header row:
+
+            with template_reader(path) as reader:
+                for chunk in reader: ...
+
+        :param tmplt_path: path to the template file for updates
+        :type tmplt_path: `os` path
+        :param chunk_rows: rows per chunk
+        :type chunk_rows: `int`
+        """
+        self.tmplt_path = tmplt_path
+        self.chunk_rows = max(1, chunk_rows)
+        self.file_ext = get_file_ext(os.path.basename(tmplt_path))
+        self.headers = None         #column headers, once opened
+        self.num_rows = 0           #rows read so far, not counting the header or trailing blank rows
+        self.rows = None            #iterator of the rows after the header row, once opened
+        self.close_file = None      #closes the open file, None if nothing to close
+        self.old_col = None         #column index of the old file path
+        self.new_col = None         #column index of the new file path
+
+    def open(self):
+        """function opens the template and reads its header row
+
+        :returns: the opened reader
+        :rtype: `template_reader` instance
+        """
+        self.close()
+        if self.file_ext == '.csv':
+            in_csv = open(self.tmplt_path, 'r', newline='', encoding='utf-8-sig')
+            self.close_file = in_csv.close
+            self.rows = csv.reader(in_csv, delimiter=',')
+        elif self.file_ext == '.xlsx':
+            import openpyxl                                 #only needed for excel templates
+            workbook = openpyxl.load_workbook(self.tmplt_path, read_only=True, data_only=True)
+            self.close_file = workbook.close
+            self.rows = workbook.active.iter_rows(values_only=True)
+        elif self.file_ext in CONST_template_formats.values():
+            import pandas as pd                             #old excel format can't be streamed, slow to import
+            data_pd = pd.read_excel(self.tmplt_path, dtype=object)
+            self.rows = itertools.chain([list(data_pd.columns)], data_pd.itertuples(index=False, name=None))
+        else:
+            raise ValueError("Template file type is not supported.")
+
+        header_row = next(self.rows, None)
+        self.headers = [get_cell_text(v) for v in header_row] if header_row is not None else []
+        return self
+
+    def is_valid(self):
+        """function checks the template has both of the required columns, once opened
+
+        :rtype: `bool`
+        """
+        return sys_tmplt_oldFile_hdrName in self.headers and sys_tmplt_newFile_hdrName in self.headers
+
+    def check_headers(self):
+        """function checks the header row of the opened template, raising `ValueError` if a required
+        column is missing"""
+        if not self.is_valid():
+            raise ValueError(f"Template is missing the {sys_tmplt_oldFile_hdrName}/{sys_tmplt_newFile_hdrName} columns.")
+        self.old_col = self.headers.index(sys_tmplt_oldFile_hdrName)
+        self.new_col = self.headers.index(sys_tmplt_newFile_hdrName)
+
+    def __enter__(self):
+        self.open()
+        try: self.check_headers()
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __iter__(self):
+        if self.old_col is None: self.check_headers()
+        old_col = self.old_col; new_col = self.new_col
+        chunk = []
+        blank_rows = []                                     #row numbers of blank rows since the last row with values
+        for row_num, row in enumerate(self.rows, 2):        #header is row 1
+            old_file = get_cell_text(row[old_col]) if old_col < len(row) else ''
+            new_file = get_cell_text(row[new_col]) if new_col < len(row) else ''
+            if old_file == '' and new_file == '' and all(get_cell_text(v) == '' for v in row):
+                blank_rows.append(row_num); continue        #only kept if another row follows
+            chunk.extend(template_row('', '', blank_num) for blank_num in blank_rows)
+            blank_rows = []
+            chunk.append(template_row(old_file, new_file, row_num))
+            if len(chunk) >= self.chunk_rows:
+                self.num_rows += len(chunk)
+                yield chunk
+                chunk = []
+        if len(chunk) > 0:
+            self.num_rows += len(chunk)
+            yield chunk
+
+    def close(self):
+        """function closes the template file if open"""
+        if self.close_file is not None:
+            self.close_file()
+            self.close_file = None
+
+def check_template_headers(tmplt_path):
+    """function checks the template at the passed path has the required columns, only the header row is read
+
+    :param tmplt_path: path to the template file for updates
+    :type tmplt_path: `os` path
+    :returns: true if both required columns are present
+    :rtype: `bool`
+    """
+    reader = template_reader(tmplt_path)
+    try: return reader.open().is_valid()
+    finally: reader.close()
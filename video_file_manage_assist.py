@@ -4,42 +4,29 @@ Script provides a GUI for helping to manage MKV files when ripping/updating/stor
 Functions include:
 1) File length export
 2) File bulk re-name + organize
+3) Duplicate file report (as an update template)
 
 Required (non-standard) dependencies:
--cv2
--pandas
--openpyxl (pandas open excel required)
+-cv2 (media_probe fallback, imported on first use)
+-openpyxl (XLSX templates, imported on first use)
+-pandas, xlrd (XLS templates only, imported on first use)
 """
 
 #-----------------------------imports
-import datetime
 import tkinter as tk
 import os
 from tkinter import filedialog, font, ttk, messagebox, Scrollbar
-import cv2
-import csv
-import shutil
-import pandas as pd
-import numpy as np
-from pathlib import Path
+from probe_cache import probe_cache
+from media_dedup import dedup_index
+from file_transfer import CONST_placement_modes, CONST_placement_methods
+from job_engine import background_job, CONST_job_msgs
+import media_tasks
+from update_journal import update_journal
+from update_template import check_template_headers
+from media_core import (check_file_exists, get_file_ext, CONST_openType, CONST_media_formats, CONST_template_formats,
+                        CONST_export_formats, CONST_change_types, CONST_err_types)
 
 #-----------------------------supporting methods, classes, constants
-#--class for media file properties
-class media_file_props:
-    def __init__(self, kwargs):
-        """class containing media file properties to import/export"""
-        self.file_name = kwargs.get('name')         #file name
-        self.full_path = kwargs.get('path')         #full file path
-        self.est_time_raw = kwargs.get('runtime')   #estimated playtime in seconds
-        self.good_estimate = kwargs.get('est_ok')   #able to successfully get estimate
-        self.est_time_str = None                    #estimated file length, formatted string in HH:MM:SS
-        self.calc_timestr()                         #when instancing, create output formatted string
-    
-    def calc_timestr(self):
-        """function generates the output estimated time string in a human readable format of HH:MM:SS"""
-        if self.good_estimate == True: self.est_time_str = str(datetime.timedelta(seconds=int(self.est_time_raw)))
-        else: self.est_time_str = ''
-
 #--class for asking user file/folder to parse
 class user_prompt_open_type(tk.Toplevel):
     def __init__(self, master):
@@ -57,14 +44,18 @@ class user_prompt_open_type(tk.Toplevel):
 
     def init_main_window(self):
         """function initiates the various user window elements"""
-        question = tk.Label(self, font=sys_fnt_txt, text='Would you like to parse all files\nin a directory, or a single file?')
+        question = tk.Label(self, font=sys_fnt_txt, text='Would you like to parse all files\nin a directory, or a single file?\n\nRefresh only parses files changed\nsince a previous directory export.\n\nFind Duplicates creates a template\nto move out duplicate files.')
         question.grid(row=0,column=0,columnspan=2, padx=10, pady=10)
         btn_file = tk.Button(self, text='Parse Directory', font=sys_fnt_BTN, command=lambda:self.set_restult(CONST_openType['dir'])) 
         btn_file.grid(row=1, column=0, padx=10, pady=10)
         btn_file = tk.Button(self, text='Single File', font=sys_fnt_BTN, command=lambda:self.set_restult(CONST_openType['file'])) 
         btn_file.grid(row=1, column=1, padx=10, pady=10)
+        btn_file = tk.Button(self, text='Refresh Export', font=sys_fnt_BTN, command=lambda:self.set_restult(CONST_openType['refresh'])) 
+        btn_file.grid(row=2, column=0, padx=10, pady=10)
+        btn_file = tk.Button(self, text='Find Duplicates', font=sys_fnt_BTN, command=lambda:self.set_restult(CONST_openType['dedup'])) 
+        btn_file.grid(row=2, column=1, padx=10, pady=10)
         btn_close = tk.Button(self, text='Cancel', font=sys_fnt_BTN, command=self.on_close) 
-        btn_close.grid(row=2, column=0, columnspan=2, padx=10, pady=10)
+        btn_close.grid(row=3, column=0, columnspan=2, padx=10, pady=10)
 
     def set_restult(self,type):
         """function sets the result after users make their selection
@@ -90,8 +81,12 @@ class user_prompt_update(tk.Toplevel):
         self.master_ref = master
         self.tmplt_var = tk.StringVar() #temp result path
         self.del_var = tk.BooleanVar()  #temp delete variable
+        self.verify_var = tk.BooleanVar()   #temp verify variable
+        self.link_var = tk.BooleanVar()     #temp link/clone variable
         self.template_path = None       #result choice
         self.del_old = False            #delete old files - default false
+        self.verify = False             #verify copies with checksums - default false
+        self.placement = CONST_placement_modes['copy']  #how copies are placed - default full copies
 
         self.protocol("WM_DELETE_WINDOW", self.on_close)    #handle window close button
         self.init_main_window()                             #initialize window elements
@@ -108,8 +103,12 @@ class user_prompt_update(tk.Toplevel):
         file_lbl.grid(row=1, column=1, padx=10, pady=10)
         del_old_ckbx = tk.Checkbutton(self, text='Delete old files?', font=sys_fnt_txt, variable=self.del_var)
         del_old_ckbx.grid(row=2, column=0, padx=10, pady=10)
+        verify_ckbx = tk.Checkbutton(self, text='Verify copies (checksum)?', font=sys_fnt_txt, variable=self.verify_var)
+        verify_ckbx.grid(row=2, column=1, padx=10, pady=10)
+        link_ckbx = tk.Checkbutton(self, text='Link/clone instead of copying where possible?', font=sys_fnt_txt, variable=self.link_var)
+        link_ckbx.grid(row=3, column=0, columnspan=2, padx=10, pady=10)
         ctl_frame = tk.Frame(self)
-        ctl_frame.grid(row=3, column=0, padx=10, pady=(10,20), columnspan=2, sticky=tk.EW)
+        ctl_frame.grid(row=4, column=0, padx=10, pady=(10,20), columnspan=2, sticky=tk.EW)
         ctl_frame.grid_columnconfigure(0,weight=1); ctl_frame.grid_columnconfigure(1,weight=1)
         btn_upd = tk.Button(ctl_frame, text='Update', font=sys_fnt_BTN, command=self.set_restult)
         btn_upd.grid(row=0, column=0, padx=10, pady=10)
@@ -140,10 +139,7 @@ class user_prompt_update(tk.Toplevel):
         if check_file_exists(crnt_path)==True:                          #if the selected file exists
             file_ext = get_file_ext(os.path.basename(crnt_path))        #get its extension
             if file_ext in list(CONST_template_formats.values()):       #if its a valid extension
-                if file_ext == '.csv': data_pd = pd.read_csv(crnt_path, nrows=1) #open if CSV
-                else: data_pd = pd.read_excel(crnt_path, nrows=1)                #open if excel type
-                file_hdrs = list(data_pd.columns)                   #put headers in a list
-                if sys_tmplt_oldFile_hdrName in file_hdrs and sys_tmplt_newFile_hdrName in file_hdrs:
+                if check_template_headers(crnt_path):               #only the header row is read
                     rval = True #was able to find a valid file that contains both required headers, OK to import
 
         return rval
@@ -154,6 +150,8 @@ class user_prompt_update(tk.Toplevel):
         if self.check_results() == True:
             self.template_path = self.tmplt_var.get()   #update outputs
             self.del_old = self.del_var.get()
+            self.verify = self.verify_var.get()
+            if self.link_var.get(): self.placement = CONST_placement_modes['auto']     #hard link/clone, else copy
             self.on_close()     #close window
         else:
             messagebox.showerror("Error", "File selection not valid or cannot find required headers.\nTemplate must have colunms for \"File_Path\" and \"New_File_Path\"")
@@ -225,7 +223,8 @@ class wndw_notify(tk.Toplevel):
             btn_ok = tk.Button(self.frm_ctl, text='Ok', font=sys_fnt_BTN, command=lambda:self.set_restult(False))
             btn_ok.grid(row=1, column=0, padx=10, pady=10)
         else:
-            ctl_txt = tk.Label(self.frm_ctl, font=sys_fnt_txt, text='Warnings Detected. Would you like to continue with the update?', wraplength=sys_wrap_len)
+            ctl_msg = 'Warnings Detected. ' if CONST_err_types['warn'] in err_types else ''    #otherwise only info (file placements)
+            ctl_txt = tk.Label(self.frm_ctl, font=sys_fnt_txt, text=ctl_msg+'Would you like to continue with the update?', wraplength=sys_wrap_len)
             ctl_txt.grid(row=0,column=0, columnspan=2)
             btn_yes = tk.Button(self.frm_ctl, text='Yes', font=sys_fnt_BTN, command=lambda:self.set_restult(True))
             btn_yes.grid(row=1, column=0, padx=10, pady=10)
@@ -280,94 +279,18 @@ def open_dir_dialog(file_dialog_kwargs):
     if rpath == '': rpath = None
     return rpath
 
-def check_dir_exists(dir_path):
-    """function checks if the directory exists - ONLY for directories, not files
-    
-    :param dir_path: absolute file path to the directory to find
-    :type dir_path: string
-    :returns: true if directory exists
-    :rtype: bool
-    """
-    rval = False                                #temp return value - default false if not found
-    if os.path.isdir(dir_path): rval = True     #if found, update to true
-    return rval
-
-def check_file_exists(file_path):
-    """function checks if the file exists - ONLY for files, not directories
-    
-    :param file_path: absolute file path to the file to find
-    :type file_path: string
-    :returns: true if file exists
-    :rtype: bool
-    """
-    rval = False                                #temp return value - default false if not found
-    if os.path.isfile(file_path): rval = True   #if found, update to true
-    return rval
-
-def get_day_seconds():
-    """function returns the total seconds since midnight of the current day
-    :returns: seconds since midnight
-    :rtype: `int`
-    """
-    now = datetime.datetime.now()
-    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    return (now - midnight).seconds
-
-def get_num_files_in_dir(path):
-    """function gets total number of files in the passed directory and its sub-directories
-    
-    :param dir_path: absolute file path to the directory to find
-    :type dir_path: string
-    :returns: number of files
-    :rtype: `int`
-    """
-    num_files = 0
-    for dirpath, dirnames, filenames in os.walk(path):      #loop through all files in root dir and sub dirs
-        for filename in filenames:                              #for each file
-            num_files+=1                                        #count number of files
-    return num_files
-
-def get_file_ext(file_name):
-    """function returns the extension of the passed filename
-    """
-    return os.path.splitext(file_name)[-1].lower()
-
-#--constnant dict for open type
-CONST_openType = {'file':1,
-                  'dir':2}
-
-#--constant dict for accepted media property formats
-CONST_media_formats = {'MKV': '.mkv'}
-
-#--constant dict for accepted input template formats
-CONST_template_formats = {'XLSX': '.xlsx',
-                          'XLS': '.xls',
-                          'CSV': '.csv'}
-
-#--constant dict for the output CSV file used when parsing files
-CONST_CSVexport_hdrs = {'file_name':'File_Name',    #format for dict is {'media_file_props.attr_name':'CSV output File Header'}
-                        'full_path':'File_Path',
-                        'good_estimate':'Good_Estimate',
-                        'est_time_raw':'Runtime_Seconds',
-                        'est_time_str':'Runtime_HH:MM:SS'}
-
-#--constant dict for error types
-CONST_err_types = {'err':'error',
-                   'warn':'warning'}
-
 #--Misc theme constants for labels and buttons
 sys_fnt_HDR1 = ('Arial', '20', 'normal', 'roman')
 sys_fnt_txt = ('Arial', '14', 'normal', 'roman')
 sys_fnt_BTN = ('Arial', '14', 'normal', 'roman')
 sys_fnt_small = ('Arial', '8', 'normal', 'roman')
 
-#--file import key columns
-sys_tmplt_oldFile_hdrName = 'File_Path'
-sys_tmplt_newFile_hdrName = 'New_File_Path'
-
 #--misc constants
 sys_wrap_len = 550
 sys_err_wndw_width = 600
+sys_probe_workers = media_tasks.sys_probe_workers   #worker processes used when parsing a directory
+sys_transfer_workers = media_tasks.sys_transfer_workers #max file copies running at once when updating
+sys_job_poll_ms = 50                                #interval to check background jobs for progress/results
 
 
 #-----------------------------main window
@@ -376,6 +299,10 @@ class wndw_Main(tk.Tk):
     def __init__(self):
         """Primary application window"""
         tk.Tk.__init__(self)
+        self.probe_cache = None                             #probe result cache, opened on first use
+        self.dedup_index = None                             #duplicate file index, opened on first use
+        self.job = None                                     #currently running background job
+        self.job_done = None                                #callback for the result of the running job
         self.protocol("WM_DELETE_WINDOW", self.on_close)    #handle window close button
         self.init_main_window()                             #initialize application
 
@@ -384,10 +311,12 @@ class wndw_Main(tk.Tk):
         self.title("Media Manager Helper")      #title bar
         main_label = tk.Label(self, text='Media Manager Helper', font=sys_fnt_HDR1)
         main_label.grid(row=0,column=0, padx=10, pady=10)
-        btn_exp_props = tk.Button(self, text='Export Properties', font=sys_fnt_BTN, command=self.userCMD_parse_files) 
-        btn_exp_props.grid(row=1, column=0, padx=10, pady=10)
-        btn_upd_files = tk.Button(self, text='Update Files', font=sys_fnt_BTN, command=self.userCMD_update_files) 
-        btn_upd_files.grid(row=2, column=0, padx=10, pady=10)
+        self.btn_exp_props = tk.Button(self, text='Export Properties', font=sys_fnt_BTN, command=self.userCMD_parse_files) 
+        self.btn_exp_props.grid(row=1, column=0, padx=10, pady=10)
+        self.btn_upd_files = tk.Button(self, text='Update Files', font=sys_fnt_BTN, command=self.userCMD_update_files) 
+        self.btn_upd_files.grid(row=2, column=0, padx=10, pady=10)
+        self.btn_clr_cache = tk.Button(self, text='Clear Probe Cache', font=sys_fnt_BTN, command=self.userCMD_clear_cache) 
+        self.btn_clr_cache.grid(row=4, column=0, padx=10, pady=10)
         btn_close = tk.Button(self, text='Close', font=sys_fnt_BTN, command=self.on_close) 
         btn_close.grid(row=6, column=0, padx=10, pady=(10,20))
         
@@ -399,6 +328,8 @@ class wndw_Main(tk.Tk):
         self.pb_label_var = tk.StringVar()
         self.pb_label = tk.Label(self.pb_frame, text='', font=sys_fnt_small, textvariable=self.pb_label_var)
         self.pb_label.grid(row=1, column=0, padx=10)
+        self.btn_cancel = tk.Button(self.pb_frame, text='Cancel', font=sys_fnt_BTN, command=self.userCMD_cancel_job)
+        self.btn_cancel.grid(row=2, column=0, padx=10, pady=(5,0))
 
         #--secondary frame to "hide" the progress bar
         self.pb_hide_frame = tk.Frame(self); self.pb_hide_frame.grid(row=3, column=0, sticky=tk.NSEW)
@@ -406,10 +337,38 @@ class wndw_Main(tk.Tk):
 
     def on_close(self): #make no changes
         """function is called when the window is closed"""
+        if self.job is not None:                        #stop any running job at the next file
+            self.job.cancel()
+            self.job.thread.join(timeout=5)
+        if self.probe_cache is not None: self.probe_cache.close()  #flush any pending cache writes
+        if self.dedup_index is not None: self.dedup_index.close()  #and index writes
         self.destroy()
 
+    def get_probe_cache(self):
+        """function returns the probe result cache, opening it on first use
+
+        :returns: probe result cache
+        :rtype: `probe_cache` instance
+        """
+        if self.probe_cache is None: self.probe_cache = probe_cache()
+        return self.probe_cache
+
+    def get_dedup_index(self):
+        """function returns the duplicate file index, opening it on first use
+
+        :returns: duplicate file index
+        :rtype: `dedup_index` instance
+        """
+        if self.dedup_index is None: self.dedup_index = dedup_index()
+        return self.dedup_index
+
     def progress_bar_update(self, kwargs):
         """function updates the status/state of the progress bar and its label"""
+        mode = kwargs.pop('mode',None)              #pop off bar mode (determinate/indeterminate)
+        if mode is not None and mode != str(self.main_pb.cget('mode')):
+            self.main_pb.config(mode=mode)          #then update mode
+            if mode == 'determinate': self.main_pb_var.set(0)
+
         lbl_txt = kwargs.pop('label_text',None)     #pop off label text
         if lbl_txt is not None:                     #if value is present
              self.pb_label_var.set(lbl_txt)         #then update label
@@ -417,41 +376,190 @@ class wndw_Main(tk.Tk):
         val = kwargs.pop('value',None)              #pop off value
         if val is not None:                         #if value set
             self.main_pb_var.set(val)               #then update
+        elif str(self.main_pb.cget('mode')) == 'indeterminate':
+            self.main_pb.step(2)                    #no value for indeterminate, just animate
         
         self.update_idletasks()                     #last update window
     
     def progress_bar_enable(self, en):
         """function enables/disables the progress bar, effectively hiding it and its label"""
         if en==True: self.pb_hide_frame.grid_remove()   #remove the hide frame
-        else: self.pb_hide_frame.grid()                 #re-place the hide frame
+        else:
+            self.pb_hide_frame.grid()                   #re-place the hide frame
+            self.main_pb.config(mode='determinate')     #and reset to the default mode
         self.update_idletasks()                         #last update window
+
+    def run_job(self, func, args, on_done):
+        """function runs a long operation as a background job so the window stays responsive. The
+        progress bar and cancel button are shown and the other commands are disabled until it finishes.
+
+        :param func: task function to run, called as `func(progress, *args)`
+        :type func: callable
+        :param args: arguments passed to the task after the progress reporter
+        :type args: `tuple`
+        :param on_done: called on the GUI thread with the task return value when it finishes
+        :type on_done: callable
+        """
+        for btn in (self.btn_exp_props, self.btn_upd_files, self.btn_clr_cache): btn.config(state='disabled')
+        self.btn_cancel.config(state='normal')
+        self.progress_bar_update({'label_text':'', 'value':0})
+        self.progress_bar_enable(True)                  #show progress bar
+        self.job_done = on_done
+        self.job = background_job(func, args).start()
+        self.after(sys_job_poll_ms, self.poll_job)      #start checking for progress/results
+
+    def poll_job(self):
+        """function checks the running job for progress updates and its result, called with `after()`"""
+        if self.job is None: return
+        progress, final = self.job.poll()
+        if progress is not None: self.progress_bar_update(progress)
+        if final is None:                               #still running, check again later
+            self.after(sys_job_poll_ms, self.poll_job)
+            return
+
+        #--job finished, restore the window before handling the result
+        self.job = None; on_done = self.job_done; self.job_done = None
+        self.progress_bar_enable(False)                 #all done, so hide progress bar
+        for btn in (self.btn_exp_props, self.btn_upd_files, self.btn_clr_cache): btn.config(state='normal')
+        msg_type, data = final
+        if msg_type == CONST_job_msgs['done']: on_done(data)
+        elif msg_type == CONST_job_msgs['canceled']: messagebox.showwarning("Canceled", "Operation canceled by user.")
+        else: messagebox.showerror("Error", f"Operation failed:\n{data[0]}")
+
+    def userCMD_cancel_job(self):
+        """function called when user wants to cancel the running operation"""
+        if self.job is not None:
+            self.job.cancel()                           #job stops cleanly at the next file
+            self.btn_cancel.config(state='disabled')
+            self.progress_bar_update({'label_text':'Canceling...'})
     
     def userCMD_parse_files(self):
         """function called when user wants to parse media file(s)"""
         opn_type, input_dirpath = self.userCMD_parse_open()             #have user select file or directory
-        if opn_type is not None and input_dirpath is not None:
+        if opn_type == CONST_openType['refresh'] and input_dirpath is not None:
+            self.userCMD_refresh_export(input_dirpath)                  #only parse the changes since a previous export
+        elif opn_type == CONST_openType['dedup'] and input_dirpath is not None:
+            self.userCMD_find_duplicates(input_dirpath)                 #report duplicate files as a template
+        elif opn_type is not None and input_dirpath is not None:
             dialog_opts = {'title':'Output File Directory'} #directory picker options
             output_dirpath=open_dir_dialog(dialog_opts)                 #have user select location to save the output via browser prompt
             if output_dirpath is not None:
-                files = self.parse_dir_mediafiles(input_dirpath, opn_type)  #parse file(s) at selected path
-                self.create_mediafiles_csv(files, output_dirpath)           #after looping through all files, create a CSV of the output
-                messagebox.showinfo("Success", "File(s) successfully parsed and output file created!")
+                cache = self.get_probe_cache(); hits = cache.hits; misses = cache.misses   #cache counters before the parse
+
+                def parse_done(result):
+                    """function shows the result once the export job is done"""
+                    messagebox.showinfo("Success", "File(s) successfully parsed and output file created!\n"
+                                        f"(cached: {cache.hits-hits}, probed: {cache.misses-misses})")
+
+                #--parse file(s) at selected path and create a CSV of the output
+                self.run_job(media_tasks.export_media_properties, (input_dirpath, opn_type, output_dirpath, cache, sys_probe_workers), parse_done)
             else: messagebox.showerror("Error", "Output file location not chosen, stopping operation")
         #else user canceled in previous step so no action was taken
     
+    def userCMD_refresh_export(self, input_dirpath):
+        """function called when user wants to refresh a previous export of a directory, only the new and
+        changed files are parsed
+
+        :param input_dirpath: directory to parse
+        :type input_dirpath: `os` path
+        """
+        dialog_opts = {'filetypes':list(CONST_export_formats.items()),
+                       'title':'Previous Export File'}
+        baseline_path = open_file_dialog(dialog_opts)                   #have user select the export to compare with
+        if baseline_path is None:
+            messagebox.showerror("Error", "Previous export not chosen, stopping operation")
+            return
+        dialog_opts = {'title':'Output File Directory'} #directory picker options
+        output_dirpath=open_dir_dialog(dialog_opts)                     #have user select location to save the output via browser prompt
+        if output_dirpath is None:
+            messagebox.showerror("Error", "Output file location not chosen, stopping operation")
+            return
+        cache = self.get_probe_cache(); hits = cache.hits; misses = cache.misses   #cache counters before the parse
+
+        def refresh_done(result):
+            """function shows the result once the refresh job is done"""
+            changes = result[0]
+            num_changes = {v:0 for v in CONST_change_types.values()}
+            for file in changes: num_changes[file.change] += 1
+            messagebox.showinfo("Success", "Changes and updated export file created!\n"
+                                f"(added: {num_changes['added']}, changed: {num_changes['changed']}, removed: {num_changes['removed']})\n"
+                                f"(cached: {cache.hits-hits}, probed: {cache.misses-misses})")
+
+        #--parse new/changed files at selected path and create CSVs of the changes and updated export
+        self.run_job(media_tasks.export_media_changes, (input_dirpath, baseline_path, output_dirpath, cache, sys_probe_workers), refresh_done)
+
+    def userCMD_find_duplicates(self, input_dirpath):
+        """function called when user wants to find the duplicate files in a directory. A report is created
+        that can be used as an update template to move the duplicates in to a "Duplicates" directory.
+
+        :param input_dirpath: directory to check
+        :type input_dirpath: `os` path
+        """
+        dialog_opts = {'title':'Output File Directory'} #directory picker options
+        output_dirpath=open_dir_dialog(dialog_opts)                     #have user select location to save the output via browser prompt
+        if output_dirpath is None:
+            messagebox.showerror("Error", "Output file location not chosen, stopping operation")
+            return
+        index = self.get_dedup_index(); hits = index.hits; misses = index.misses   #index counters before the check
+
+        def dedup_done(result):
+            """function shows the result once the duplicate check job is done"""
+            groups, rows, out_filepath = result
+            dup_gb = sum(row['File_Size_Bytes'] for row in rows)/1e9
+            messagebox.showinfo("Success", f"Duplicates report created!\n({len(rows)} duplicates of {len(groups)} files, {dup_gb:.2f} GB)\n"
+                                f"(indexed: {index.hits-hits}, hashed: {index.misses-misses})\n\n"
+                                "Update Files with the report to move the duplicates out.")
+
+        #--find duplicates at selected path and create a CSV template to move them
+        self.run_job(media_tasks.export_duplicates_template, (input_dirpath, output_dirpath, self.get_probe_cache(), sys_probe_workers, index), dedup_done)
+
     def userCMD_update_files(self):
         """function called when user wants to update media file names based on a selected template"""
         prompt_user_update = user_prompt_update(self)                   #prompt user for inputs in new top-level
-        files_to_update = self.get_files_to_update(prompt_user_update.template_path)    #get list of files to update
         del_old = prompt_user_update.del_old                            #assign if should delete old
-        if len(files_to_update) > 0:                                    #if input template has valid updates
-            cont_upd = self.update_files_error_check(files_to_update)   #then do an error check                
-            if cont_upd == True:                                        #if user chose to continue or no errors
-                self.update_media_files(files_to_update,del_old)        #then perform the move
-            else:
-                messagebox.showwarning("No Action", "User canceled, no move/update will be performed.")
-        else:
+        verify = prompt_user_update.verify                              #and if copies should be verified
+        placement = prompt_user_update.placement                        #and how copies are placed
+        tmplt_path = prompt_user_update.template_path
+        if tmplt_path is None:
             messagebox.showerror("Error","Template not selected or template has no entries")
+            return
+
+        #--check for an unfinished update of this template that can be resumed
+        journal = update_journal(tmplt_path); resume = False
+        if journal.is_resumable():
+            resume = messagebox.askyesno("Resume Update", f"An unfinished update of this template was found (started {journal.header.get('created')}).\n"
+                                         "Resume it? Files that were already updated will be skipped.\n\nSelect \"No\" to start over.")
+            if resume: del_old = journal.get_del_old()                  #keep the option the update was started with
+
+        def update_done(result):
+            """function shows the result once the update job is done"""
+            num_verified = sum(1 for t in result if t.verified)
+            num_linked = sum(1 for t in result if t.method in (CONST_placement_methods['hardlink'], CONST_placement_methods['reflink']))
+            messagebox.showinfo("Success", "File(s) successfully updated!" + (f"\n({num_verified} copies verified)" if verify else "")
+                                + (f"\n({num_linked} copies linked/cloned)" if placement != CONST_placement_modes['copy'] else ""))
+
+        def check_done(result):
+            """function asks the user to continue once the template has been loaded and error checked"""
+            files_to_update, errors = result
+            if len(files_to_update) > 0:                                #if input template has valid updates
+                cont_upd = self.update_files_error_notify(errors)       #then show the error check results
+                if cont_upd == True:                                    #if user chose to continue or no errors
+                    self.run_job(media_tasks.update_media_files, (files_to_update, del_old, sys_transfer_workers, journal, resume, verify,
+                                                                  placement), update_done)  #then perform the move
+                else:
+                    messagebox.showwarning("No Action", "User canceled, no move/update will be performed.")
+            else:
+                messagebox.showerror("Error","Template not selected or template has no entries")
+
+        #--get list of files to update and do an error check
+        self.run_job(media_tasks.load_and_check_template, (tmplt_path, journal if resume else None, media_tasks.sys_check_workers,
+                                                           placement, del_old), check_done)
+
+    def userCMD_clear_cache(self):
+        """function called when user wants to clear the probe result cache so all files are probed again"""
+        if messagebox.askyesno("Clear Cache", "Clear all cached file properties?\nAll files will be probed again on the next export."):
+            num_removed = self.get_probe_cache().invalidate()
+            messagebox.showinfo("Success", f"Probe cache cleared ({num_removed} entries removed)")
 
     def userCMD_parse_open(self):
         """function asks the user if they'd like to parse a single file or directory of files. After getting input
@@ -473,158 +581,21 @@ class wndw_Main(tk.Tk):
             dialog_opts = { 'filetypes':filetypes,
                               'title':'File to Parse'}  
             rpath = open_file_dialog(dialog_opts)
-        elif opn_type == CONST_openType['dir']:
+        elif opn_type in (CONST_openType['dir'], CONST_openType['refresh'], CONST_openType['dedup']):
             dialog_opts = {'title':'Directory to Parse'} #directory picker options
             rpath = open_dir_dialog(dialog_opts)
 
         return opn_type, rpath
 
-    def parse_dir_mediafiles(self, path, open_type):
-        """function prases the file at the passed path or all files in the passed directory and its sub directories
+    def update_files_error_notify(self, errors):
+        """function shows the errors found when checking the update template
         
-        :param path: file or directory path to process
-        :type path: `os` path
-        :param open_type: file or directory choice
-        :param open_type: `CONST_openType` entry
-        :returns: list of file property objects to output
-        :rtype: `media_file_props` instance
-        """
-        tmp_parsed_files = []   #temp list of files found to return information on
-
-        if open_type == CONST_openType['file']:
-            filename = os.path.basename(path)
-            file_ext = get_file_ext(filename)                       #get the extention
-            if file_ext in CONST_media_formats.values():            #if its a valid file type, then process
-                dur, est_success = self.get_mediafile_rawdir(path)  #get the file duration
-                #--append result to parsed files list
-                tmp_parsed_files.append(media_file_props({'name':filename,
-                                                          'path':path,
-                                                          'runtime':dur,
-                                                          'est_ok':est_success}))
-            else:
-                messagebox.showerror("Error","Selected file type is not supported.")
-        elif open_type == CONST_openType['dir']:
-            self.progress_bar_enable(True)                              #show progress bar
-            self.progress_bar_update({'label_text':'Parsing Files'})        #set label
-            file_count = 0; num_files = get_num_files_in_dir(path)          #setup vars for status
-            for dirpath, dirnames, filenames in os.walk(path):      #loop through all files in root dir and sub dirs
-                for filename in filenames:                              #for each file
-                    file_count+=1                                       #update file counter
-                    pb_num = round(file_count/num_files*100)            #update file count
-                    self.progress_bar_update({'value':pb_num})          #update progress bar
-
-                    file_ext = get_file_ext(filename)                   #get the extention
-                    if file_ext in CONST_media_formats.values():              #if its a valid file type, then process
-                        file_path = os.path.join(dirpath, filename)         #make the full path for the file
-                        dur, est_success = self.get_mediafile_rawdir(file_path) #get the file duration
-                        #--append result to parsed files list
-                        tmp_parsed_files.append(media_file_props({'name':filename,
-                                                                  'path':file_path,
-                                                                  'runtime':dur,
-                                                                  'est_ok':est_success}))          
-            self.progress_bar_enable(False)                              #all done, so hide progress bar
-        else:
-            messagebox.showerror("Error", "Valid path/object was not selected. Please try again.")
-
-        return tmp_parsed_files
-
-    def get_mediafile_rawdir(self,path):
-        """function gets the duration of the file at the passed path
-        :param path: file path to process
-        :type path: `os` path
-        """
-        duration_seconds = None #temp return for duration
-        est_success = False     #temp return if estimation was successful
-
-        #---first try the primary method of capture
-        cap = cv2.VideoCapture(path)                            #open capture path
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))    #get the total number of frames
-        fps = cap.get(cv2.CAP_PROP_FPS)                         #and the frames per second
-        
-        if frame_count > 0 and fps > 0:         #if able to get frames, then primary method is OK
-            cap.release()                               #release the capture path - not needed anymore
-            duration_seconds=round(frame_count/fps,0)   #calculate the duration
-            est_success = True                          #and set success
-        else:                                   #else use the fallback method
-            #sometimes with some codecs/containers fps or frames is unreliable, so as an alternative
-            cap.set(cv2.CAP_PROP_POS_AVI_RATIO, 1)              #seek to the end of the file
-            duration_msec = cap.get(cv2.CAP_PROP_POS_MSEC)      #and read the milliseconds at the end
-            cap.release()                                       #release the capture path
-            if duration_msec > 0:
-                duration_seconds = round(duration_msec/1000.0,0)    #alternate calculation for duration
-                est_success = True                                  #and set success
-        #if both fail, reading was not accurate/successful so a None value will be returned
-
-        return duration_seconds, est_success
-
-    def create_mediafiles_csv(self, files, savedir):
-        """function creates the output CSV file that contains the parsed file(s) properties
-        
-        :param files: file properties to generate CSV file
-        :type files: list of `media_file_props` instance(s)
-        :param savedir: directory path to output created CSV file at
-        :type savedir: `os` directory path
-        """
-        date_str = datetime.datetime.today().strftime('%Y%m%d')         #get current date
-        sec_str = str(get_day_seconds())                                #get current day seconds
-        outfilename = date_str+'_'+sec_str+'_'+'MediaProperties.csv'    #build output file name
-        out_filepath = savedir +'/' + outfilename                       #build output file path
-
-        #--create output CSV
-        self.progress_bar_enable(True)                              #show progress bar
-        self.progress_bar_update({'label_text':'Creating CSV'})         #set label
-        file_count = 0; num_files = len(files)                          #setup vars for status
-        with open(out_filepath,'w',newline='') as out_csv:      #make a CSV file
-            file_writer = csv.writer(out_csv,delimiter=',')     #and create the writer
-            file_header = []    #output header list
-            for v in CONST_CSVexport_hdrs.values():
-                file_header.append(v)                           #build header output
-            file_writer.writerow(file_header)                   #write header
-            for file in files:                                  #loop through all file(s)
-                file_count+=1                                       #update file counter
-                pb_num = round(file_count/num_files*100)        #update file count
-                self.progress_bar_update({'value':pb_num})      #update progress bar
-
-                line_out = []
-                for k in CONST_CSVexport_hdrs.keys():
-                    line_out.append(getattr(file,k))            #make output list
-                file_writer.writerow(line_out)                  #and write line
-        self.progress_bar_enable(False)                              #all done, so hide progress bar
-    
-    def update_files_error_check(self, file_tup_list):
-        """function checks for errors in the files to update
-        
-        :param file_tup_list: list of files to update/move and the new distination/name
-        :type file_tup_list: `list` of `string``tuples` formatted as [(old_file_path1,new_file_path1),(old_file_2....)...(n)]
+        :param errors: list of errors found
+        :type errors: `list` of (`CONST_err_types` entry, message text) `tuples`
         :returns: true/false if user wants to continue updating files (despite any errors
         :rtype: `bool`
         """
         cont_upd = False    #temp continue update status result
-        errors = []         #temp error list (msg_type,msg_text)
-
-        self.progress_bar_enable(True)                              #show progress bar
-        self.progress_bar_update({'label_text':'Checking For Errors'})    #set label
-        file_count = 0; num_files = len(file_tup_list)              #setup vars for status
-
-        new_files = []                                          #temp list for new files
-        for tup in file_tup_list: new_files.append(tup[1])      #convert list of JUST new files
- 
-        for tup in file_tup_list:
-            file_count+=1                                       #update file counter
-            pb_num = round(file_count/num_files*100)            #update file count
-            self.progress_bar_update({'value':pb_num})          #update progress bar
-            
-            if check_file_exists(tup[0]) == False:
-                errors.append((CONST_err_types['err'],'row:'+str(file_count+1)+' | Cannot find input file: '+tup[0]))
-            if tup[1] == '':
-                errors.append((CONST_err_types['warn'],'row:'+str(file_count+1)+' | Output file is blank, conversion/move will be skipped'))
-            if check_file_exists(tup[1]) == True:
-                errors.append((CONST_err_types['err'],'row:'+str(file_count+1)+' | Output file already exists: '+tup[1]))
-            if tup[1] != '' and new_files.count(tup[1]) > 1:
-                errors.append((CONST_err_types['err'],'row:'+str(file_count+1)+' | Output file exists more than once: '+tup[1]))     
-
-        self.progress_bar_enable(False)                              #hide progress bar
-
         if len(errors) > 0:
             notify_opts = {'title':'Issues in Template',
                            'message':'Potential issues were found in the update template, listed below',
@@ -634,66 +605,6 @@ class wndw_Main(tk.Tk):
         else: cont_upd = True   #otherwise no errorsm, OK to update
 
         return cont_upd
-    
-    def get_files_to_update(self, tmplt_path):
-        """function opens the passed template file and builds the required new/old file list to update
-        
-        :param tmplt_path: path to the template file for updates
-        :type tmplt_path: `os` path
-        :returns: list of tuples for new/old files
-        :rtype: [(old_filepath_1,new_filepath_1),...,(old_filepath_n,new_filepath_n)]
-        """
-        rfiles=[] #return list files to update
-        if tmplt_path is not None:
-            file_ext = os.path.splitext(os.path.basename(tmplt_path))       #get its extension
-            if file_ext[1] in list(CONST_template_formats.values()):        #if its a valid extension
-                if file_ext == '.csv': data_pd = pd.read_csv(tmplt_path)    #open if CSV
-                else: data_pd = pd.read_excel(tmplt_path)                   #open if excel type
-
-                data_pd = data_pd.replace(np.nan, '')                       #convert "NaN" values to None
-                for row in data_pd.itertuples(index=False): #iterate through all pands row and make list of tuples to update
-                    rfiles.append((getattr(row,sys_tmplt_oldFile_hdrName),getattr(row,sys_tmplt_newFile_hdrName)))          
-            
-        return rfiles
-
-    def update_media_files(self, file_tup_list, del_old):
-        """function updates/moves the files based on the passed list
-        
-        :param file_tup_list: list of files to update/move and the new distination/name
-        :type file_tup_list: `list` of `string``tuples` formatted as [(old_file_path1,new_file_path1),(old_file_2....)...(n)]
-        :param del_old: should the old files be deleted?
-        :type del_old: `bool` - True to delete old files
-        """
-        self.progress_bar_enable(True)                                  #show progress bar
-        self.progress_bar_update({'label_text':'Updating/Moving Files'})  #set label
-        file_count = 0; num_files = len(file_tup_list)                  #setup vars for status
-
-        for tup in file_tup_list:
-            file_count+=1                                       #update file counter
-            pb_num = round(file_count/num_files*100)            #update file count
-            self.progress_bar_update({'value':pb_num})          #update progress bar
-
-            old_file = tup[0]; new_file = tup[1]        #temp new/old file names
-            if new_file != '':
-                new_file_dir = os.path.dirname(new_file)    #get directory of "new_file"
-                if not check_dir_exists(new_file_dir):      #if destination directory doesn't exist
-                    #os.mkdir(new_file_dir)                      
-                    Path(new_file_dir).mkdir(parents=True, exist_ok=True)   #then make it
-                shutil.copy(old_file, new_file) #copy file from "File_Path" to "New_File_Path"
-        self.progress_bar_enable(False)                                 #hide progress bar
-
-        #--wait to remove "old" files until done in case they were copied to multiple places or multiple times
-        if del_old == True:                             #if set to delete old files
-            self.progress_bar_enable(True)                                  #show progress bar
-            self.progress_bar_update({'label_text':'Deleting Old Files'})   #set label
-            file_count = 0;                                                 #setup vars for status
-            for tup in file_tup_list:                   #loop through list
-                file_count+=1                                   #update file counter
-                pb_num = round(file_count/num_files*100)        #update file count
-                self.progress_bar_update({'value':pb_num})      #update progress bar
-
-                old_file = tup[0]; os.remove(old_file)          #and remove old file
-            self.progress_bar_enable(False)                                 #hide progress bar
 
 #-----------------------------main loop
 if __name__ == "__main__":
@@ -0,0 +1,543 @@
+"""
+Command line interface for running the media tasks without the GUI (e.g. from cron on a headless
+media server). Nothing in here imports tkinter.
+
+Subcommands:
+1) scan - parse the media files in a directory (or a single file) and output their properties
+2) validate - load an update template and check it for errors
+3) apply - check an update template and update/move the files in it
+4) dedup - find duplicate media files in a directory and create a template to move them out
+5) watch - watch a directory and catalog media files to a rolling export as they land
+
+Results are written to stdout as CSV or JSON. Progress and the final status are written to stderr
+as JSON lines (one object per line), or as text. The exit code is non-zero if the command failed,
+see `CONST_exit_codes`. With `--profile`, each job also writes a cProfile dump and a Chrome trace
+timeline, and its stage timers/counters are reported in a "profile" status line.
+
+Examples:
+    python video_file_manage_cli.py scan /media/rips --out-dir /media/exports --jobs 4
+    python video_file_manage_cli.py scan /media/rips --baseline last_export.csv --out-dir /media/exports
+    python video_file_manage_cli.py validate template.csv --format json
+    python video_file_manage_cli.py apply template.csv --delete-old
+    python video_file_manage_cli.py dedup /media/rips --out-dir /media/exports
+    python video_file_manage_cli.py watch /media/incoming --out-dir /media/exports
+    python video_file_manage_cli.py scan /media/rips --profile /tmp/scan_profile
+"""
+
+#-----------------------------imports
+import argparse
+import csv
+import json
+import os
+import signal
+import sys
+import time
+import media_tasks
+from job_engine import background_job, CONST_job_msgs
+from job_metrics import job_metrics
+from probe_cache import probe_cache
+from media_dedup import dedup_index
+from file_transfer import CONST_placement_modes
+from update_journal import update_journal
+from media_watch import sys_watch_stable_sec
+from media_core import (check_dir_exists, check_file_exists, get_file_ext, CONST_openType, CONST_media_formats,
+                        CONST_CSVexport_hdrs, CONST_CSVdelta_hdrs, CONST_CSVdedup_hdrs, CONST_CSVtiming_hdrs, CONST_export_formats,
+                        CONST_err_types,
+                        sys_tmplt_oldFile_hdrName, sys_tmplt_newFile_hdrName)
+
+#-----------------------------supporting methods, classes, constants
+#--constant dict for the exit codes
+CONST_exit_codes = {'ok':0,             #command finished
+                    'error':1,          #command failed (bad input, file errors, ...)
+                    'usage':2,          #bad command line arguments (argparse)
+                    'check_failed':3,   #template has errors, nothing was updated
+                    'canceled':130}     #interrupted (Ctrl+C/SIGTERM), stopped cleanly
+
+#--constant dict for the output formats of the results (stdout)
+CONST_output_formats = {'csv':'csv',
+                        'json':'json'}
+
+#--constant dict for the progress formats (stderr)
+CONST_progress_formats = {'json':'json',    #JSON lines, one object per update
+                          'text':'text',    #progress label, updated in place
+                          'none':'none'}
+
+#--misc constants
+sys_cli_poll_sec = 0.1          #interval to check the running job for progress/results
+
+def write_event(event, **kwargs):
+    """function writes a machine-readable status line to stderr
+
+    :param event: event type (progress, done, canceled, error)
+    :type event: `string`
+    :param kwargs: event values, must be JSON serializable
+    """
+    sys.stderr.write(json.dumps({'event':event, **kwargs})+'\n')
+    sys.stderr.flush()
+
+def report_progress(progress, progress_fmt):
+    """function writes a progress update from the job to stderr
+
+    :param progress: merged progress update, see `job_progress.report`
+    :type progress: `dict`
+    :param progress_fmt: progress format
+    :type progress_fmt: `CONST_progress_formats` entry
+    """
+    if progress_fmt == CONST_progress_formats['json'] and 'stats' in progress:
+        write_event('progress', **progress['stats'])
+    elif progress_fmt == CONST_progress_formats['text'] and 'label_text' in progress:
+        sys.stderr.write('\r\033[K'+progress['label_text'])     #overwrite the previous line
+        sys.stderr.flush()
+
+def run_cli_job(func, args, progress_fmt, profile=None):
+    """function runs a task as a background job, reporting its progress until it finishes. Ctrl+C or
+    SIGTERM cancels the job, which stops cleanly at the next file.
+
+    :param func: task function to run, called as `func(progress, *args)`
+    :type func: callable
+    :param args: arguments passed to the task after the progress reporter
+    :type args: `tuple`
+    :param progress_fmt: progress format
+    :type progress_fmt: `CONST_progress_formats` entry
+    :param profile: output path prefix to profile the job, see `write_job_profile`. None to not profile
+    :type profile: `string`
+    :returns: how the job finished and its data, see `background_job.poll`
+    :rtype: `tuple`
+    """
+    job = background_job(func, args, profile=profile is not None)
+    if profile is not None: job.progress.metrics = job_metrics(trace=True)
+    job.start()
+
+    def on_signal(signum, frame):
+        """function cancels the job when interrupted"""
+        job.cancel()
+
+    old_handlers = {}
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        old_handlers[sig] = signal.signal(sig, on_signal)
+    try:
+        while True:
+            progress, final = job.poll()
+            if progress is not None: report_progress(progress, progress_fmt)
+            if final is not None: break
+            time.sleep(sys_cli_poll_sec)
+        job.thread.join()
+    finally:
+        for sig, handler in old_handlers.items(): signal.signal(sig, handler)
+    if progress_fmt == CONST_progress_formats['text']: sys.stderr.write('\n')
+    if profile is not None: write_job_profile(job, profile, progress_fmt)
+    return final
+
+def write_job_profile(job, profile, progress_fmt):
+    """function writes the profile of a finished job: "<profile>_<task>.prof" (cProfile stats, e.g. for
+    pstats or snakeviz) and "<profile>_<task>.trace.json" (Chrome trace timeline), and reports its timers
+    and counters
+
+    :param job: finished job, run with profiling
+    :type job: `background_job` instance
+    :param profile: output path prefix
+    :type profile: `string`
+    :param progress_fmt: progress format
+    :type progress_fmt: `CONST_progress_formats` entry
+    """
+    prefix = f"{profile}_{job.func.__name__}"
+    job.profiler.dump_stats(prefix+'.prof')
+    job.progress.metrics.write_trace(prefix+'.trace.json')
+    report_status('profile', progress_fmt, message=f"wrote {prefix}.prof and {prefix}.trace.json",
+                  profile=prefix+'.prof', trace=prefix+'.trace.json', **job.progress.metrics.get_summary())
+
+def get_job_exit_code(final, progress_fmt):
+    """function reports how a job finished that didn't finish cleanly
+
+    :param final: how the job finished and its data, see `background_job.poll`
+    :type final: `tuple`
+    :param progress_fmt: progress format
+    :type progress_fmt: `CONST_progress_formats` entry
+    :returns: exit code, None if the job is done
+    :rtype: `int`
+    """
+    msg_type, data = final
+    if msg_type == CONST_job_msgs['done']: return None
+    if msg_type == CONST_job_msgs['canceled']:
+        report_status('canceled', progress_fmt, message='Operation canceled by user.')
+        return CONST_exit_codes['canceled']
+    report_status('error', progress_fmt, message=str(data[0]))
+    return CONST_exit_codes['error']
+
+def report_status(event, progress_fmt, **kwargs):
+    """function writes the final status of a command to stderr
+
+    :param event: status (done, canceled, error)
+    :type event: `string`
+    :param progress_fmt: progress format, text/none only show errors as text
+    :type progress_fmt: `CONST_progress_formats` entry
+    :param kwargs: status values, must be JSON serializable
+    """
+    if progress_fmt == CONST_progress_formats['json']: write_event(event, **kwargs)
+    elif event != 'done': sys.stderr.write(f"{event}: {kwargs.get('message', '')}\n")
+
+def write_rows(rows, hdrs, output_fmt, stream=None):
+    """function writes the result rows to stdout
+
+    :param rows: result rows, dicts of {header: value}
+    :type rows: `list` of `dict`
+    :param hdrs: output columns in order
+    :type hdrs: `list` of `string`
+    :param output_fmt: output format
+    :type output_fmt: `CONST_output_formats` entry
+    :param stream: stream to write to, None for stdout
+    :type stream: file-like object
+    """
+    if stream is None: stream = sys.stdout
+    if output_fmt == CONST_output_formats['json']:
+        json.dump(rows, stream, indent=1)
+        stream.write('\n')
+    else:
+        file_writer = csv.DictWriter(stream, fieldnames=hdrs, lineterminator='\n')
+        file_writer.writeheader()
+        file_writer.writerows(rows)
+    stream.flush()
+
+def get_file_rows(files, export_hdrs):
+    """function builds the result rows of parsed files
+
+    :param files: file properties
+    :type files: `list` of `media_file_props` instance
+    :param export_hdrs: output columns, {'media_file_props.attr_name':'output header'}
+    :type export_hdrs: `dict`
+    :returns: result rows
+    :rtype: `list` of `dict`
+    """
+    return [{hdr:getattr(file, attr) for attr, hdr in export_hdrs.items()} for file in files]
+
+def get_error_rows(errors):
+    """function builds the result rows of the template errors found"""
+    return [{'Type':err_type, 'Message':msg} for err_type, msg in errors]
+
+def cmd_scan(args):
+    """function runs the "scan" subcommand, see `get_arg_parser`
+
+    :returns: exit code
+    :rtype: `int`
+    """
+    path = args.path
+    if os.path.isdir(path): open_type = CONST_openType['dir']
+    elif check_file_exists(path) and get_file_ext(path) in CONST_media_formats.values(): open_type = CONST_openType['file']
+    else:
+        report_status('error', args.progress, message=f"Not a directory or supported media file: {path}")
+        return CONST_exit_codes['error']
+    if args.out_dir is not None and not check_dir_exists(args.out_dir):
+        report_status('error', args.progress, message=f"Output directory not found: {args.out_dir}")
+        return CONST_exit_codes['error']
+    if args.baseline is not None and (open_type != CONST_openType['dir'] or args.out_dir is None):
+        report_status('error', args.progress, message="--baseline needs a directory to scan and --out-dir")
+        return CONST_exit_codes['error']
+
+    export_fmt = CONST_export_formats[args.export_format]
+    probe_timeout = args.probe_timeout if args.probe_timeout > 0 else None
+    exported = []                                       #files written to the export, to also write to stdout
+    cleared = 0                                         #cached results dropped by --clear-cache
+    if args.clear_cache:
+        with probe_cache() as stale_cache: cleared = stale_cache.invalidate(path)
+    cache = None if args.no_cache else probe_cache()
+    try:
+        if args.baseline is not None:
+            final = run_cli_job(media_tasks.export_media_changes, (path, args.baseline, args.out_dir, cache, args.jobs, export_fmt,
+                                                                   probe_timeout, args.probe_timing), args.progress, args.profile)
+        elif args.out_dir is not None:
+            final = run_cli_job(media_tasks.export_media_properties, (path, open_type, args.out_dir, cache, args.jobs, export_fmt,
+                                                                      None if args.quiet else exported.append, probe_timeout,
+                                                                      args.probe_timing), args.progress, args.profile)
+        else:
+            final = run_cli_job(media_tasks.parse_dir_mediafiles, (path, open_type, cache, args.jobs, probe_timeout), args.progress, args.profile)
+        hits = cache.hits if cache is not None else 0; misses = cache.misses if cache is not None else 0
+    finally:
+        if cache is not None: cache.close()
+    exit_code = get_job_exit_code(final, args.progress)
+    if exit_code is not None: return exit_code
+
+    result = final[1]
+    status = {'cached':hits, 'probed':misses}
+    if args.clear_cache: status['cache_cleared'] = cleared
+    if args.baseline is not None:
+        files, changes_filepath, out_filepath = result
+        export_hdrs = CONST_CSVdelta_hdrs
+        status.update({'changes':changes_filepath, 'export':out_filepath, 'files':len(files)})
+    elif args.out_dir is not None:
+        num_files, out_filepath = result
+        files = exported
+        export_hdrs = CONST_CSVexport_hdrs
+        status.update({'export':out_filepath, 'files':num_files})
+    else:
+        files = result
+        export_hdrs = CONST_CSVexport_hdrs
+        status['files'] = len(files)
+    if args.probe_timing: export_hdrs = {**export_hdrs, **CONST_CSVtiming_hdrs}
+
+    if not args.quiet: write_rows(get_file_rows(files, export_hdrs), list(export_hdrs.values()), args.format)
+    report_status('done', args.progress, **status)
+    return CONST_exit_codes['ok']
+
+def check_template(args, journal=None, del_old=False):
+    """function loads the update template and checks it for errors, writing the errors found
+
+    :param journal: journal of an unfinished update that will be resumed, None if not resuming
+    :type journal: `update_journal` instance
+    :param del_old: the old files will be deleted
+    :type del_old: `bool`
+    :returns: exit code (None if the template was checked), list of files to update, list of errors found
+    :rtype: `int`, `list`, `list`
+    """
+    if not check_file_exists(args.template):
+        report_status('error', args.progress, message=f"Template not found: {args.template}")
+        return CONST_exit_codes['error'], [], []
+    final = run_cli_job(media_tasks.load_and_check_template, (args.template, journal, media_tasks.sys_check_workers,
+                                                              args.placement, del_old), args.progress, args.profile)
+    exit_code = get_job_exit_code(final, args.progress)
+    if exit_code is not None: return exit_code, [], []
+
+    files_to_update, errors = final[1]
+    if len(files_to_update) == 0:
+        report_status('error', args.progress, message="Template has no entries")
+        return CONST_exit_codes['error'], [], []
+    return None, files_to_update, errors
+
+def has_check_errors(errors, strict=False):
+    """function checks if the template errors found should stop the update
+
+    :param errors: list of errors found
+    :type errors: `list` of (`CONST_err_types` entry, message text) `tuples`
+    :param strict: warnings also stop the update
+    :type strict: `bool`
+    :rtype: `bool`
+    """
+    return any(err_type == CONST_err_types['err'] or (strict and err_type == CONST_err_types['warn']) for err_type, _ in errors)
+
+def cmd_validate(args):
+    """function runs the "validate" subcommand, see `get_arg_parser`
+
+    :returns: exit code
+    :rtype: `int`
+    """
+    exit_code, files_to_update, errors = check_template(args)
+    if exit_code is not None: return exit_code
+
+    if not args.quiet: write_rows(get_error_rows(errors), ['Type', 'Message'], args.format)
+    num_errors = {err_type:0 for err_type in CONST_err_types.values()}
+    for err_type, _ in errors: num_errors[err_type] += 1
+    report_status('done', args.progress, files=len(files_to_update), errors=num_errors[CONST_err_types['err']],
+                  warnings=num_errors[CONST_err_types['warn']])
+    if has_check_errors(errors, args.strict): return CONST_exit_codes['check_failed']
+    return CONST_exit_codes['ok']
+
+def cmd_apply(args):
+    """function runs the "apply" subcommand, see `get_arg_parser`
+
+    :returns: exit code
+    :rtype: `int`
+    """
+    #--carry on with an unfinished update of this template unless told to start over
+    journal = update_journal(args.template) if check_file_exists(args.template) else None
+    resume = journal is not None and journal.is_resumable() and not args.restart
+    del_old = journal.get_del_old() if resume else args.delete_old     #keep the option the update was started with
+
+    exit_code, files_to_update, errors = check_template(args, journal if resume else None, del_old)
+    if exit_code is not None: return exit_code
+    if has_check_errors(errors, args.strict) and not args.force:
+        write_rows(get_error_rows(errors), ['Type', 'Message'], args.format, sys.stderr if args.quiet else None)
+        report_status('error', args.progress, message="Template has errors, nothing was updated (use --force to update anyway)")
+        return CONST_exit_codes['check_failed']
+
+    final = run_cli_job(media_tasks.update_media_files, (files_to_update, del_old, args.jobs, journal, resume, args.verify,
+                                                         args.placement), args.progress, args.profile)
+    exit_code = get_job_exit_code(final, args.progress)
+    if exit_code is not None: return exit_code
+
+    #--one row per operation, copies done in this run include their throughput, verified copies their checksum
+    transfers = {t.op['id']:t for t in final[1]}
+    rows = []
+    for op in journal.ops:
+        t = transfers.get(op['id'])
+        rows.append({'Action':op['action'], sys_tmplt_oldFile_hdrName:op['src'], sys_tmplt_newFile_hdrName:op['dst'],
+                     'Bytes':t.nbytes if t is not None else '', 'Seconds':round(t.seconds, 3) if t is not None else '',
+                     'Method':t.method if t is not None else '', 'Checksum':journal.completed.get(op['id'], {}).get('checksum', '')})
+    if not args.quiet:
+        write_rows(rows, ['Action', sys_tmplt_oldFile_hdrName, sys_tmplt_newFile_hdrName, 'Bytes', 'Seconds', 'Method', 'Checksum'], args.format)
+    report_status('done', args.progress, files=len(files_to_update), operations=len(rows), copied=len(transfers),
+                  resumed=resume, warnings=sum(1 for err_type, _ in errors if err_type == CONST_err_types['warn']))
+    return CONST_exit_codes['ok']
+
+def cmd_dedup(args):
+    """function runs the "dedup" subcommand, see `get_arg_parser`
+
+    :returns: exit code
+    :rtype: `int`
+    """
+    if not os.path.isdir(args.path):
+        report_status('error', args.progress, message=f"Directory not found: {args.path}")
+        return CONST_exit_codes['error']
+    if not check_dir_exists(args.out_dir):
+        report_status('error', args.progress, message=f"Output directory not found: {args.out_dir}")
+        return CONST_exit_codes['error']
+
+    cache = None if args.no_cache else probe_cache()
+    index = None if args.no_index else dedup_index()
+    try:
+        final = run_cli_job(media_tasks.export_duplicates_template, (args.path, args.out_dir, cache, args.jobs, index, args.dup_dir),
+                            args.progress, args.profile)
+        hashed = index.misses if index is not None else 0; indexed = index.hits if index is not None else 0
+    finally:
+        if cache is not None: cache.close()
+        if index is not None: index.close()
+    exit_code = get_job_exit_code(final, args.progress)
+    if exit_code is not None: return exit_code
+
+    groups, rows, out_filepath = final[1]
+    if not args.quiet: write_rows(rows, CONST_CSVdedup_hdrs, args.format)
+    report_status('done', args.progress, template=out_filepath, groups=len(groups), duplicates=len(rows),
+                  duplicate_bytes=sum(row['File_Size_Bytes'] for row in rows), indexed=indexed, hashed=hashed)
+    return CONST_exit_codes['ok']
+
+def cmd_watch(args):
+    """function runs the "watch" subcommand, see `get_arg_parser`. Each file is written to stdout as it is
+    cataloged (CSV rows, or one JSON object per line), the command runs until interrupted.
+
+    :returns: exit code
+    :rtype: `int`
+    """
+    if not os.path.isdir(args.path):
+        report_status('error', args.progress, message=f"Directory not found: {args.path}")
+        return CONST_exit_codes['error']
+    if not check_dir_exists(args.out_dir):
+        report_status('error', args.progress, message=f"Output directory not found: {args.out_dir}")
+        return CONST_exit_codes['error']
+
+    export_fmt = CONST_export_formats[args.export_format]
+    probe_timeout = args.probe_timeout if args.probe_timeout > 0 else None
+    cataloged = [0]; csv_writer = []                    #files cataloged, stdout CSV writer once the header is written
+
+    def on_file(file):
+        """function writes a cataloged file to stdout"""
+        cataloged[0] += 1
+        if args.quiet: return
+        row = get_file_rows([file], CONST_CSVexport_hdrs)[0]
+        if args.format == CONST_output_formats['json']: sys.stdout.write(json.dumps(row)+'\n')
+        else:
+            if len(csv_writer) == 0:
+                csv_writer.append(csv.DictWriter(sys.stdout, fieldnames=list(CONST_CSVexport_hdrs.values()), lineterminator='\n'))
+                csv_writer[0].writeheader()
+            csv_writer[0].writerow(row)
+        sys.stdout.flush()
+
+    cache = None if args.no_cache else probe_cache()
+    try:
+        final = run_cli_job(media_tasks.watch_media_folder, (args.path, args.out_dir, cache, export_fmt, args.poll, args.stable_sec,
+                                                             probe_timeout, on_file), args.progress, args.profile)
+    finally:
+        if cache is not None: cache.close()
+    if final[0] != CONST_job_msgs['canceled']:          #only stops once interrupted, anything else failed
+        return get_job_exit_code(final, args.progress) or CONST_exit_codes['error']
+
+    report_status('done', args.progress, export=media_tasks.get_rolling_export_path(args.out_dir, export_fmt), files=cataloged[0])
+    return CONST_exit_codes['ok']
+
+def get_arg_parser():
+    """function builds the command line argument parser
+
+    :returns: argument parser
+    :rtype: `argparse.ArgumentParser`
+    """
+    parser = argparse.ArgumentParser(description='Media Manager Helper - parse media files and update/move files from a template, without the GUI.')
+    common = argparse.ArgumentParser(add_help=False)    #options shared by every subcommand
+    common.add_argument('--format', choices=list(CONST_output_formats.values()), default=CONST_output_formats['csv'],
+                        help='format of the results written to stdout (default: csv)')
+    common.add_argument('--progress', choices=list(CONST_progress_formats.values()), default=CONST_progress_formats['json'],
+                        help='format of the progress/status written to stderr (default: json lines)')
+    common.add_argument('-q', '--quiet', action='store_true', help="don't write the results to stdout")
+    common.add_argument('--profile', metavar='PREFIX', help='profile each job, writing PREFIX_<task>.prof (cProfile) and '
+                        'PREFIX_<task>.trace.json (Chrome trace timeline) and reporting the stage timers/counters')
+    placement = argparse.ArgumentParser(add_help=False)     #options shared by the template subcommands
+    placement.add_argument('--placement', choices=list(CONST_placement_modes.values()), default=CONST_placement_modes['copy'],
+                           help='how copies are placed: copy (full copies), reflink (clone on copy-on-write file systems, else copy) or '
+                           'auto (hard link on the same device, else clone, else copy). Other than copy, the check lists how many files '
+                           'are placed each way (default: copy)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    scan = sub.add_parser('scan', parents=[common], help='parse media file(s) and output their properties')
+    scan.add_argument('path', help='directory (including sub directories) or single media file to parse')
+    scan.add_argument('-o', '--out-dir', help='also create the properties export CSV file in this directory')
+    scan.add_argument('-b', '--baseline', help='previous properties export, only new/changed files are parsed and the '
+                      'results are the added/changed/removed files (needs --out-dir)')
+    scan.add_argument('--export-format', choices=list(CONST_export_formats.keys()), default='CSV',
+                      help='format of the export files created in --out-dir (default: CSV, Parquet needs pyarrow)')
+    scan.add_argument('-j', '--jobs', type=int, default=media_tasks.sys_probe_workers,
+                      help=f'worker processes used to parse files (default: {media_tasks.sys_probe_workers})')
+    scan.add_argument('--no-cache', action='store_true', help="don't use the probe result cache, parse every file")
+    scan.add_argument('--clear-cache', action='store_true', help='drop the cached probe results of the files in the path before '
+                      'scanning, so they are all parsed again (and cached, unless --no-cache)')
+    scan.add_argument('--probe-timeout', type=float, default=media_tasks.sys_probe_timeout, metavar='SEC',
+                      help=f'seconds allowed to parse each file before its worker is killed and the file is reported as timed out, '
+                      f'0 for no limit (default: {media_tasks.sys_probe_timeout:g})')
+    scan.add_argument('--probe-timing', action='store_true', help='add the seconds each file took to parse to the results/export')
+    scan.set_defaults(func=cmd_scan)
+
+    validate = sub.add_parser('validate', parents=[common, placement], help='check an update template for errors')
+    validate.add_argument('template', help='update template (CSV, XLS or XLSX)')
+    validate.add_argument('--strict', action='store_true', help='exit with an error for warnings too')
+    validate.set_defaults(func=cmd_validate)
+
+    apply = sub.add_parser('apply', parents=[common, placement], help='check an update template and update/move its files')
+    apply.add_argument('template', help='update template (CSV, XLS or XLSX)')
+    apply.add_argument('-d', '--delete-old', action='store_true', help='delete the old files once updated')
+    apply.add_argument('-j', '--jobs', type=int, default=media_tasks.sys_transfer_workers,
+                       help=f'max file copies running at once (default: {media_tasks.sys_transfer_workers})')
+    apply.add_argument('--force', action='store_true', help='update even if the template has errors')
+    apply.add_argument('--strict', action='store_true', help="don't update if the template has warnings")
+    apply.add_argument('--restart', action='store_true', help='start over instead of resuming an unfinished update of the template')
+    apply.add_argument('--verify', action='store_true', help='checksum each copy (source while copying, destination after) and only delete '
+                       'old files once their copies are verified, when resuming also checksum the copies already done')
+    apply.set_defaults(func=cmd_apply)
+
+    dedup = sub.add_parser('dedup', parents=[common], help='find duplicate media files and create a template to move them out')
+    dedup.add_argument('path', help='directory (including sub directories) to check for duplicates')
+    dedup.add_argument('-o', '--out-dir', required=True, help='directory to create the duplicates report/template CSV file in')
+    dedup.add_argument('--dup-dir', help='directory the template moves the duplicates to (default: Duplicates in --out-dir)')
+    dedup.add_argument('-j', '--jobs', type=int, default=media_tasks.sys_probe_workers,
+                       help=f'worker processes used to parse files (default: {media_tasks.sys_probe_workers})')
+    dedup.add_argument('--no-cache', action='store_true', help="don't use the probe result cache, parse every file")
+    dedup.add_argument('--no-index', action='store_true', help="don't use the duplicate file index, read every file")
+    dedup.set_defaults(func=cmd_dedup)
+
+    watch = sub.add_parser('watch', parents=[common], help='watch a directory and catalog media files as they are added/changed')
+    watch.add_argument('path', help='directory (including sub directories) to watch')
+    watch.add_argument('-o', '--out-dir', required=True,
+                       help=f'directory of the rolling export ({media_tasks.sys_watch_export_name}.csv/.jsonl), appended to as files are cataloged')
+    watch.add_argument('--export-format', choices=['CSV', 'JSONL'], default='CSV', help='format of the rolling export (default: CSV)')
+    watch.add_argument('--poll', action='store_true', help="walk the directory every few seconds instead of using inotify "
+                       "(used anyway where inotify isn't available)")
+    watch.add_argument('--stable-sec', type=float, default=sys_watch_stable_sec, metavar='SEC',
+                       help=f'seconds a file must be unchanged to be cataloged, when it isn\'t seen closed after writing '
+                       f'(default: {sys_watch_stable_sec:g})')
+    watch.add_argument('--probe-timeout', type=float, default=media_tasks.sys_probe_timeout, metavar='SEC',
+                       help=f'seconds allowed to parse each file, 0 for no limit (default: {media_tasks.sys_probe_timeout:g})')
+    watch.add_argument('--no-cache', action='store_true', help="don't use the probe result cache, parse every file")
+    watch.set_defaults(func=cmd_watch)
+    return parser
+
+def main(argv=None):
+    """function runs the command line interface
+
+    :param argv: command line arguments, None for `sys.argv`
+    :type argv: `list` of `string`
+    :returns: exit code
+    :rtype: `int`
+    """
+    args = get_arg_parser().parse_args(argv)
+    if getattr(args, 'jobs', 1) < 1:
+        report_status('error', args.progress, message='--jobs must be at least 1')
+        return CONST_exit_codes['usage']
+    return args.func(args)
+
+#-----------------------------main
+if __name__ == "__main__":
+    sys.exit(main())